@@ -1,72 +1,238 @@
-from flask import Flask, jsonify
-from flask_cors import CORS
 from dotenv import load_dotenv
-import os
-from mongo_models import User, Meal, Influencer
-from routes.auth import auth_bp
-from routes.meals import meals_bp
-from routes.influencers import influencers_bp
-from routes.users import users_bp
-from flask_jwt_extended import JWTManager
-
-# Load environment variables
+
+# Load environment variables before any module reads its configuration
 load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)
-
-# Configure app
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'dev-secret-key')
-
-# Initialize extensions
-jwt = JWTManager(app)
-
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(meals_bp, url_prefix='/api/meals')
-app.register_blueprint(influencers_bp, url_prefix='/api/influencers')
-app.register_blueprint(users_bp, url_prefix='/api/users')
-
-@app.route('/')
-def index():
-    return jsonify({
-        'message': 'Welcome to FitFoodie API',
-        'status': 'online'
-    })
-
-@app.errorhandler(404)
-def not_found(e):
-    return jsonify({
-        'error': 'Not found',
-        'message': 'The requested resource was not found on this server'
-    }), 404
-
-@app.errorhandler(500)
-def server_error(e):
-    return jsonify({
-        'error': 'Internal server error',
-        'message': 'Something went wrong on our end'
-    }), 500
-
-# Create indexes for MongoDB collections
-@app.before_request
-def create_indexes():
-    # Only run once
-    if not hasattr(app, '_got_first_request'):
-        # Create indexes for users collection
-        db.users.create_index('username', unique=True)
-        db.users.create_index('email', unique=True)
-
-        # Create indexes for influencers collection
-        db.influencers.create_index('user_id', unique=True)
-        db.influencers.create_index('specialty')
-
-        # Create indexes for meals collection
-        db.meals.create_index('influencer_id')
-        db.meals.create_index('tags')
-
-        app._got_first_request = True
+import importlib
+import os
+import threading
+
+from flask import Flask, Response, jsonify, request
+
+# Blueprints by name: (module, attribute, url_prefix). They are imported when
+# an app registers them, which is what pulls in pymongo and the models.
+BLUEPRINTS = {
+    'auth': ('routes.auth', 'auth_bp', '/api/auth'),
+    'meals': ('routes.meals', 'meals_bp', '/api/meals'),
+    'influencers': ('routes.influencers', 'influencers_bp', '/api/influencers'),
+    'users': ('routes.users', 'users_bp', '/api/users'),
+}
+
+
+def create_app(config=None):
+    """Build a FitFoodie app
+
+    ``config`` overrides settings read from the environment; set
+    ``BLUEPRINTS`` to a subset of BLUEPRINTS' names (or an empty list) for
+    a lighter app. Building the app never touches MongoDB: the client
+    connects on first use and ``check_readiness`` (behind ``/ready``) does
+    the startup work that needs the database.
+    """
+    from flask_cors import CORS
+    from flask_jwt_extended import JWTManager
+    from json_provider import OrjsonProvider
+    import metrics
+
+    # Initialize Flask app
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    CORS(app)
+
+    # Configure app
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'dev-secret-key')
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    app.config['ENSURE_INDEXES_ON_STARTUP'] = os.getenv('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+    app.config['BLUEPRINTS'] = list(BLUEPRINTS)
+    app.config.update(config or {})
+
+    # Initialize extensions
+    jwt = JWTManager(app)
+    jwt.token_in_blocklist_loader(is_token_revoked)
+    metrics.init_app(app)
+    app.extensions['readiness'] = {'lock': threading.Lock(), 'indexes_ensured': False}
+
+    # Register blueprints
+    for name in app.config['BLUEPRINTS']:
+        module, attribute, url_prefix = BLUEPRINTS[name]
+        app.register_blueprint(getattr(importlib.import_module(module), attribute), url_prefix=url_prefix)
+
+    register_routes(app)
+    register_cli(app)
+    return app
+
+
+def is_token_revoked(jwt_header, jwt_payload):
+    # Tokens whose role claims are outdated; see claims.py
+    from claims import is_revoked
+    return is_revoked(jwt_payload)
+
+
+def check_readiness(app):
+    """Return ``(ready, detail)`` after pinging MongoDB
+
+    The first successful check in a process also creates any missing
+    declared indexes when ENSURE_INDEXES_ON_STARTUP is set; builds for
+    indexes that already exist are skipped, so this is cheap for every
+    worker after the first.
+    """
+    from pymongo.errors import PyMongoError
+    from mongo_models import db
+    from indexes import ensure_indexes
+
+    state = app.extensions['readiness']
+    try:
+        db.command('ping')
+        with state['lock']:
+            if app.config['ENSURE_INDEXES_ON_STARTUP'] and not state['indexes_ensured']:
+                ensure_indexes(db, log=app.logger.info)
+            state['indexes_ensured'] = True
+    except PyMongoError as e:
+        app.logger.warning('MongoDB is not ready: %s', e)
+        return False, str(e)
+    return True, 'ok'
+
+
+def register_routes(app):
+    from hashing import HashingPoolSaturated
+    import metrics
+
+    @app.route('/')
+    def index():
+        return jsonify({
+            'message': 'Welcome to FitFoodie API',
+            'status': 'online'
+        })
+
+    @app.route('/api/health')
+    def health():
+        # Liveness only; see /ready for dependencies
+        return jsonify({'status': 'ok'})
+
+    @app.route('/ready')
+    def ready():
+        is_ready, detail = check_readiness(app)
+        return jsonify({
+            'status': 'ready' if is_ready else 'unavailable',
+            'mongodb': detail
+        }), 200 if is_ready else 503
+
+    @app.route('/api/cache/stats')
+    def cache_stats():
+        from mongo_models import entity_cache_stats
+        return jsonify(entity_cache_stats())
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        # Optional shared secret for scrapers when /metrics is reachable publicly
+        token = app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return jsonify({'error': 'Unauthorized'}), 401
+        return Response(metrics.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    @app.errorhandler(404)
+    def not_found(e):
+        return jsonify({
+            'error': 'Not found',
+            'message': 'The requested resource was not found on this server'
+        }), 404
+
+    @app.errorhandler(HashingPoolSaturated)
+    def hashing_saturated(e):
+        return jsonify({
+            'error': 'Service unavailable',
+            'message': str(e)
+        }), 503, {'Retry-After': '1'}
+
+    @app.errorhandler(500)
+    def server_error(e):
+        return jsonify({
+            'error': 'Internal server error',
+            'message': 'Something went wrong on our end'
+        }), 500
+
+
+def register_cli(app):
+    import click
+    from flask.cli import AppGroup
+    from export import EXPORT_FORMATS, export_chunks
+
+    @app.cli.command('reconcile-followers')
+    def reconcile_followers():
+        """Recompute influencer followers_count counters from follow edges"""
+        from mongo_models import Influencer
+        corrected = Influencer.reconcile_followers_counts()
+        print(f'Corrected followers_count on {corrected} influencer(s)')
+
+    @app.cli.command('backfill-total-time')
+    def backfill_total_time():
+        """Store total_time on meals created before it was maintained"""
+        from mongo_models import Meal
+        updated = Meal.backfill_total_time()
+        print(f'Set total_time on {updated} meal(s)')
+
+    @app.cli.command('rebuild-timelines')
+    def rebuild_timelines():
+        """Build feed timelines for users over FEED_FANOUT_THRESHOLD"""
+        from mongo_models import User
+        rebuilt = User.rebuild_timelines()
+        print(f'Rebuilt {rebuilt} timeline(s)')
+
+    @app.cli.command('export-meals')
+    @click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson')
+    @click.option('--tag', default=None)
+    @click.option('--influencer-id', default=None)
+    @click.option('--updated-after', type=click.DateTime(), default=None)
+    @click.option('--updated-before', type=click.DateTime(), default=None)
+    @click.option('--output', type=click.File('w'), default='-', help='file to write (default: stdout)')
+    def export_meals(fmt, tag, influencer_id, updated_after, updated_before, output):
+        """Stream the meal catalog as NDJSON or CSV"""
+        from mongo_models import Meal
+        batches = Meal.export_batches(
+            tag=tag,
+            influencer_id=influencer_id,
+            updated_after=updated_after,
+            updated_before=updated_before
+        )
+        for chunk in export_chunks(batches, fmt):
+            output.write(chunk)
+
+    indexes_cli = AppGroup('indexes', help='Manage the MongoDB indexes declared in indexes.py')
+
+    @indexes_cli.command('ensure')
+    @click.option('--commit-quorum', default=None, help='commitQuorum for replica set index builds')
+    def ensure_indexes_command(commit_quorum):
+        """Build missing indexes, one at a time"""
+        from mongo_models import db
+        from indexes import ensure_indexes
+        if commit_quorum and commit_quorum.isdigit():
+            commit_quorum = int(commit_quorum)
+        created = ensure_indexes(db, commit_quorum=commit_quorum)
+        print(f'Created {len(created)} index(es)')
+
+    @indexes_cli.command('report')
+    def index_report_command():
+        """Report missing, undeclared and unused indexes"""
+        from mongo_models import db
+        from indexes import index_report
+        for collection_name, report in index_report(db).items():
+            for kind in ('missing', 'undeclared', 'unused'):
+                for name in report[kind]:
+                    print(f'{kind:<10} {collection_name}.{name}')
+
+    app.cli.add_command(indexes_cli)
+
+
+def __getattr__(name):
+    # `app:app` (gunicorn, run.py, benchmarks) keeps working; the default app
+    # is only built when something asks for it
+    global app
+    if name == 'app':
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == '__main__':
+    app = create_app()
+    check_readiness(app)
     app.run(debug=True)
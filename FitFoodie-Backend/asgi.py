@@ -0,0 +1,396 @@
+"""Optional ASGI serving mode backed by motor
+
+    pip install -r requirements-async.txt
+    uvicorn asgi:app --workers 2
+
+The hottest endpoints run natively on the event loop with motor and issue
+independent lookups concurrently: meal lists and details, influencer
+details, and follow/unfollow. Every other route is passed through to the
+Flask app (in a thread pool), so the URL space, authentication and
+response shapes are the same as under gunicorn. Both halves share the
+process-local entity caches, CORS settings and metrics: natively served
+requests are reported in /metrics (and Server-Timing, for operators)
+under the endpoint names of their Flask twins.
+"""
+import asyncio
+from datetime import datetime
+
+import jwt
+from asgiref.wsgi import WsgiToAsgi
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from starlette.applications import Starlette
+from starlette.convertors import Convertor, register_url_convertor
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_etags
+
+from app import create_app
+from database import get_async_db
+from http_cache import cache_control, make_etag
+import metrics
+from mongo_models import (
+    FEED_FANOUT_THRESHOLD, Influencer, Meal, User, claims_version_cache, influencer_cache, page_counts,
+    page_result, page_spec, user_cache
+)
+from routes.meals import parse_ranges
+
+flask_app = create_app()
+
+
+class ObjectIdConvertor(Convertor):
+    """Only match valid IDs, so /api/meals/search and friends fall through to Flask"""
+    regex = '[0-9a-fA-F]{24}'
+
+    def convert(self, value):
+        return value
+
+    def to_string(self, value):
+        return str(value)
+
+
+register_url_convertor('objectid', ObjectIdConvertor())
+
+
+def json_response(data, status=200, headers=None):
+    # Flask's JSON provider, so values are formatted as in the WSGI routes
+    return Response(flask_app.json.dumps(data), status_code=status, headers=headers, media_type='application/json')
+
+
+def cache_headers(request, etag):
+    return {
+        'ETag': f'"{etag}"',
+        'Cache-Control': cache_control('authorization' in request.headers)
+    }
+
+
+def not_modified(request, etag):
+    """Return a 304 if the request's If-None-Match matches ``etag``, else None"""
+    if parse_etags(request.headers.get('if-none-match')).contains(etag):
+        return Response(status_code=304, headers=cache_headers(request, etag))
+    return None
+
+
+async def jwt_identity(request):
+    """Return ``(identity, None)`` for a valid access token, else ``(None, error response)``
+
+    Mirrors flask_jwt_extended's defaults: a Bearer token in the
+    Authorization header, signed with JWT_SECRET_KEY using HS256.
+    """
+    header = request.headers.get('authorization')
+    if not header:
+        return None, json_response({'msg': 'Missing Authorization Header'}, 401)
+    scheme, _, token = header.partition(' ')
+    if scheme != 'Bearer' or not token:
+        return None, json_response({'msg': "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'"}, 422)
+    try:
+        claims = jwt.decode(token, flask_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        return None, json_response({'msg': 'Token has expired'}, 401)
+    except jwt.InvalidTokenError as e:
+        return None, json_response({'msg': str(e)}, 422)
+    if claims.get('type') != 'access':
+        return None, json_response({'msg': 'Only non-refresh tokens are allowed'}, 422)
+    if 'claims_version' in claims and not await claims_are_current(claims['sub'], claims['claims_version']):
+        return None, json_response({'msg': 'Token has been revoked'}, 401)
+    return claims['sub'], None
+
+
+async def claims_are_current(user_id, claims_version):
+    """Async User.claims_are_current (claims.is_revoked), sharing its caches"""
+    current = User.cached_claims_version(user_id)
+    if current is None:
+        user = await get_async_db().users.find_one({"_id": ObjectId(user_id)}, {"claims_version": 1})
+        current = user.get('claims_version', 0) if user else 0
+        claims_version_cache.set(str(user_id), current)
+    return current <= claims_version
+
+
+async def get_user(user_id):
+    """Async User.get_by_id, sharing its cache"""
+    user_id = ObjectId(user_id)
+    cached = user_cache.get(str(user_id))
+    if cached is not None:
+        return dict(cached)
+
+    user = await get_async_db().users.find_one({"_id": user_id})
+    if user:
+        user_cache.set(str(user_id), dict(user))
+    return user
+
+
+async def get_influencer(influencer_id):
+    """Async Influencer.get_by_id, sharing its cache"""
+    influencer_id = ObjectId(influencer_id)
+    cached = influencer_cache.get(str(influencer_id))
+    if cached is not None:
+        return dict(cached)
+
+    influencer = await get_async_db().influencers.find_one({"_id": influencer_id})
+    if influencer:
+        influencer_cache.set(str(influencer_id), dict(influencer))
+    return influencer
+
+
+async def get_influencer_names(influencer_ids):
+    """Async Meal.get_influencer_names: cached entries first, then one $in per collection"""
+    db = get_async_db()
+    user_ids = {}
+    missing = []
+    for inf_id in set(influencer_ids):
+        cached = influencer_cache.get(str(inf_id))
+        if cached is not None:
+            user_ids[inf_id] = cached['user_id']
+        else:
+            missing.append(inf_id)
+
+    if missing:
+        async for inf in db.influencers.find({"_id": {"$in": missing}}, {"user_id": 1}):
+            user_ids[inf['_id']] = inf['user_id']
+    if not user_ids:
+        return {}
+
+    user_names = {}
+    missing = []
+    for user_id in set(user_ids.values()):
+        cached = user_cache.get(str(user_id))
+        if cached is not None:
+            user_names[user_id] = cached.get('name', 'Unknown')
+        else:
+            missing.append(user_id)
+
+    if missing:
+        async for user in db.users.find({"_id": {"$in": missing}}, {"name": 1}):
+            user_names[user['_id']] = user.get('name', 'Unknown')
+
+    return {
+        inf_id: user_names[user_id]
+        for inf_id, user_id in user_ids.items()
+        if user_id in user_names
+    }
+
+
+async def to_dict_many(meals):
+    names = await get_influencer_names(meal['influencer_id'] for meal in meals if meal.get('influencer_id'))
+    return [Meal.to_dict(meal, names) for meal in meals]
+
+
+async def list_meals(request):
+    """GET /api/meals/
+
+    The listing's count, its latest update and the influencer names'
+    version (together its ETag) are read concurrently. The count doubles as
+    the page total, so a page costs three concurrent commands, the page
+    query and the name lookups. Cursor pages skip the count, as in
+    Meal.get_list_version.
+    """
+    args = MultiDict(request.query_params.multi_items())
+    page = args.get('page', 1, type=int)
+    per_page = args.get('per_page', 10, type=int)
+    cursor = args.get('cursor')
+    tag = args.get('tag')
+    influencer_id = args.get('influencer_id')
+    fields = args.get('fields')
+
+    if influencer_id and not ObjectId.is_valid(influencer_id):
+        return json_response({'error': 'Invalid influencer ID format'}, 400)
+
+    try:
+        ranges = parse_ranges(args)
+        query = Meal.list_query(tag, influencer_id, ranges)
+        projection = Meal.projection(fields)
+        page_query, sort_order, skip, per_page = page_spec(query, page, per_page, cursor)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    db = get_async_db()
+    versions = [
+        db.meals.find_one(query, {"updated_at": 1}, sort=[("updated_at", -1)]),
+        db.users.find_one({"is_influencer": True}, {"updated_at": 1}, sort=[("updated_at", -1)])
+    ]
+    if cursor:
+        count, (latest, names) = None, await asyncio.gather(*versions)
+    else:
+        count, latest, names = await asyncio.gather(db.meals.count_documents(query), *versions)
+    # request.full_path in Flask, so both modes agree on the ETag
+    full_path = f'{request.url.path}?{request.url.query}'
+    etag = make_etag(
+        full_path, count,
+        latest.get('updated_at') if latest else None,
+        names.get('updated_at') if names else None
+    )
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    docs = await db.meals.find(page_query, projection).sort(sort_order).skip(skip).to_list(per_page + 1)
+    docs, next_cursor = page_result(docs, per_page)
+    body = {"meals": Meal.select_fields(await to_dict_many(docs), fields), "next_cursor": next_cursor}
+    if not cursor:
+        body.update(page_counts(count, page, per_page))
+
+    return json_response(body, headers=cache_headers(request, etag))
+
+
+async def get_meal(request):
+    """GET /api/meals/<meal_id>"""
+    meal = await get_async_db().meals.find_one({"_id": ObjectId(request.path_params['meal_id'])})
+    if not meal:
+        return json_response({'error': 'Meal not found'}, 404)
+
+    # As Meal.get_influencer_updated_at: the meal shows its influencer's name
+    influencer = await get_influencer(meal['influencer_id']) if meal.get('influencer_id') else None
+    user = await get_user(influencer['user_id']) if influencer else None
+    etag = make_etag(meal['_id'], meal.get('updated_at'), user.get('updated_at') if user else None)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    names = await get_influencer_names([meal['influencer_id']] if meal.get('influencer_id') else [])
+    return json_response(Meal.to_dict(meal, names), headers=cache_headers(request, etag))
+
+
+async def get_influencer_detail(request):
+    """GET /api/influencers/<influencer_id>"""
+    influencer = await get_influencer(request.path_params['influencer_id'])
+    if not influencer:
+        return json_response({'error': 'Influencer not found'}, 404)
+
+    user = await get_user(influencer['user_id'])
+    etag = make_etag(
+        influencer['_id'],
+        influencer.get('updated_at'),
+        influencer.get('followers_count', 0),
+        user.get('updated_at') if user else None
+    )
+
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    influencer_dict = Influencer.to_dict(influencer)
+    influencer_dict['user'] = User.to_dict(user)
+    influencer_dict['followers_count'] = influencer.get('followers_count', 0)
+    return json_response(influencer_dict, headers=cache_headers(request, etag))
+
+
+async def change_follow(request, follow):
+    """Shared body of follow/unfollow; the user and influencer are fetched concurrently"""
+    user_id, error = await jwt_identity(request)
+    if error:
+        return error
+    influencer_id = ObjectId(request.path_params['influencer_id'])
+
+    user, influencer = await asyncio.gather(get_user(user_id), get_influencer(influencer_id))
+
+    if not user:
+        return json_response({'error': 'User not found'}, 404)
+    if not influencer:
+        return json_response({'error': 'Influencer not found'}, 404)
+
+    db = get_async_db()
+    user_id = user['_id']
+    if follow:
+        try:
+            result = await db.follows.update_one(*User.follow_edge(user_id, influencer_id), upsert=True)
+        except DuplicateKeyError:
+            result = None
+        if result is None or result.upserted_id is None:
+            return json_response({'error': 'Already following this influencer'}, 400)
+    elif not (await db.follows.delete_one({"user_id": user_id, "influencer_id": influencer_id})).deleted_count:
+        return json_response({'error': 'Not following this influencer'}, 400)
+
+    # Both counters at once; the influencer's new count is the response
+    step = 1 if follow else -1
+    updated_user, updated_influencer = await asyncio.gather(
+        db.users.find_one_and_update(
+            {"_id": user_id},
+            {"$inc": {"following_count": step}},
+            projection={"following_count": 1, "timeline_enabled": 1},
+            return_document=ReturnDocument.AFTER
+        ),
+        db.influencers.find_one_and_update(
+            {"_id": influencer_id},
+            {"$inc": {"followers_count": step}, "$set": {"updated_at": datetime.utcnow()}},
+            projection={"followers_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+    )
+    user_cache.invalidate(str(user_id))
+    influencer_cache.invalidate(str(influencer_id))
+
+    # Timelines only exist for heavy followers; maintain them with the sync models
+    if updated_user and (updated_user.get('timeline_enabled') or
+                         (follow and updated_user.get('following_count', 0) > FEED_FANOUT_THRESHOLD)):
+        await asyncio.to_thread(User.update_timeline, updated_user, influencer_id, follow)
+
+    return json_response({
+        'message': 'Now following influencer' if follow else 'Unfollowed influencer',
+        'followers_count': (updated_influencer or {}).get('followers_count', 0)
+    })
+
+
+async def server_error(request, exc):
+    # Same shape as the Flask routes' catch-all
+    return json_response({'error': str(exc)}, 500)
+
+
+async def follow_influencer(request):
+    return await change_follow(request, follow=True)
+
+
+async def unfollow_influencer(request):
+    return await change_follow(request, follow=False)
+
+
+def instrumented(endpoint, flask_endpoint):
+    """Report a native route in /metrics and Server-Timing as metrics.init_app does for ``flask_endpoint``"""
+    blueprint = flask_endpoint.split('.')[0]
+
+    async def wrapper(request):
+        state = metrics.start_request()
+        try:
+            response = await endpoint(request)
+        except Exception:
+            metrics.finish_request(state, blueprint, flask_endpoint, request.method, 500)
+            raise
+        timing = metrics.finish_request(state, blueprint, flask_endpoint, request.method, response.status_code)
+        if metrics.server_timing_allowed(flask_app, request.headers):
+            response.headers['Server-Timing'] = timing
+        return response
+    return wrapper
+
+
+def cors_options():
+    """CORSMiddleware options matching flask_cors on the Flask app
+
+    flask_cors allows its CORS_ORIGINS setting (every origin by default)
+    and echoes the request's Origin rather than sending ``*``.
+    """
+    origins = flask_app.config.get('CORS_ORIGINS', '*')
+    if origins == '*':
+        allowed = {'allow_origin_regex': '.*'}
+    else:
+        allowed = {'allow_origins': [origins] if isinstance(origins, str) else list(origins)}
+    return {**allowed, 'allow_methods': ['*'], 'allow_headers': ['*']}
+
+
+app = Starlette(routes=[
+    Route('/api/meals/', instrumented(list_meals, 'meals.get_meals'), methods=['GET']),
+    Route('/api/meals/{meal_id:objectid}', instrumented(get_meal, 'meals.get_meal'), methods=['GET']),
+    Route('/api/influencers/{influencer_id:objectid}',
+          instrumented(get_influencer_detail, 'influencers.get_influencer'), methods=['GET']),
+    Route('/api/influencers/follow/{influencer_id:objectid}',
+          instrumented(follow_influencer, 'influencers.follow_influencer'), methods=['POST']),
+    Route('/api/influencers/unfollow/{influencer_id:objectid}',
+          instrumented(unfollow_influencer, 'influencers.unfollow_influencer'), methods=['DELETE']),
+    # Everything else, including invalid IDs, is answered by the Flask app
+    Mount('/', app=WsgiToAsgi(flask_app)),
+], middleware=[
+    # The native routes get the CORS headers flask_cors adds to the Flask ones
+    Middleware(CORSMiddleware, **cors_options()),
+], exception_handlers={Exception: server_error})
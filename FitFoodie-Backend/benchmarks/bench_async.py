@@ -0,0 +1,168 @@
+"""Sync (gunicorn) vs async (uvicorn + asgi.py) serving benchmark
+
+Seeds a real mongod, then starts each server as a subprocess with the same
+number of worker processes and drives it at increasing concurrency. Per
+server, scenario and concurrency level it reports p50/p95/p99 latency and
+throughput, and the growth in resident memory of the server's process
+tree divided by the number of concurrent connections. Needs
+requirements-async.txt and psutil.
+
+    python benchmarks/bench_async.py --mongo-uri mongodb://localhost:27017/fitfoodie_bench \\
+        --concurrency 16 64 256 --output async-results.json
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.bench_endpoints import BENCH_PASSWORD, build_scenarios, git_commit, run_http, summarize
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..')
+
+# Served natively by asgi.py, plus one route that falls through to Flask
+SCENARIOS = ('meals_list', 'meals_by_tag', 'meal_detail', 'influencer_detail', 'feed')
+
+
+def server_commands(port, workers, threads):
+    return {
+        'gunicorn': [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads)
+        ],
+        'uvicorn': [
+            sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+            '--workers', str(workers), '--no-access-log'
+        ],
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/api/health') as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f'{base_url} did not come up within {timeout}s')
+
+
+def tree_rss(process):
+    """Resident memory of a process and its children, in bytes"""
+    import psutil
+    processes = [process] + process.children(recursive=True)
+    total = 0
+    for proc in processes:
+        try:
+            total += proc.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mongo-uri', required=True, help='benchmark database on a real mongod (it is wiped)')
+    parser.add_argument('--servers', nargs='+', choices=('gunicorn', 'uvicorn'), default=['gunicorn', 'uvicorn'])
+    parser.add_argument('--workers', type=int, default=2, help='worker processes per server')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--influencers', type=int, default=20)
+    parser.add_argument('--meals', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=1000, help='requests per scenario and concurrency level')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests per scenario')
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='async-results.json')
+    args = parser.parse_args()
+
+    import psutil
+
+    os.environ['MONGODB_URI'] = args.mongo_uri
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    os.environ.setdefault('HASH_POOL_SIZE', '0')
+
+    from database import db
+    from hashing import password_hasher
+    from benchmarks.seed import seed
+    from indexes import ensure_indexes
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+
+    ids = seed(
+        db, users=args.users, influencers=args.influencers, meals=args.meals,
+        password_hash=password_hasher.hash(BENCH_PASSWORD), random_seed=args.seed
+    )
+    ensure_indexes(db, log=lambda message: None)
+
+    rng = random.Random(args.seed)
+    with create_app({'BLUEPRINTS': []}).app_context():
+        tokens = [create_access_token(identity=str(user_id)) for user_id in rng.sample(ids['user_ids'], 20)]
+    scenarios = [s for s in build_scenarios(ids, rng) if s[0] in args.scenarios]
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'workers': args.workers,
+            'threads': args.threads,
+            'dataset': {'users': args.users, 'influencers': args.influencers, 'meals': args.meals}
+        },
+        'results': {}
+    }
+
+    env = dict(os.environ, ENSURE_INDEXES_ON_STARTUP='false')
+    for server in args.servers:
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        command = server_commands(port, args.workers, args.threads)[server]
+        process = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(base_url)
+            server_process = psutil.Process(process.pid)
+            for scenario in scenarios:
+                run_http(base_url, scenario, args.warmup, tokens, rng, max(args.concurrency))
+            idle_rss = tree_rss(server_process)
+
+            for concurrency in args.concurrency:
+                for scenario in scenarios:
+                    name = scenario[0]
+                    latencies, elapsed = run_http(base_url, scenario, args.requests, tokens, rng, concurrency)
+                    summary = summarize(latencies, elapsed, 0)
+                    del summary['round_trips_per_request']
+                    summary['rss_mb'] = round(tree_rss(server_process) / 2 ** 20, 1)
+                    summary['kb_per_connection'] = round(
+                        max(0, tree_rss(server_process) - idle_rss) / 1024 / concurrency, 1
+                    )
+                    results['results'].setdefault(server, {}).setdefault(str(concurrency), {})[name] = summary
+                    print(f"{server:<9} x{concurrency:<4} {name:<20} p50 {summary['p50_ms']:>8} ms  "
+                          f"p95 {summary['p95_ms']:>8} ms  p99 {summary['p99_ms']:>8} ms  "
+                          f"{summary['throughput_rps']:>8} req/s  {summary['kb_per_connection']:>7} KB/conn")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
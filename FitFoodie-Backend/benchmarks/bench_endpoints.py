@@ -0,0 +1,320 @@
+"""Endpoint benchmark suite for the FitFoodie API
+
+Seeds a database with a reproducible dataset, drives the real blueprints
+either in-process through the Flask test client or over HTTP with
+concurrent clients, and reports p50/p95/p99 latency, throughput and Mongo
+round trips per request for each scenario. Results are written to a JSON
+file that can be compared against a previous run to catch regressions.
+
+    # In-process against mongomock
+    python benchmarks/bench_endpoints.py --mongomock --output results.json
+
+    # Concurrent HTTP against a local mongod, compared with a baseline
+    python benchmarks/bench_endpoints.py --mongo-uri mongodb://localhost:27017/fitfoodie_bench \\
+        --http --concurrency 16 --compare baseline.json
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+BENCH_PASSWORD = 'benchmark-password'
+
+
+class RoundTripCounter:
+    """Counts Mongo commands sent by the app, thread-safely"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def increment(self):
+        with self._lock:
+            self.count += 1
+
+    def reset(self):
+        with self._lock:
+            count, self.count = self.count, 0
+        return count
+
+
+def install_command_listener(counter):
+    """Count commands on a real server; must run before mongo_models is imported"""
+    from pymongo import monitoring
+
+    class Listener(monitoring.CommandListener):
+        def started(self, event):
+            counter.increment()
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    monitoring.register(Listener())
+
+
+class CountingCollection:
+    """mongomock has no command monitoring, so count collection method calls instead"""
+
+    METHODS = {
+        'find', 'find_one', 'insert_one', 'insert_many', 'update_one', 'update_many',
+        'delete_one', 'delete_many', 'count_documents', 'aggregate', 'distinct',
+        'bulk_write', 'find_one_and_update', 'replace_one'
+    }
+
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in self.METHODS:
+            def counted(*args, **kwargs):
+                self._counter.increment()
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+class CountingDatabase:
+    def __init__(self, database, counter):
+        self._database = database
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return self[name]
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self._counter)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def build_scenarios(ids, rng):
+    """Return ``(name, method, path, authenticated, body)`` factories for each scenario"""
+    meal_ids = [str(i) for i in ids['meal_ids']]
+    influencer_ids = [str(i) for i in ids['influencer_ids']]
+
+    return [
+        ('meals_list', 'GET', lambda: '/api/meals/?per_page=20', False, None),
+        ('meals_by_tag', 'GET', lambda: f"/api/meals/?tag={rng.choice(ids['tags'])}&per_page=20", False, None),
+        ('meals_by_influencer', 'GET',
+         lambda: f'/api/meals/?influencer_id={rng.choice(influencer_ids)}&per_page=20', False, None),
+        ('meals_by_macros', 'GET',
+         lambda: f"/api/meals/?tag={rng.choice(ids['tags'])}&min_protein=30&max_calories=600&per_page=20", False, None),
+        ('meal_stats', 'GET', lambda: f"/api/meals/stats?tag={rng.choice(ids['tags'])}", False, None),
+        ('meal_detail', 'GET', lambda: f'/api/meals/{rng.choice(meal_ids)}', False, None),
+        ('meal_search', 'GET', lambda: f"/api/meals/search?q={rng.choice(ids['words']).split()[0]}", False, None),
+        ('influencers_list', 'GET', lambda: '/api/influencers/?per_page=20', False, None),
+        ('influencers_by_followers', 'GET', lambda: '/api/influencers/?sort_by=followers&per_page=20', False, None),
+        ('influencer_detail', 'GET', lambda: f'/api/influencers/{rng.choice(influencer_ids)}', False, None),
+        ('profile', 'GET', lambda: '/api/users/profile', True, None),
+        ('favorites', 'GET', lambda: '/api/users/favorites?per_page=20', True, None),
+        ('following', 'GET', lambda: '/api/users/following', True, None),
+        ('feed', 'GET', lambda: '/api/users/feed?per_page=20', True, None),
+        ('login', 'POST', lambda: '/api/auth/login', False,
+         lambda: {'username': f"user{rng.randrange(len(ids['user_ids']))}", 'password': BENCH_PASSWORD}),
+    ]
+
+
+def run_test_client(app, scenario, requests, tokens, rng):
+    name, method, path, authenticated, body = scenario
+    client = app.test_client()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        headers = {'Authorization': f'Bearer {rng.choice(tokens)}'} if authenticated else {}
+        t0 = time.perf_counter()
+        response = client.open(path(), method=method, headers=headers, json=body() if body else None)
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name}: {response.status_code} {response.get_data(as_text=True)}')
+    return latencies, time.perf_counter() - start
+
+
+def run_http(base_url, scenario, requests, tokens, rng, concurrency):
+    name, method, path, authenticated, body = scenario
+
+    def one(_):
+        headers = {'Content-Type': 'application/json'}
+        if authenticated:
+            headers['Authorization'] = f'Bearer {rng.choice(tokens)}'
+        data = json.dumps(body()).encode() if body else None
+        request = urllib.request.Request(base_url + path(), data=data, headers=headers, method=method)
+        t0 = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        return time.perf_counter() - t0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(one, range(requests)))
+    return latencies, time.perf_counter() - start
+
+
+def summarize(latencies, elapsed, round_trips):
+    latencies = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'round_trips_per_request': round(round_trips / len(latencies), 2)
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print scenarios that regressed by more than ``threshold``; return True if any did"""
+    regressed = False
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for metric in ('p95_ms', 'round_trips_per_request'):
+            before, after = previous.get(metric), current.get(metric)
+            if before and after and after > before * (1 + threshold):
+                regressed = True
+                print(f'REGRESSION {name} {metric}: {before} -> {after}')
+    return regressed
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument('--mongo-uri', help='benchmark database on a real mongod (it is wiped)')
+    backend.add_argument('--mongomock', action='store_true', help='run against an in-memory mongomock database')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--influencers', type=int, default=20)
+    parser.add_argument('--meals', type=int, default=2000)
+    parser.add_argument('--favorites', type=int, default=20, help='favorites per user')
+    parser.add_argument('--follows', type=int, default=5, help='follows per user')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests per scenario')
+    parser.add_argument('--http', action='store_true', help='drive a threaded HTTP server instead of the test client')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent HTTP clients')
+    parser.add_argument('--scenarios', nargs='+', help='only run these scenarios')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='baseline results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args()
+
+    # Keep password hashing cheap and inline so logins measure the endpoint
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    os.environ.setdefault('HASH_POOL_SIZE', '0')
+    os.environ['ENSURE_INDEXES_ON_STARTUP'] = 'false'
+
+    counter = RoundTripCounter()
+    if args.mongo_uri:
+        os.environ['MONGODB_URI'] = args.mongo_uri
+        install_command_listener(counter)
+
+    import mongo_models
+    from hashing import password_hasher
+
+    if args.mongomock:
+        import mongomock
+        raw_db = mongomock.MongoClient().get_database('fitfoodie_bench')
+        mongo_models.db = CountingDatabase(raw_db, counter)
+    else:
+        raw_db = mongo_models.db
+
+    from benchmarks.seed import seed
+    from indexes import ensure_indexes
+    from flask_jwt_extended import create_access_token
+    from app import app
+
+    ids = seed(
+        raw_db, users=args.users, influencers=args.influencers, meals=args.meals,
+        favorites=args.favorites, follows=args.follows,
+        password_hash=password_hasher.hash(BENCH_PASSWORD), random_seed=args.seed
+    )
+    ensure_indexes(raw_db, log=lambda message: None)
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        tokens = [create_access_token(identity=str(user_id)) for user_id in rng.sample(ids['user_ids'], 20)]
+
+    server = None
+    if args.http:
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'backend': 'mongomock' if args.mongomock else 'mongod',
+            'mode': f'http x{args.concurrency}' if args.http else 'test_client',
+            'dataset': {
+                'users': args.users, 'influencers': args.influencers, 'meals': args.meals,
+                'favorites': args.favorites, 'follows': args.follows
+            }
+        },
+        'results': {}
+    }
+
+    for scenario in build_scenarios(ids, rng):
+        name = scenario[0]
+        if args.scenarios and name not in args.scenarios:
+            continue
+
+        def run(requests):
+            if args.http:
+                return run_http(base_url, scenario, requests, tokens, rng, args.concurrency)
+            return run_test_client(app, scenario, requests, tokens, rng)
+
+        run(args.warmup)
+        counter.reset()
+        latencies, elapsed = run(args.requests)
+        summary = summarize(latencies, elapsed, counter.reset())
+        results['results'][name] = summary
+        print(f"{name:<26} p50 {summary['p50_ms']:>8} ms  p95 {summary['p95_ms']:>8} ms  "
+              f"p99 {summary['p99_ms']:>8} ms  {summary['throughput_rps']:>8} req/s  "
+              f"{summary['round_trips_per_request']:>6} round trips")
+
+    if server is not None:
+        server.shutdown()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Wrote {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Login throughput of the password hashing pool at different pool sizes
+
+Simulates a burst of concurrent logins from request threads and reports
+how many completed per second, how many were shed with a 503, and the
+latency of the ones that got through. Run from the backend directory:
+
+    python benchmarks/bench_login.py --pool-sizes 0 1 2 4 --threads 32
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from hashing import HashingService, HashingPoolSaturated
+
+
+def login(service, password_hash):
+    start = time.perf_counter()
+    try:
+        service.verify(password_hash, 'correct horse battery staple')
+    except HashingPoolSaturated:
+        return None
+    return time.perf_counter() - start
+
+
+def run(pool_size, threads, logins, method, queue_depth):
+    service = HashingService(method, pool_size, queue_depth, timeout=60)
+    password_hash = service.hash('correct horse battery staple')
+
+    # Warm up the worker processes so spawn time is not measured
+    with ThreadPoolExecutor(max_workers=max(pool_size, 1)) as warmup:
+        list(warmup.map(lambda _: login(service, password_hash), range(max(pool_size, 1))))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda _: login(service, password_hash), range(logins)))
+    elapsed = time.perf_counter() - start
+    service.shutdown()
+
+    latencies = sorted(r for r in results if r is not None)
+    shed = len(results) - len(latencies)
+    return {
+        'pool_size': pool_size,
+        'throughput': len(latencies) / elapsed,
+        'shed': shed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--threads', type=int, default=32, help='concurrent request threads')
+    parser.add_argument('--logins', type=int, default=200, help='logins per pool size')
+    parser.add_argument('--queue-depth', type=int, default=16)
+    parser.add_argument('--method', default=os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'))
+    args = parser.parse_args()
+
+    print(f'{"pool":>5} {"logins/s":>10} {"shed":>6} {"p50 ms":>8} {"p99 ms":>8}')
+    for pool_size in args.pool_sizes:
+        r = run(pool_size, args.threads, args.logins, args.method, args.queue_depth)
+        p50 = f'{r["p50_ms"]:.1f}' if r['p50_ms'] is not None else '-'
+        p99 = f'{r["p99_ms"]:.1f}' if r['p99_ms'] is not None else '-'
+        print(f'{r["pool_size"]:>5} {r["throughput"]:>10.1f} {r["shed"]:>6} {p50:>8} {p99:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Micro-benchmark for recommendation scoring and meal plan search
+
+Builds a MealMatrix from synthetic meals and times scoring the whole
+catalog plus top-k selection, which is the per-request work of
+``GET /api/users/recommendations`` once the matrix is cached, and the
+plan search behind ``POST /api/users/meal-plan``. No database is needed.
+
+    python benchmarks/bench_recommendations.py --meals 100000 --rounds 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bson import ObjectId
+import numpy as np
+from recommendations import MACROS, MEAL_PLAN_POOL, MealMatrix, nutrition_targets, search_plan
+
+TAGS = [
+    "breakfast", "lunch", "dinner", "snack", "vegan", "vegetarian", "keto",
+    "paleo", "high-protein", "low-carb", "gluten-free", "dairy-free", "quick",
+    "meal-prep", "dessert", "smoothie", "salad", "soup", "bowl", "pasta",
+]
+
+
+def make_meals(count, influencers, rng):
+    influencer_ids = [ObjectId() for _ in range(influencers)]
+    return [{
+        "_id": ObjectId(),
+        "influencer_id": rng.choice(influencer_ids),
+        "calories": rng.randint(150, 1200),
+        "protein": rng.randint(5, 80),
+        "carbs": rng.randint(5, 150),
+        "fat": rng.randint(2, 60),
+        "tags": rng.sample(TAGS, rng.randint(1, 4)),
+    } for _ in range(count)], influencer_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--meals', type=int, default=100000)
+    parser.add_argument('--influencers', type=int, default=1000)
+    parser.add_argument('--following', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    meals, influencer_ids = make_meals(args.meals, args.influencers, rng)
+
+    start = time.perf_counter()
+    matrix = MealMatrix(meals)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    user = {"height": 178, "weight": 80, "age": 32, "activity_level": "moderate"}
+    targets = nutrition_targets(user)
+    preferences = matrix.tag_vector(["high-protein", "high-protein", "meal-prep"])
+    following = rng.sample(influencer_ids, min(args.following, len(influencer_ids)))
+
+    timings = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        scores = matrix.score(targets, preferences, following)
+        matrix.top(scores, args.limit)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    # Plan search over the best-scoring pool, without a deadline so it runs to convergence
+    daily = nutrition_targets(user, meals_per_day=1)
+    target = np.array([daily[macro] for macro in MACROS], dtype=np.float32)
+    rows, _ = matrix.top(scores, MEAL_PLAN_POOL)
+    relative = matrix.macros[rows] / target
+    start = time.perf_counter()
+    _, totals = search_plan(relative, args.days, 3, float('inf'))
+    plan_ms = (time.perf_counter() - start) * 1000
+    worst = float(np.abs(totals - 1).max())
+
+    print(f'matrix build: {build_ms:.0f} ms for {len(matrix)} meals, {len(matrix.tags)} tag columns')
+    print(f'score + top-{args.limit}: median {timings[len(timings) // 2]:.2f} ms, '
+          f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms')
+    print(f'{args.days}-day plan from {len(rows)} candidates: {plan_ms:.1f} ms to converge, '
+          f'worst daily macro off by {worst:.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Before/after micro-benchmark for meal serialization
+
+Compares serializing a page of meals stored the legacy way (ingredients
+and affiliate links as JSON strings, stdlib JSON responses) with native
+BSON fields and the orjson response provider. Pages are serialized with
+``app.json.response``, the path ``jsonify`` takes, so the arguments Flask
+passes to the provider are included. No database is needed.
+
+    python benchmarks/bench_serialization.py --meals 50 --rounds 200
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from json_provider import OrjsonProvider, orjson
+from mongo_models import Meal
+
+
+def make_meal(native):
+    ingredients = [
+        {"name": f"ingredient {i}", "amount": f"{i * 10} g", "affiliate_link": f"https://shop.example.com/{i}"}
+        for i in range(12)
+    ]
+    affiliate_links = [{"label": f"link {i}", "url": f"https://shop.example.com/l/{i}"} for i in range(4)]
+    return {
+        "_id": ObjectId(),
+        "influencer_id": ObjectId(),
+        "title": "Protein-Packed Breakfast Bowl",
+        "description": "Start your day with this protein-rich breakfast bowl " * 3,
+        "image_url": "https://example.com/meal.jpg",
+        "ingredients": ingredients if native else json.dumps(ingredients),
+        "instructions": "Mix everything together and serve. " * 10,
+        "prep_time": 10,
+        "cook_time": 15,
+        "servings": 2,
+        "calories": 450,
+        "protein": 30,
+        "carbs": 45,
+        "fat": 15,
+        "tags": ["breakfast", "high-protein"],
+        "affiliate_links": affiliate_links if native else json.dumps(affiliate_links),
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+
+
+def bench(meals, provider_class, rounds):
+    app = Flask(__name__)
+    app.json = provider_class(app)
+
+    # Influencer names are passed in so only serialization is measured
+    with app.app_context():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            app.json.response({"meals": [Meal.to_dict(meal, {}) for meal in meals]})
+        return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--meals', type=int, default=50, help='meals per page')
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    legacy = [make_meal(native=False) for _ in range(args.meals)]
+    native = [make_meal(native=True) for _ in range(args.meals)]
+
+    before = bench(legacy, DefaultJSONProvider, args.rounds)
+    print(f'before (JSON strings, stdlib json): {before:.3f} ms/page')
+    middle = bench(native, DefaultJSONProvider, args.rounds)
+    print(f'native BSON, stdlib json:           {middle:.3f} ms/page')
+    if orjson is not None:
+        after = bench(native, OrjsonProvider, args.rounds)
+        print(f'after (native BSON, orjson):        {after:.3f} ms/page  ({before / after:.1f}x)')
+    else:
+        print('orjson is not installed; skipping the orjson provider')
+
+
+if __name__ == '__main__':
+    main()
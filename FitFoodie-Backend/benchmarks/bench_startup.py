@@ -0,0 +1,105 @@
+"""Startup-time benchmark with a budget
+
+Starts a fresh interpreter per run with ``python -X importtime``, imports
+the app module and builds the app with ``create_app()``, then reports the
+median import and boot times and the modules that dominate import time.
+Exits non-zero when either median is over its budget, so it can guard
+cold starts in CI.
+
+    python benchmarks/bench_startup.py --import-budget-ms 600 --boot-budget-ms 900
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..')
+
+CHILD = '''
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+application = app.create_app(json.loads(%r))
+t2 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "boot_ms": (t2 - t1) * 1000}))
+'''
+
+
+def parse_importtime(stderr):
+    """Return ``{module: (self_us, cumulative_us)}`` from ``-X importtime`` output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once(config):
+    env = dict(os.environ, HASH_POOL_SIZE=os.environ.get('HASH_POOL_SIZE', '0'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD % json.dumps(config)],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget-ms', type=float, default=float(os.getenv('STARTUP_IMPORT_BUDGET_MS', 600)))
+    parser.add_argument('--boot-budget-ms', type=float, default=float(os.getenv('STARTUP_BOOT_BUDGET_MS', 900)))
+    parser.add_argument('--blueprints', nargs='*', help='only register these blueprints (default: all)')
+    parser.add_argument('--top', type=int, default=15, help='modules to list by self import time')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    config = {} if args.blueprints is None else {'BLUEPRINTS': args.blueprints}
+    timings, modules = [], {}
+    for _ in range(args.runs):
+        timing, imported = run_once(config)
+        timings.append(timing)
+        for name, (self_us, cumulative_us) in imported.items():
+            modules.setdefault(name, []).append((self_us, cumulative_us))
+
+    import_ms = statistics.median(t['import_ms'] for t in timings)
+    boot_ms = statistics.median(t['boot_ms'] for t in timings)
+    slowest = sorted(
+        ((name, statistics.median(s for s, _ in samples) / 1000, statistics.median(c for _, c in samples) / 1000)
+         for name, samples in modules.items()),
+        key=lambda row: row[1], reverse=True
+    )[:args.top]
+
+    print(f'{"module":<40} {"self ms":>9} {"cumulative ms":>14}')
+    for name, self_ms, cumulative_ms in slowest:
+        print(f'{name:<40} {self_ms:>9.2f} {cumulative_ms:>14.2f}')
+    print(f'\nimport app:   {import_ms:8.1f} ms (budget {args.import_budget_ms:.0f} ms)')
+    print(f'create_app(): {boot_ms:8.1f} ms (budget {args.boot_budget_ms:.0f} ms)')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'import_ms': import_ms, 'boot_ms': boot_ms, 'runs': timings,
+                'slowest_modules': [
+                    {'module': name, 'self_ms': self_ms, 'cumulative_ms': cumulative_ms}
+                    for name, self_ms, cumulative_ms in slowest
+                ]
+            }, f, indent=2)
+
+    over = [
+        label for label, value, budget in (
+            ('import', import_ms, args.import_budget_ms),
+            ('boot', boot_ms, args.boot_budget_ms)
+        ) if value > budget
+    ]
+    if over:
+        print(f"OVER BUDGET: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
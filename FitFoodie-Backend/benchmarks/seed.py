@@ -0,0 +1,132 @@
+"""Seed a MongoDB (or mongomock) database with a reproducible FitFoodie dataset
+
+Documents have the same shape as those written by mongo_models, so the
+real blueprints can be benchmarked against them. The dataset is fully
+determined by the sizes and the random seed.
+"""
+from datetime import datetime, timedelta
+import random
+
+from bson import ObjectId
+
+TAGS = [
+    'breakfast', 'lunch', 'dinner', 'snack', 'high-protein', 'low-carb',
+    'vegan', 'vegetarian', 'gluten-free', 'keto', 'quick', 'meal-prep'
+]
+
+WORDS = [
+    'chicken', 'salmon', 'tofu', 'quinoa', 'avocado', 'spinach', 'oats',
+    'egg', 'rice', 'beef', 'lentil', 'yogurt', 'berry', 'banana', 'almond',
+    'broccoli', 'sweet potato', 'chickpea', 'turkey', 'peanut'
+]
+
+SPECIALTIES = ['Nutrition', 'Bodybuilding', 'Vegan', 'Family meals', 'Keto', 'Endurance']
+
+
+def seed(db, users=200, influencers=20, meals=2000, favorites=20, follows=5,
+         password_hash='', random_seed=42):
+    """Drop and refill users, influencers and meals, returning the generated IDs
+
+    ``favorites`` and ``follows`` are per-user counts. ``password_hash`` is
+    stored on every user so logins can be benchmarked with one password.
+    """
+    rng = random.Random(random_seed)
+    start = datetime(2024, 1, 1)
+
+    for name in ('users', 'influencers', 'meals', 'timelines', 'favorites', 'follows'):
+        db[name].delete_many({})
+
+    user_ids = [ObjectId() for _ in range(users)]
+    influencer_user_ids = user_ids[:influencers]
+    influencer_ids = [ObjectId() for _ in range(influencers)]
+    meal_ids = [ObjectId() for _ in range(meals)]
+
+    meal_docs = []
+    for i, meal_id in enumerate(meal_ids):
+        title_words = rng.sample(WORDS, 2)
+        created_at = start + timedelta(minutes=i)
+        prep_time, cook_time = rng.randint(5, 30), rng.randint(0, 60)
+        meal_docs.append({
+            "_id": meal_id,
+            "influencer_id": rng.choice(influencer_ids),
+            "title": f"{title_words[0].title()} and {title_words[1]} bowl {i}",
+            "description": f"A {rng.choice(TAGS)} recipe with {' and '.join(title_words)}",
+            "image_url": f"https://example.com/meals/{i}.jpg",
+            "ingredients": [
+                {"name": word, "amount": f"{rng.randint(10, 300)} g"}
+                for word in rng.sample(WORDS, 6)
+            ],
+            "instructions": "Prep the ingredients, cook and serve. " * 5,
+            "prep_time": prep_time,
+            "cook_time": cook_time,
+            "total_time": prep_time + cook_time,
+            "servings": rng.randint(1, 4),
+            "calories": rng.randint(150, 900),
+            "protein": rng.randint(5, 60),
+            "carbs": rng.randint(5, 100),
+            "fat": rng.randint(2, 40),
+            "tags": rng.sample(TAGS, 3),
+            "affiliate_links": [{"label": "Shop", "url": f"https://shop.example.com/{i}"}],
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+
+    followers = {inf_id: 0 for inf_id in influencer_ids}
+    user_docs = []
+    follow_docs = []
+    for i, user_id in enumerate(user_ids):
+        following = rng.sample(influencer_ids, min(follows, influencers))
+        for j, inf_id in enumerate(following):
+            followers[inf_id] += 1
+            follow_docs.append({"user_id": user_id, "influencer_id": inf_id, "created_at": start + timedelta(seconds=j)})
+        created_at = start + timedelta(hours=i)
+        user_docs.append({
+            "_id": user_id,
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "password_hash": password_hash,
+            "name": f"User {i}",
+            "bio": "",
+            "height": rng.randint(150, 200),
+            "weight": rng.randint(50, 110),
+            "age": rng.randint(18, 70),
+            "activity_level": rng.choice(['sedentary', 'light', 'moderate', 'active']),
+            "dietary_preferences": rng.sample(TAGS, 2),
+            "is_influencer": user_id in influencer_user_ids,
+            "following_count": len(following),
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+
+    influencer_docs = []
+    for i, (inf_id, user_id) in enumerate(zip(influencer_ids, influencer_user_ids)):
+        created_at = start + timedelta(days=i)
+        influencer_docs.append({
+            "_id": inf_id,
+            "user_id": user_id,
+            "specialty": rng.choice(SPECIALTIES),
+            "social_media_links": {"instagram": f"influencer{i}"},
+            "verified": False,
+            "followers_count": followers[inf_id],
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+
+    favorite_docs = [
+        {"user_id": user_id, "meal_id": meal_id, "created_at": start + timedelta(seconds=j)}
+        for user_id in user_ids
+        for j, meal_id in enumerate(rng.sample(meal_ids, min(favorites, meals)))
+    ]
+
+    for name, docs in (('users', user_docs), ('influencers', influencer_docs), ('meals', meal_docs),
+                       ('favorites', favorite_docs), ('follows', follow_docs)):
+        for offset in range(0, len(docs), 1000):
+            db[name].insert_many(docs[offset:offset + 1000])
+
+    return {
+        "user_ids": user_ids,
+        "influencer_ids": influencer_ids,
+        "meal_ids": meal_ids,
+        "tags": TAGS,
+        "words": WORDS
+    }
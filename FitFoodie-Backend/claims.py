@@ -0,0 +1,77 @@
+"""Identity claims carried in access tokens
+
+Tokens carry the user's role (``is_influencer``) and influencer profile ID
+(``influencer_id``) so routes that need them can authorize without
+looking up the user or influencer. ``claims_version`` is a per-user
+counter bumped whenever the role changes (User.set_influencer): a token
+with an older version is refused as revoked (User.claims_are_current),
+and endpoints that change the role hand back a fresh token. The check
+reads the version through process-local caches, so a role change made
+through another process revokes old tokens here within ENTITY_CACHE_TTL
+seconds; the process that made the change refuses them at once. Tokens issued before claims existed are
+still accepted by routes that only need the identity.
+"""
+from datetime import timedelta
+from functools import wraps
+
+from bson import ObjectId
+from flask import jsonify
+from flask_jwt_extended import create_access_token, get_jwt, jwt_required
+
+from mongo_models import Influencer, User
+
+ACCESS_TOKEN_EXPIRES = timedelta(days=1)
+
+
+def token_claims(user, influencer_id=None):
+    """Return the additional claims for ``user``'s access token"""
+    if user.get('is_influencer') and influencer_id is None:
+        influencer = Influencer.get_by_user_id(user['_id'])
+        influencer_id = influencer['_id'] if influencer else None
+
+    return {
+        'is_influencer': bool(user.get('is_influencer')),
+        'influencer_id': str(influencer_id) if influencer_id else None,
+        'claims_version': user.get('claims_version', 0)
+    }
+
+
+def create_user_token(user, influencer_id=None):
+    """Issue an access token for ``user`` carrying its identity claims"""
+    return create_access_token(
+        identity=str(user['_id']),
+        expires_delta=ACCESS_TOKEN_EXPIRES,
+        additional_claims=token_claims(user, influencer_id)
+    )
+
+
+def is_revoked(jwt_payload):
+    """token_in_blocklist_loader: refuse tokens whose role claims are known to be outdated"""
+    if 'claims_version' not in jwt_payload:
+        return False
+    return not User.claims_are_current(jwt_payload['sub'], jwt_payload['claims_version'])
+
+
+def influencer_required(action):
+    """Require a token for an influencer with a profile, without touching MongoDB
+
+    The route receives the influencer's ObjectId as ``influencer_id``.
+    ``action`` completes the 403 message, e.g. ``'create meals'``.
+    """
+    def decorator(view):
+        @wraps(view)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            claims = get_jwt()
+            if 'claims_version' not in claims:
+                return jsonify({'error': 'Token predates role claims, please log in again'}), 401
+
+            if not claims.get('is_influencer'):
+                return jsonify({'error': f'Only influencers can {action}'}), 403
+
+            if not claims.get('influencer_id'):
+                return jsonify({'error': 'Influencer profile not found'}), 404
+
+            return view(*args, influencer_id=ObjectId(claims['influencer_id']), **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,133 @@
+"""Per-process MongoClient, created lazily from environment configuration
+
+A MongoClient must not be shared across ``fork()``: its pooled sockets and
+monitor threads belong to the parent. ``get_client`` builds the client on
+first use and rebuilds it whenever it is called from a new process, so
+importing the models (in tests, CLI commands or a preloading gunicorn
+master) opens no connections. ``db`` stands in for the application
+database and resolves to the current process's client on every access.
+``warm_pool`` opens connections ahead of traffic; gunicorn.conf.py calls it
+from ``post_fork``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+from pymongo import MongoClient
+
+from metrics import mongo_listener
+
+DEFAULT_URI = 'mongodb://localhost:27017/fitfoodie'
+
+# Environment variable -> MongoClient option; unset variables keep pymongo's defaults
+INT_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': 'maxPoolSize',
+    'MONGO_MIN_POOL_SIZE': 'minPoolSize',
+    'MONGO_MAX_IDLE_TIME_MS': 'maxIdleTimeMS',
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': 'waitQueueTimeoutMS',
+    'MONGO_CONNECT_TIMEOUT_MS': 'connectTimeoutMS',
+    'MONGO_SOCKET_TIMEOUT_MS': 'socketTimeoutMS',
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': 'serverSelectionTimeoutMS',
+}
+STRING_OPTIONS = {
+    'MONGO_COMPRESSORS': 'compressors',  # e.g. "zstd,snappy,zlib"
+    'MONGO_APP_NAME': 'appname',
+}
+
+_lock = threading.Lock()
+_client = None
+_database = None
+_pid = None
+_async_client = None
+_async_pid = None
+
+
+def client_options():
+    """Return the MongoClient keyword arguments configured in the environment"""
+    options = {'event_listeners': [mongo_listener]}
+    for variable, option in INT_OPTIONS.items():
+        if os.getenv(variable):
+            options[option] = int(os.getenv(variable))
+    for variable, option in STRING_OPTIONS.items():
+        if os.getenv(variable):
+            options[option] = os.getenv(variable)
+    return options
+
+
+def get_client():
+    """Return this process's MongoClient, creating it on first use"""
+    global _client, _database, _pid
+    pid = os.getpid()
+    if _client is not None and _pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _pid != pid:
+            # A client inherited through fork is abandoned rather than closed,
+            # since closing it would act on sockets the parent still owns
+            _client = MongoClient(os.getenv('MONGODB_URI', DEFAULT_URI), **client_options())
+            _database = _client.get_database()
+            _pid = pid
+        return _client
+
+
+def get_db():
+    """Return the database named in MONGODB_URI"""
+    if _pid != os.getpid():
+        get_client()
+    return _database
+
+
+def close_client():
+    """Close this process's client, if it has one"""
+    global _client, _database, _pid
+    with _lock:
+        if _client is not None and _pid == os.getpid():
+            _client.close()
+        _client = None
+        _database = None
+        _pid = None
+
+
+def warm_pool(connections=None):
+    """Open ``connections`` pooled connections now instead of on the first requests
+
+    Defaults to MONGO_MIN_POOL_SIZE (at least one). Concurrent pings force
+    the pool to open a connection per ping.
+    """
+    if connections is None:
+        connections = max(1, client_options().get('minPoolSize', 1))
+    client = get_client()
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        list(executor.map(lambda _: client.admin.command('ping'), range(connections)))
+
+
+def get_async_db():
+    """Return the motor database for the ASGI mode (asgi.py), creating its client on first use
+
+    motor is only needed for that mode (requirements-async.txt). The client
+    shares the pool settings above and, like the sync client, is rebuilt
+    in a new process.
+    """
+    global _async_client, _async_pid
+    if _async_client is None or _async_pid != os.getpid():
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _async_client = AsyncIOMotorClient(os.getenv('MONGODB_URI', DEFAULT_URI), **client_options())
+        _async_pid = os.getpid()
+    return _async_client.get_database()
+
+
+class LazyDatabase:
+    """Proxy for the application Database that always uses the current process's client"""
+
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+    def __getitem__(self, name):
+        return get_db()[name]
+
+    def __repr__(self):
+        return '<LazyDatabase>'
+
+
+db = LazyDatabase()
@@ -0,0 +1,55 @@
+"""Serialize meal exports as NDJSON or CSV, one chunk per batch
+
+Both formats consume the batches produced by ``Meal.export_batches`` and
+yield one string per batch, so a streamed response or file write never
+holds more than one batch in memory.
+"""
+import csv
+import io
+import json
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CSV_COLUMNS = [
+    'id', 'title', 'description', 'influencer_id', 'influencer', 'image_url',
+    'instructions', 'prep_time', 'cook_time', 'total_time', 'servings',
+    'calories', 'protein', 'carbs', 'fat', 'tags', 'ingredients',
+    'affiliate_links', 'created_at', 'updated_at'
+]
+
+
+def ndjson_chunks(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(meal, separators=(',', ':')) + '\n' for meal in batch)
+
+
+def csv_chunks(batches):
+    """CSV with one row per meal; tags are comma-joined and nested fields JSON-encoded"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+
+    writer.writeheader()
+    for batch in batches:
+        for meal in batch:
+            row = dict(meal)
+            row['tags'] = ','.join(meal.get('tags') or [])
+            for key in ('ingredients', 'affiliate_links'):
+                row[key] = json.dumps(meal.get(key) or [], separators=(',', ':'))
+            writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # A catalog with no matching meals still gets its header
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_chunks(batches, fmt):
+    """Return a generator of strings for ``fmt`` (a key of EXPORT_FORMATS)"""
+    if fmt == 'csv':
+        return csv_chunks(batches)
+    return ndjson_chunks(batches)
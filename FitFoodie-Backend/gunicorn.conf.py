@@ -0,0 +1,34 @@
+"""Gunicorn settings for the FitFoodie API
+
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+Each worker builds its own MongoClient after fork (see database.py) and
+opens its pool before accepting requests, so the first requests do not
+pay for connection setup. Once the app is loaded, each worker runs the
+readiness check (which ensures indexes) in the background.
+"""
+import os
+import threading
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+
+def post_fork(server, worker):
+    from pymongo.errors import PyMongoError
+    from database import warm_pool
+
+    try:
+        warm_pool()
+    except PyMongoError as e:
+        # The pool fills on demand instead; don't keep the worker from booting
+        worker.log.warning('Could not pre-warm the MongoDB pool: %s', e)
+
+
+def post_worker_init(worker):
+    from app import check_readiness
+
+    # In the background so an unreachable database cannot stall worker boot
+    threading.Thread(target=check_readiness, args=(worker.wsgi,), daemon=True).start()
@@ -0,0 +1,112 @@
+"""Password hashing offloaded to a bounded process pool
+
+The KDF behind werkzeug's password hashes is deliberately CPU-bound, so
+running it on a request thread stalls every other request handled by the
+same gunicorn worker. ``HashingService`` runs it in a small process pool
+instead and sheds load with ``HashingPoolSaturated`` (served as a 503)
+once the number of in-flight hashes reaches pool size plus queue depth.
+
+Configuration comes from the environment:
+
+- ``PASSWORD_HASH_METHOD``: werkzeug method string, e.g. ``scrypt:32768:8:1``
+  or ``pbkdf2:sha256:600000``. Stored hashes made with any other method
+  are upgraded the next time the user logs in.
+- ``HASH_POOL_SIZE``: worker processes per app process (0 hashes inline).
+  Defaults to the CPU count divided by gunicorn's ``WEB_CONCURRENCY``, so
+  the pools of all workers together match the host's cores.
+- ``HASH_QUEUE_DEPTH``: hashes allowed to wait for a free worker.
+- ``HASH_TIMEOUT``: seconds to wait for a result before giving up; a
+  timed-out hash is shed like a full pool.
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+import multiprocessing
+import os
+import threading
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the hashing pool is full and the request should be shed"""
+
+
+def _method_prefix(method):
+    """Return the parameter prefix werkzeug stores for ``method``"""
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+class HashingService:
+    def __init__(self, method, pool_size, queue_depth, timeout):
+        self.method = method
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(pool_size + queue_depth) if pool_size else None
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._prefix = None
+
+    def _get_executor(self):
+        # Pools do not survive a fork, so each process builds its own. Workers
+        # are spawned rather than forked from a multi-threaded server process.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self.pool_size:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated('Password hashing is at capacity, try again shortly')
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashingPoolSaturated('Password hashing timed out, try again shortly') from None
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash"""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Check whether a stored hash was made with outdated parameters"""
+        if self._prefix is None:
+            self._prefix = self._run(_method_prefix, self.method)
+        return password_hash.split('$', 1)[0] != self._prefix
+
+    def shutdown(self):
+        """Stop the worker processes owned by this process"""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def default_pool_size():
+    """The host's cores shared between gunicorn's worker processes, at least one each"""
+    workers = max(int(os.getenv('WEB_CONCURRENCY', 2)), 1)
+    return max((os.cpu_count() or 1) // workers, 1)
+
+
+password_hasher = HashingService(
+    method=os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+    pool_size=int(os.getenv('HASH_POOL_SIZE', default_pool_size())),
+    queue_depth=int(os.getenv('HASH_QUEUE_DEPTH', 16)),
+    timeout=float(os.getenv('HASH_TIMEOUT', 10))
+)
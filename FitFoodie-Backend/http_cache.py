@@ -0,0 +1,48 @@
+"""Conditional GET support for read endpoints
+
+Routes compute a cheap version of the resource (normally from
+``updated_at``), turn it into a strong ETag with ``make_etag``, and hand
+serialization to ``conditional_response`` as a callable. If the client's
+``If-None-Match`` already names that ETag, a 304 is returned and the body
+is never built.
+"""
+from datetime import datetime
+import hashlib
+import os
+from flask import current_app, make_response, request
+
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', 30))
+
+
+def make_etag(*parts):
+    """Build a strong ETag value from the parts that identify a representation"""
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, datetime):
+            part = part.isoformat()
+        digest.update(repr(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def conditional_response(etag, build):
+    """Return 304 if the request's If-None-Match matches ``etag``, else the response from ``build()``
+
+    Anonymous requests get a public Cache-Control so shared caches can
+    hold the response; requests carrying credentials are marked private.
+    """
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(build())
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control('Authorization' in request.headers)
+    return response
+
+
+def cache_control(authorized):
+    """Cache-Control for a cacheable read, private when the request carries credentials"""
+    if authorized:
+        return 'private, no-cache'
+    return f'public, max-age={HTTP_CACHE_MAX_AGE}'
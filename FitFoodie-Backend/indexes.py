@@ -0,0 +1,182 @@
+"""Declarative registry of the MongoDB indexes the API relies on
+
+Every index a query depends on is declared here, next to the query shape
+it serves, instead of being created ad hoc. ``ensure_indexes`` applies the
+registry at startup (or via ``flask indexes ensure``), and
+``index_report`` uses ``$indexStats`` to flag declared indexes that are
+missing and live indexes that are undeclared or unused.
+"""
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+MEAL_RANGE_KEYS = [
+    ('calories', ASCENDING),
+    ('protein', ASCENDING),
+    ('carbs', ASCENDING),
+    ('fat', ASCENDING),
+    ('total_time', ASCENDING),
+]
+
+INDEXES = {
+    'users': [
+        IndexModel([('username', ASCENDING)], name='users_username', unique=True),
+        IndexModel([('email', ASCENDING)], name='users_email', unique=True),
+        # Meal.get_names_version, for meal ETags
+        IndexModel([('is_influencer', ASCENDING), ('updated_at', DESCENDING)], name='users_influencer_updated_at'),
+    ],
+    'influencers': [
+        IndexModel([('user_id', ASCENDING)], name='influencers_user_id', unique=True),
+        IndexModel([('specialty', ASCENDING)], name='influencers_specialty'),
+        # Influencer.get_all, newest first and by followers, with keyset cursors
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='influencers_created_at'),
+        IndexModel([('followers_count', DESCENDING), ('_id', DESCENDING)], name='influencers_followers_count'),
+        # Influencer.get_list_version, for list ETags
+        IndexModel([('updated_at', DESCENDING)], name='influencers_updated_at'),
+    ],
+    'meals': [
+        # Meal.get_all: unfiltered, by influencer and by tag, newest first.
+        # Following equality-sort-range, the nutrition fields trail the sort
+        # keys so range filters are applied to index keys before fetching.
+        IndexModel(
+            [('created_at', DESCENDING), ('_id', DESCENDING)] + MEAL_RANGE_KEYS,
+            name='meals_created_at_macros'
+        ),
+        IndexModel(
+            [('influencer_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)] + MEAL_RANGE_KEYS,
+            name='meals_influencer_created_at_macros'
+        ),
+        IndexModel(
+            [('tags', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)] + MEAL_RANGE_KEYS,
+            name='meals_tags_created_at_macros'
+        ),
+        # Meal.get_list_version, for list ETags
+        IndexModel([('updated_at', DESCENDING)], name='meals_updated_at'),
+        IndexModel([('influencer_id', ASCENDING), ('updated_at', DESCENDING)], name='meals_influencer_updated_at'),
+        IndexModel([('tags', ASCENDING), ('updated_at', DESCENDING)], name='meals_tags_updated_at'),
+        # Meal.search
+        IndexModel(
+            [('title', TEXT), ('description', TEXT), ('tags', TEXT), ('ingredients.name', TEXT)],
+            name='meal_text',
+            weights={'title': 10, 'tags': 5, 'ingredients.name': 3, 'description': 1}
+        ),
+    ],
+    'timelines': [
+        # User.get_feed for users over the fan-out threshold
+        IndexModel(
+            [('user_id', ASCENDING), ('created_at', DESCENDING), ('meal_id', DESCENDING)],
+            name='timelines_user_created_at'
+        ),
+        # Makes fan-out and backfill idempotent
+        IndexModel([('user_id', ASCENDING), ('meal_id', ASCENDING)], name='timelines_user_meal', unique=True),
+        # Meal.delete
+        IndexModel([('meal_id', ASCENDING)], name='timelines_meal_id'),
+    ],
+    'follows': [
+        # One edge per user and influencer; also User.is_following
+        IndexModel([('user_id', ASCENDING), ('influencer_id', ASCENDING)], name='follows_user_influencer', unique=True),
+        # User.get_following and Influencer.get_followers, newest first with keyset cursors
+        IndexModel(
+            [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+            name='follows_user_created_at'
+        ),
+        IndexModel(
+            [('influencer_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+            name='follows_influencer_created_at'
+        ),
+        # Meal.fan_out: followers of an influencer who have a timeline
+        IndexModel(
+            [('influencer_id', ASCENDING)],
+            name='follows_influencer_timeline',
+            partialFilterExpression={'timeline_enabled': True}
+        ),
+    ],
+    'favorites': [
+        # One edge per user and meal; makes favoriting idempotent
+        IndexModel([('user_id', ASCENDING), ('meal_id', ASCENDING)], name='favorites_user_meal', unique=True),
+        # User.get_favorites, newest first with keyset cursors
+        IndexModel(
+            [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+            name='favorites_user_created_at'
+        ),
+        # Meal.delete
+        IndexModel([('meal_id', ASCENDING)], name='favorites_meal_id'),
+    ],
+}
+
+
+def _key(key):
+    """Normalise an index key so declared and live indexes compare equal
+
+    Live text indexes are reported with the internal ``_fts`` key rather
+    than the fields they cover, so every text index maps to the same key.
+    """
+    items = list(key.items()) if hasattr(key, 'items') else list(key)
+    if any(direction == TEXT for _, direction in items) or ('_fts', TEXT) in items:
+        return (('_fts', TEXT),)
+    return tuple((field, int(direction)) for field, direction in items)
+
+
+def _live_indexes(collection):
+    """Return ``{key: name}`` for the indexes that exist on ``collection``"""
+    return {_key(info['key']): name for name, info in collection.index_information().items()}
+
+
+def missing_indexes(db):
+    """Return ``{collection: [IndexModel]}`` for declared indexes that do not exist
+
+    Indexes are matched on their key, so an existing index with the same
+    key under a different name counts as present.
+    """
+    missing = {}
+    for collection_name, indexes in INDEXES.items():
+        live = _live_indexes(db[collection_name])
+        absent = [index for index in indexes if _key(index.document['key']) not in live]
+        if absent:
+            missing[collection_name] = absent
+    return missing
+
+
+def ensure_indexes(db, commit_quorum=None, log=print):
+    """Create any missing declared indexes, one build at a time
+
+    Builds run sequentially so at most one index build competes with live
+    traffic at a time. ``commit_quorum`` is passed through to
+    ``createIndexes`` on replica sets (MongoDB 4.4+). Returns the names of
+    the indexes that were created.
+    """
+    created = []
+    for collection_name, indexes in missing_indexes(db).items():
+        for index in indexes:
+            name = index.document['name']
+            log(f'Building index {collection_name}.{name}')
+            kwargs = {'commitQuorum': commit_quorum} if commit_quorum is not None else {}
+            db[collection_name].create_indexes([index], **kwargs)
+            created.append(f'{collection_name}.{name}')
+    return created
+
+
+def index_report(db):
+    """Compare live indexes with the registry using ``$indexStats``
+
+    Returns ``{collection: {"missing": [...], "undeclared": [...], "unused": [...]}}``
+    where ``unused`` lists declared indexes with no recorded accesses since
+    the server last restarted.
+    """
+    missing = missing_indexes(db)
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        declared = {_key(index.document['key']) for index in indexes}
+        live = {name: key for key, name in _live_indexes(db[collection_name]).items()}
+        stats = db[collection_name].aggregate([{"$indexStats": {}}])
+
+        report[collection_name] = {
+            "missing": [index.document['name'] for index in missing.get(collection_name, [])],
+            "undeclared": sorted(
+                name for name, key in live.items()
+                if key not in declared and name != '_id_'
+            ),
+            "unused": sorted(
+                stat['name'] for stat in stats
+                if live.get(stat['name']) in declared and stat['accesses']['ops'] == 0
+            ),
+        }
+    return report
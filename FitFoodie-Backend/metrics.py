@@ -0,0 +1,259 @@
+"""Per-request MongoDB instrumentation and Prometheus metrics
+
+``mongo_listener`` is registered on the MongoClient and attributes every
+command to the request that issued it, by collection and command name.
+``init_app`` (and asgi.py, for the routes it serves natively) folds each
+request's share into process-wide counters and histograms, which
+``render_metrics`` exposes in the Prometheus text format, and reports it
+as a ``Server-Timing`` header to operators only (see
+``server_timing_allowed``), as it reveals the queries behind a route.
+Metrics are kept per process, so scrape each worker (or aggregate them)
+when running several.
+"""
+from contextvars import ContextVar
+import threading
+import time
+
+from flask import g, request
+from pymongo import monitoring
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Mongo commands issued by one request; high counts point at N+1 loops
+COMMAND_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# RequestStats of the request being handled in this context
+_current_request = ContextVar('mongo_request_stats', default=None)
+
+
+class RequestStats:
+    """Mongo commands and time spent by one request, per (collection, command)"""
+
+    def __init__(self):
+        self.commands = 0
+        self.duration = 0.0
+        self.by_operation = {}
+        # Concurrent motor operations of one ASGI request report from several threads
+        self._lock = threading.Lock()
+
+    def record(self, collection, command, duration):
+        with self._lock:
+            self.commands += 1
+            self.duration += duration
+            count, total = self.by_operation.get((collection, command), (0, 0.0))
+            self.by_operation[(collection, command)] = (count + 1, total + duration)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = _labels(self.label_names, labels)
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{base}}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{{base}}} {series["count"]}')
+        return lines
+
+
+class Counter:
+    """Prometheus counter keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{_labels(self.label_names, labels)}}} {value}')
+        return lines
+
+
+def _labels(names, values):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in values)
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+request_duration = Histogram(
+    'fitfoodie_http_request_duration_seconds', 'HTTP request latency by blueprint',
+    ('blueprint', 'method'), LATENCY_BUCKETS
+)
+request_mongo_commands = Histogram(
+    'fitfoodie_http_request_mongo_commands', 'MongoDB commands issued per HTTP request',
+    ('blueprint', 'endpoint'), COMMAND_COUNT_BUCKETS
+)
+request_mongo_duration = Histogram(
+    'fitfoodie_http_request_mongo_duration_seconds', 'Time per HTTP request spent waiting on MongoDB',
+    ('blueprint',), LATENCY_BUCKETS
+)
+requests_total = Counter(
+    'fitfoodie_http_requests_total', 'HTTP requests by blueprint and status',
+    ('blueprint', 'method', 'status')
+)
+mongo_commands_total = Counter(
+    'fitfoodie_mongo_commands_total', 'MongoDB commands by collection and command',
+    ('collection', 'command')
+)
+mongo_command_seconds = Counter(
+    'fitfoodie_mongo_command_duration_seconds_total', 'Time spent in MongoDB commands by collection and command',
+    ('collection', 'command')
+)
+mongo_command_failures = Counter(
+    'fitfoodie_mongo_command_failures_total', 'Failed MongoDB commands by collection and command',
+    ('collection', 'command')
+)
+
+_METRICS = (
+    request_duration, request_mongo_commands, request_mongo_duration, requests_total,
+    mongo_commands_total, mongo_command_seconds, mongo_command_failures
+)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Attribute each command's duration to the current request and collection
+
+    pymongo publishes events on the thread that runs the operation, so the
+    request context variable set in ``before_request`` is visible here.
+    """
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            # getMore names the cursor; collection-less commands use the database
+            collection = event.command.get('collection', event.database_name)
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event):
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), 'unknown')
+        labels = (collection, event.command_name)
+        duration = event.duration_micros / 1e6
+
+        mongo_commands_total.inc(labels)
+        mongo_command_seconds.inc(labels, duration)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.record(collection, event.command_name, duration)
+        return labels
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        mongo_command_failures.inc(self._finish(event))
+
+
+mongo_listener = MongoCommandListener()
+
+
+def current_request_stats():
+    """Return the RequestStats of the request being handled, or None"""
+    return _current_request.get()
+
+
+def server_timing(stats, total):
+    """Format a Server-Timing header value for one request"""
+    entries = [
+        f'app;dur={total * 1000:.2f}',
+        f'mongo;dur={stats.duration * 1000:.2f};desc="{stats.commands} commands"'
+    ]
+    for (collection, command), (count, duration) in sorted(stats.by_operation.items()):
+        entries.append(f'mongo.{collection}.{command};dur={duration * 1000:.2f};desc="{count}"')
+    return ', '.join(entries)
+
+
+def start_request():
+    """Start attributing Mongo commands to a new request, returning the state for finish_request"""
+    return time.perf_counter(), _current_request.set(RequestStats())
+
+
+def finish_request(state, blueprint, endpoint, method, status):
+    """Record a finished request in the metrics, returning its Server-Timing header value"""
+    start, token = state
+    stats = _current_request.get()
+    _current_request.reset(token)
+    total = time.perf_counter() - start
+
+    request_duration.observe((blueprint, method), total)
+    request_mongo_commands.observe((blueprint, endpoint or 'unmatched'), stats.commands)
+    request_mongo_duration.observe((blueprint,), stats.duration)
+    requests_total.inc((blueprint, method, str(status)))
+    return server_timing(stats, total)
+
+
+def server_timing_allowed(app, headers):
+    """Whether a response may carry Server-Timing
+
+    Only in debug mode, or for a request sending the ``METRICS_TOKEN``
+    scrapers use for /metrics in an ``X-Metrics-Token`` header.
+    """
+    if app.debug:
+        return True
+    token = app.config.get('METRICS_TOKEN')
+    return bool(token) and headers.get('X-Metrics-Token') == token
+
+
+def init_app(app):
+    """Time every request and attach its Mongo usage as a Server-Timing header for operators"""
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_state = start_request()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        state = g.pop('metrics_state', None)
+        if state is None:
+            return response
+
+        timing = finish_request(
+            state, request.blueprint or 'app', request.endpoint, request.method, response.status_code
+        )
+        if server_timing_allowed(app, request.headers):
+            response.headers['Server-Timing'] = timing
+        return response
+
+
+def render_metrics():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
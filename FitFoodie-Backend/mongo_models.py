@@ -1,35 +1,267 @@
-from pymongo import MongoClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from pymongo.collection import Collection
 from pymongo.database import Database
+from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
+import base64
 import json
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
+from hashing import password_hasher
+from cache import TTLCache
+from search_index import meal_search_index
+from database import db  # Connects lazily, once per process
+
+# Users following more than this many influencers read their feed from a
+# precomputed timeline instead of one $in query over everyone they follow
+FEED_FANOUT_THRESHOLD = int(os.getenv('FEED_FANOUT_THRESHOLD', 100))
+TIMELINE_BACKFILL = int(os.getenv('TIMELINE_BACKFILL', 1000))
+
+# Largest page any listing returns; larger per_page values are clamped to it
+MAX_PER_PAGE = int(os.getenv('MAX_PER_PAGE', 100))
+
+# Process-local caches for the lookups nearly every request makes
+ENTITY_CACHE_SIZE = int(os.getenv('ENTITY_CACHE_SIZE', 10000))
+ENTITY_CACHE_TTL = float(os.getenv('ENTITY_CACHE_TTL', 30))
+user_cache = TTLCache('users', ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL)
+influencer_cache = TTLCache('influencers', ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL)
+influencer_id_by_user_cache = TTLCache('influencer_ids_by_user', ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL)
+# claims_version of users read only to check a token (User.claims_are_current)
+claims_version_cache = TTLCache('claims_versions', ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL)
+
+# Meal plans built by recommendations.plan_meals, keyed by user ID and
+# checked against recommendations.plan_version on every read
+MEAL_PLAN_CACHE_TTL = float(os.getenv('MEAL_PLAN_CACHE_TTL', 3600))
+meal_plan_cache = TTLCache('meal_plans', ENTITY_CACHE_SIZE, MEAL_PLAN_CACHE_TTL)
+
+
+def entity_cache_stats():
+    """Return counters for every entity and meal plan cache, keyed by cache name"""
+    return {
+        cache.name: cache.stats()
+        for cache in (user_cache, influencer_cache, influencer_id_by_user_cache, claims_version_cache,
+                      meal_plan_cache)
+    }
+
+
+def encode_cursor(value, doc_id):
+    """Build an opaque pagination cursor from a sort key and a document ID"""
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    payload = json.dumps([value, str(doc_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor built by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value['$date'])
+        return value, ObjectId(doc_id)
+    except (ValueError, TypeError, KeyError, InvalidId):
+        raise ValueError('Invalid cursor')
+
+
+def decode_json_field(value):
+    """Turn a legacy JSON-encoded string field into its structured value
+
+    Structured values are returned unchanged, as are strings that are not
+    valid JSON.
+    """
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def total_time(prep_time, cook_time):
+    """Sum prep and cook time, ignoring missing or non-numeric parts"""
+    parts = [
+        value for value in (prep_time, cook_time)
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+    return sum(parts) if parts else None
+
+
+def summarize_histogram(bins, width, percentiles):
+    """Turn per-bin counts from Meal.get_stats into a histogram, summary and percentiles
+
+    Each bin carries its own count, min, max and sum, so count, min, max
+    and mean are exact. Percentiles are interpolated inside the bin that
+    holds them, so they are accurate to within one bin width.
+    """
+    bins = sorted(bins, key=lambda b: b['_id'])
+    count = sum(b['count'] for b in bins)
+    if not count:
+        return {"count": 0, "min": None, "max": None, "mean": None, "percentiles": {}, "histogram": []}
+
+    result = {
+        "count": count,
+        "min": min(b['min'] for b in bins),
+        "max": max(b['max'] for b in bins),
+        "mean": round(sum(b['sum'] for b in bins) / count, 2),
+        "percentiles": {},
+        "histogram": [
+            {"min": b['_id'], "max": b['_id'] + width, "count": b['count']}
+            for b in bins
+        ]
+    }
+
+    for pct in percentiles:
+        rank = pct / 100 * (count - 1)
+        seen = 0
+        for b in bins:
+            if rank < seen + b['count']:
+                fraction = (rank - seen) / (b['count'] - 1) if b['count'] > 1 else 0
+                result["percentiles"][f"p{pct}"] = round(b['min'] + fraction * (b['max'] - b['min']), 2)
+                break
+            seen += b['count']
+
+    return result
+
+
+def split_tags(tags):
+    """Split a comma-separated tag string into a list, dropping blank entries"""
+    return [tag.strip() for tag in tags.split(',') if tag.strip()]
+
+
+def requested_fields(fields, default):
+    """Parse a ``fields=`` request parameter into a list of names, or None for ``"*"``
+
+    ``fields`` is a comma-separated string (or list) of API field names;
+    an empty value selects ``default``.
+    """
+    if fields == '*':
+        return None
+    if not fields:
+        return list(default)
+    if isinstance(fields, str):
+        return [name.strip() for name in fields.split(',') if name.strip()]
+    return list(fields)
+
+
+def field_projection(fields, allowed, default, aliases=None, always=()):
+    """Turn a ``fields=`` request parameter into a Mongo projection
+
+    Returns None (every field) for ``"*"``. ``aliases`` maps output-only
+    names to the stored field they are built from, and ``always`` lists
+    fields the caller needs regardless, such as the pagination sort key.
+    Unknown names raise ValueError.
+    """
+    fields = requested_fields(fields, default)
+    if fields is None:
+        return None
+
+    aliases = aliases or {}
+    unknown = [name for name in fields if name not in allowed and name not in aliases and name != 'id']
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+
+    projection = {"_id": 1}
+    for name in list(fields) + list(always):
+        if name != 'id':
+            projection[aliases.get(name, name)] = 1
+    return projection
+
+
+def select_fields(items, fields, default):
+    """Trim serialized documents to the requested ``fields=`` names plus ``id``
+
+    A projection also reads fields the response was not asked for (the
+    ``always`` sort key, the stored field behind an alias); this drops
+    them so the output matches the request.
+    """
+    names = requested_fields(fields, default)
+    if names is None:
+        return items
+    keep = ['id'] + [name for name in names if name != 'id']
+    return [{key: item[key] for key in keep if key in item} for item in items]
+
+
+def insert_timeline_entries(entries, batch_size=1000):
+    """Insert timeline entries, ignoring ones that already exist"""
+    for offset in range(0, len(entries), batch_size):
+        try:
+            db.timelines.insert_many(entries[offset:offset + batch_size], ordered=False)
+        except BulkWriteError as e:
+            # Fan-out and backfill may race to add the same meal
+            if any(error['code'] != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+
+
+def page_size(per_page, page=1):
+    """Clamp a requested ``per_page`` to ``[1, MAX_PER_PAGE]``, raising ValueError for a ``page`` below 1"""
+    if page is not None and page < 1:
+        raise ValueError('page must be at least 1')
+    return min(max(per_page, 1), MAX_PER_PAGE)
+
+
+def page_spec(query, page=1, per_page=10, cursor=None, sort_field='created_at', id_field='_id'):
+    """Return ``(query, sort, skip, per_page)`` for one newest-first page; see paginate
+
+    ``per_page`` comes back clamped by page_size; callers use it for the
+    query limit, page_result and page_counts.
+    """
+    per_page = page_size(per_page, None if cursor else page)
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        keyset = {"$or": [
+            {sort_field: {"$lt": value}},
+            {sort_field: value, id_field: {"$lt": last_id}}
+        ]}
+        query = {"$and": [query, keyset]} if query else keyset
+    skip = (page - 1) * per_page if page is not None and not cursor else 0
+    return query, [(sort_field, -1), (id_field, -1)], skip, per_page
+
+
+def page_result(docs, per_page, sort_field='created_at', id_field='_id'):
+    """Trim the extra document fetched by a page query, returning ``(docs, next_cursor)``"""
+    if len(docs) <= per_page:
+        return docs, None
+    docs = docs[:per_page]
+    last = docs[-1]
+    return docs, encode_cursor(last.get(sort_field), last[id_field])
+
+
+def page_counts(total, page, per_page):
+    return {
+        "total": total,
+        "pages": (total + per_page - 1) // per_page,  # Ceiling division
+        "current_page": page
+    }
+
+
+def paginate(collection, query, page=1, per_page=10, cursor=None, sort_field='created_at', id_field='_id',
+             projection=None, total=None):
+    """Fetch one newest-first page of ``query`` from ``collection``
+
+    With a ``cursor`` the page is found by seeking the ``(sort_field, id_field)``
+    index past the last document of the previous page, so the cost does not
+    grow with depth and no total is computed. Without one, the legacy
+    ``page`` offset is used and ``total``/``pages``/``current_page`` are
+    returned as before; ``page=None`` starts a cursor-only listing without
+    counting. Every mode returns ``next_cursor``. A ``projection`` must
+    include ``sort_field``. Pass ``total`` if the caller already counted
+    ``query``. ``per_page`` is clamped to ``[1, MAX_PER_PAGE]``.
+    """
+    page_query, sort_order, skip, per_page = page_spec(query, page, per_page, cursor, sort_field, id_field)
+
+    pagination = {}
+    if page is not None and not cursor:
+        if total is None:
+            total = collection.count_documents(query)
+        pagination = page_counts(total, page, per_page)
+
+    docs = list(collection.find(page_query, projection).sort(sort_order).skip(skip).limit(per_page + 1))
+
+    docs, pagination["next_cursor"] = page_result(docs, per_page, sort_field, id_field)
+    return docs, pagination
 
-# Initialize MongoDB client
-client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/fitfoodie'))
-db = client.get_database()
-
-# Define ObjectId class for compatibility
-class ObjectId:
-    @staticmethod
-    def is_valid(id_str):
-        """Check if a string is a valid ObjectId"""
-        if not isinstance(id_str, str):
-            return False
-        return len(id_str) == 24 and all(c in '0123456789abcdefABCDEF' for c in id_str)
-
-    def __init__(self, id_str=None):
-        """Initialize an ObjectId from a string"""
-        self.id = id_str
-
-    def __str__(self):
-        return self.id
-
-    def __eq__(self, other):
-        if isinstance(other, ObjectId):
-            return self.id == other.id
-        return self.id == other
 
 class User:
     @staticmethod
@@ -39,15 +271,17 @@ class User:
         user = {
             "username": username,
             "email": email,
-            "password_hash": generate_password_hash(password),
+            "password_hash": password_hasher.hash(password),
             "name": name,
             "bio": bio,
             "height": height,
             "weight": weight,
             "age": age,
             "activity_level": activity_level,
-            "dietary_preferences": dietary_preferences.split(',') if dietary_preferences else [],
+            "dietary_preferences": split_tags(dietary_preferences) if dietary_preferences else [],
             "is_influencer": False,
+            "following_count": 0,
+            "claims_version": 0,  # Bumped on role changes; see claims.py
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
@@ -61,7 +295,15 @@ class User:
         """Get user by ID"""
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
-        return db.users.find_one({"_id": user_id})
+
+        cached = user_cache.get(str(user_id))
+        if cached is not None:
+            return dict(cached)
+
+        user = db.users.find_one({"_id": user_id})
+        if user:
+            user_cache.set(str(user_id), dict(user))
+        return user
 
     @staticmethod
     def get_by_username(username):
@@ -81,22 +323,103 @@ class User:
 
         # Handle dietary preferences special case
         if 'dietary_preferences' in kwargs and isinstance(kwargs['dietary_preferences'], str):
-            kwargs['dietary_preferences'] = kwargs['dietary_preferences'].split(',')
+            kwargs['dietary_preferences'] = split_tags(kwargs['dietary_preferences'])
 
         kwargs['updated_at'] = datetime.utcnow()
 
-        db.users.update_one(
+        user = db.users.find_one_and_update(
             {"_id": user_id},
-            {"$set": kwargs}
+            {"$set": kwargs},
+            projection={"is_influencer": 1}
         )
+        user_cache.invalidate(str(user_id))
+
+        # Influencer listings embed the user, so their ETags (Influencer.get_list_version) must change too
+        if user and user.get('is_influencer'):
+            influencer = db.influencers.find_one_and_update(
+                {"user_id": user_id},
+                {"$set": {"updated_at": kwargs['updated_at']}},
+                projection={"_id": 1}
+            )
+            if influencer:
+                influencer_cache.invalidate(str(influencer['_id']))
         return User.get_by_id(user_id)
 
+    @staticmethod
+    def set_influencer(user_id):
+        """Mark a user as an influencer and bump ``claims_version``
+
+        Tokens issued with an older version carry outdated role claims and
+        are refused (see claims.py).
+        """
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+
+        user = db.users.find_one_and_update(
+            {"_id": user_id},
+            {"$set": {"is_influencer": True, "updated_at": datetime.utcnow()}, "$inc": {"claims_version": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        # Cache the new version so this process refuses older tokens right away
+        if user:
+            user_cache.set(str(user_id), dict(user))
+            claims_version_cache.set(str(user_id), user.get('claims_version', 0))
+        else:
+            user_cache.invalidate(str(user_id))
+            claims_version_cache.invalidate(str(user_id))
+        return user
+
+    @staticmethod
+    def cached_claims_version(user_id):
+        """Return the user's ``claims_version`` from the process-local caches, or None if not cached"""
+        cached = user_cache.get(str(user_id))
+        if cached is not None:
+            return cached.get('claims_version', 0)
+        return claims_version_cache.get(str(user_id))
+
+    @staticmethod
+    def claims_are_current(user_id, claims_version):
+        """Return False if a token's ``claims_version`` is older than the user's
+
+        Served from the process-local caches; on a miss only
+        ``claims_version`` is read from MongoDB and cached. A role change
+        made through another process is therefore noticed within
+        ENTITY_CACHE_TTL seconds.
+        """
+        current = User.cached_claims_version(user_id)
+        if current is None:
+            user = db.users.find_one({"_id": ObjectId(user_id)}, {"claims_version": 1})
+            current = user.get('claims_version', 0) if user else 0
+            claims_version_cache.set(str(user_id), current)
+        return current <= claims_version
+
+    @staticmethod
+    def get_credentials(user_id):
+        """Get a user's ``password_hash`` straight from MongoDB for check_password
+
+        The user cache is bypassed: a cached copy may predate a password
+        change made through another process.
+        """
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        return db.users.find_one({"_id": user_id}, {"password_hash": 1})
+
+    @staticmethod
+    def set_password(user_id, password):
+        """Hash and store a new password"""
+        return User.update(user_id, password_hash=password_hasher.hash(password))
+
     @staticmethod
     def check_password(user, password):
-        """Check if password matches"""
+        """Check if password matches, upgrading hashes made with outdated parameters"""
         if not user or 'password_hash' not in user:
             return False
-        return check_password_hash(user['password_hash'], password)
+        if not password_hasher.verify(user['password_hash'], password):
+            return False
+
+        if password_hasher.needs_rehash(user['password_hash']):
+            User.set_password(user['_id'], password)
+        return True
 
     @staticmethod
     def to_dict(user):
@@ -121,82 +444,301 @@ class User:
         if 'password_hash' in user_dict:
             del user_dict['password_hash']
 
+        # Legacy ObjectId arrays superseded by edge collections; documents keep
+        # them until scripts/migrate_favorites.py and migrate_follows.py have run
+        for key in ['favorite_meals', 'following']:
+            user_dict.pop(key, None)
+
         return user_dict
 
     @staticmethod
     def add_to_favorites(user_id, meal_id):
-        """Add a meal to user's favorites"""
+        """Add a meal to user's favorites, returning False if it already was one
+
+        Favorites are edges in their own collection, unique per
+        ``(user_id, meal_id)``, so the user document does not grow with them.
+        """
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
         if isinstance(meal_id, str):
             meal_id = ObjectId(meal_id)
 
-        db.users.update_one(
-            {"_id": user_id},
-            {"$addToSet": {"favorite_meals": meal_id}}
-        )
+        try:
+            result = db.favorites.update_one(
+                {"user_id": user_id, "meal_id": meal_id},
+                {"$setOnInsert": {"created_at": datetime.utcnow()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent request inserted the same edge first
+            return False
+        return result.upserted_id is not None
 
     @staticmethod
     def remove_from_favorites(user_id, meal_id):
-        """Remove a meal from user's favorites"""
+        """Remove a meal from user's favorites, returning False if it was not one"""
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
         if isinstance(meal_id, str):
             meal_id = ObjectId(meal_id)
 
-        db.users.update_one(
-            {"_id": user_id},
-            {"$pull": {"favorite_meals": meal_id}}
+        return db.favorites.delete_one({"user_id": user_id, "meal_id": meal_id}).deleted_count > 0
+
+    @staticmethod
+    def get_favorites(user, page=1, per_page=10, cursor=None, fields=None):
+        """Get one page of a user's favorite meals, most recently favorited first
+
+        The edges come from the ``(user_id, created_at)`` index and their
+        meals from a single $in query, projected to ``fields`` (see
+        Meal.projection). Pagination works as in paginate.
+        """
+        user_id = user['_id'] if isinstance(user['_id'], ObjectId) else ObjectId(user['_id'])
+        edges, pagination = paginate(
+            db.favorites, {"user_id": user_id}, page, per_page, cursor,
+            projection={"meal_id": 1, "created_at": 1}
         )
 
+        meals = Meal.get_by_ids([edge['meal_id'] for edge in edges], Meal.projection(fields))
+
+        return {"favorites": Meal.select_fields(Meal.to_dict_many(meals), fields), **pagination}
+
     @staticmethod
     def follow_influencer(user_id, influencer_id):
-        """Follow an influencer"""
+        """Follow an influencer, returning False if already following
+
+        Follows are edges in the follows collection, unique per
+        ``(user_id, influencer_id)``; both users and influencers keep a
+        counter of their edges.
+        """
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
         if isinstance(influencer_id, str):
             influencer_id = ObjectId(influencer_id)
 
-        db.users.update_one(
+        try:
+            result = db.follows.update_one(*User.follow_edge(user_id, influencer_id), upsert=True)
+        except DuplicateKeyError:
+            # A concurrent request inserted the same edge first
+            return False
+        if result.upserted_id is None:
+            return False
+
+        user = db.users.find_one_and_update(
             {"_id": user_id},
-            {"$addToSet": {"following": influencer_id}}
+            {"$inc": {"following_count": 1}},
+            projection={"following_count": 1, "timeline_enabled": 1},
+            return_document=ReturnDocument.AFTER
         )
+        user_cache.invalidate(str(user_id))
+
+        # updated_at moves with the count so list ETags change (Influencer.get_list_version)
+        db.influencers.update_one(
+            {"_id": influencer_id},
+            {"$inc": {"followers_count": 1}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        influencer_cache.invalidate(str(influencer_id))
+
+        User.update_timeline(user, influencer_id, followed=True)
+        return True
 
     @staticmethod
     def unfollow_influencer(user_id, influencer_id):
-        """Unfollow an influencer"""
+        """Unfollow an influencer, returning False if not following"""
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
         if isinstance(influencer_id, str):
             influencer_id = ObjectId(influencer_id)
 
-        db.users.update_one(
+        if not db.follows.delete_one({"user_id": user_id, "influencer_id": influencer_id}).deleted_count:
+            return False
+
+        user = db.users.find_one_and_update(
             {"_id": user_id},
-            {"$pull": {"following": influencer_id}}
+            {"$inc": {"following_count": -1}},
+            projection={"following_count": 1, "timeline_enabled": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        user_cache.invalidate(str(user_id))
+
+        db.influencers.update_one(
+            {"_id": influencer_id},
+            {"$inc": {"followers_count": -1}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        influencer_cache.invalidate(str(influencer_id))
+
+        User.update_timeline(user, influencer_id, followed=False)
+        return True
+
+    @staticmethod
+    def follow_edge(user_id, influencer_id):
+        """Return the ``(filter, update)`` upserting a follow edge
+
+        The edge is only inserted if missing, so a repeated follow is
+        detected by ``upserted_id`` even before the unique index is built.
+        """
+        return (
+            {"user_id": user_id, "influencer_id": influencer_id},
+            {"$setOnInsert": {"created_at": datetime.utcnow()}}
         )
 
     @staticmethod
-    def get_following(user_id):
-        """Get list of influencers a user is following"""
+    def update_timeline(user, influencer_id, followed):
+        """Keep a user's feed timeline in step after a follow edge was added or removed
+
+        ``user`` is the user's document after its ``following_count`` was
+        updated. Shared with the async follow routes in asgi.py.
+        """
+        if not user:
+            return
+        user_id = user['_id']
+        following_count = user.get('following_count', 0)
+
+        if followed and user.get('timeline_enabled'):
+            db.follows.update_one(
+                {"user_id": user_id, "influencer_id": influencer_id},
+                {"$set": {"timeline_enabled": True}}
+            )
+            User.backfill_timeline(user_id, [influencer_id])
+        elif followed and following_count > FEED_FANOUT_THRESHOLD:
+            User.enable_timeline(user_id, User.get_following_ids(user_id))
+        elif not followed and user.get('timeline_enabled'):
+            if following_count > FEED_FANOUT_THRESHOLD:
+                db.timelines.delete_many({"user_id": user_id, "influencer_id": influencer_id})
+            else:
+                User.disable_timeline(user_id)
+
+    @staticmethod
+    def is_following(user_id, influencer_id):
+        """Return whether a user follows an influencer, with one point lookup"""
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
+        if isinstance(influencer_id, str):
+            influencer_id = ObjectId(influencer_id)
 
-        user = db.users.find_one({"_id": user_id})
-        if not user or 'following' not in user:
-            return []
+        return db.follows.find_one(
+            {"user_id": user_id, "influencer_id": influencer_id},
+            {"_id": 1}
+        ) is not None
 
-        following_ids = user['following']
-        following = []
+    @staticmethod
+    def get_following_ids(user_id):
+        """Get the IDs of every influencer a user follows"""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        return [edge['influencer_id'] for edge in db.follows.find({"user_id": user_id}, {"influencer_id": 1})]
 
-        for inf_id in following_ids:
-            influencer = Influencer.get_by_id(inf_id)
-            if influencer:
-                following.append(Influencer.to_dict(influencer))
+    @staticmethod
+    def backfill_timeline(user_id, influencer_ids):
+        """Copy the latest meals of ``influencer_ids`` into a user's timeline"""
+        meals = db.meals.find(
+            {"influencer_id": {"$in": influencer_ids}},
+            {"influencer_id": 1, "created_at": 1}
+        ).sort([("created_at", -1), ("_id", -1)]).limit(TIMELINE_BACKFILL)
+
+        insert_timeline_entries([{
+            "user_id": user_id,
+            "influencer_id": meal['influencer_id'],
+            "meal_id": meal['_id'],
+            "created_at": meal['created_at']
+        } for meal in meals])
+
+    @staticmethod
+    def enable_timeline(user_id, following):
+        """Switch a user to a fan-out-on-write timeline and backfill it
+
+        The flag is set first, on the user and on their follow edges (which
+        Meal.fan_out reads), so meals created during the backfill are
+        fanned out to this user too; duplicates are ignored.
+        """
+        db.users.update_one({"_id": user_id}, {"$set": {"timeline_enabled": True}})
+        db.follows.update_many({"user_id": user_id}, {"$set": {"timeline_enabled": True}})
+        user_cache.invalidate(str(user_id))
+        User.backfill_timeline(user_id, following)
+
+    @staticmethod
+    def disable_timeline(user_id):
+        """Switch a user back to reading their feed straight from meals"""
+        db.users.update_one({"_id": user_id}, {"$unset": {"timeline_enabled": ""}})
+        db.follows.update_many({"user_id": user_id}, {"$unset": {"timeline_enabled": ""}})
+        user_cache.invalidate(str(user_id))
+        db.timelines.delete_many({"user_id": user_id})
+
+    @staticmethod
+    def rebuild_timelines():
+        """Enable timelines for every user over the fan-out threshold
+
+        Returns the number of users whose timeline was (re)built.
+        """
+        users = db.users.find({"following_count": {"$gt": FEED_FANOUT_THRESHOLD}}, {"_id": 1})
+        rebuilt = 0
+        for user in users:
+            db.timelines.delete_many({"user_id": user['_id']})
+            User.enable_timeline(user['_id'], User.get_following_ids(user['_id']))
+            rebuilt += 1
+        return rebuilt
+
+    @staticmethod
+    def get_feed(user, per_page=10, cursor=None, fields=None):
+        """Get one newest-first page of meals from the influencers a user follows
+
+        Most users are served by a single $in query on
+        ``(influencer_id, created_at)``: the planner merges the per-influencer
+        index ranges (a k-way merge) and stops after one page. Users who
+        follow more than FEED_FANOUT_THRESHOLD influencers read from their
+        timeline instead, which holds the TIMELINE_BACKFILL most recent meals
+        from when it was built plus everything fanned out since. Both paths
+        use the same ``(created_at, meal id)`` cursors.
+        """
+        projection = Meal.projection(fields)
+        if not user.get('following_count'):
+            return {"meals": [], "next_cursor": None}
+
+        if user.get('timeline_enabled'):
+            entries, pagination = paginate(
+                db.timelines, {"user_id": user['_id']}, page=None, per_page=per_page,
+                cursor=cursor, id_field='meal_id'
+            )
+            meals = Meal.get_by_ids([entry['meal_id'] for entry in entries], projection)
+        else:
+            following = User.get_following_ids(user['_id'])
+            meals, pagination = paginate(
+                db.meals, {"influencer_id": {"$in": following}}, page=None, per_page=per_page,
+                cursor=cursor, projection=projection
+            )
+
+        return {"meals": Meal.select_fields(Meal.to_dict_many(meals), fields), **pagination}
+
+    @staticmethod
+    def get_following(user_id, per_page=20, cursor=None):
+        """Get one page of the influencers a user follows, most recently followed first
+
+        Returns ``{"following", "next_cursor"}``. The edges come from the
+        ``(user_id, created_at)`` index and the influencers from one $in
+        query.
+        """
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
 
-        return following
+        edges, pagination = paginate(
+            db.follows, {"user_id": user_id}, page=None, per_page=per_page, cursor=cursor,
+            projection={"influencer_id": 1, "created_at": 1}
+        )
+        influencer_ids = [edge['influencer_id'] for edge in edges]
+        by_id = {inf['_id']: inf for inf in db.influencers.find({"_id": {"$in": influencer_ids}})}
+
+        return {
+            "following": [Influencer.to_dict(by_id[inf_id]) for inf_id in influencer_ids if inf_id in by_id],
+            **pagination
+        }
 
 
 class Influencer:
+    # Fields list endpoints can select with fields=, and the compact default
+    FIELDS = ('user_id', 'specialty', 'social_media_links', 'verified', 'followers_count',
+              'created_at', 'updated_at', 'user')
+    LIST_FIELDS = ('specialty', 'verified', 'followers_count', 'user')
+    USER_SUMMARY_FIELDS = ('id', 'username', 'name', 'bio')
+
     @staticmethod
     def create(user_id, specialty=None, social_media_links=None):
         """Create a new influencer profile"""
@@ -204,7 +746,7 @@ class Influencer:
             user_id = ObjectId(user_id)
 
         # First, update the user to mark as influencer
-        User.update(user_id, is_influencer=True)
+        User.set_influencer(user_id)
 
         # Create the influencer profile
         influencer = {
@@ -212,6 +754,7 @@ class Influencer:
             "specialty": specialty,
             "social_media_links": social_media_links,
             "verified": False,
+            "followers_count": 0,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
@@ -225,53 +768,101 @@ class Influencer:
         """Get influencer by ID"""
         if isinstance(influencer_id, str):
             influencer_id = ObjectId(influencer_id)
-        return db.influencers.find_one({"_id": influencer_id})
+
+        cached = influencer_cache.get(str(influencer_id))
+        if cached is not None:
+            return dict(cached)
+
+        influencer = db.influencers.find_one({"_id": influencer_id})
+        if influencer:
+            influencer_cache.set(str(influencer_id), dict(influencer))
+        return influencer
 
     @staticmethod
     def get_by_user_id(user_id):
         """Get influencer by user ID"""
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
-        return db.influencers.find_one({"user_id": user_id})
+
+        # A user's influencer ID never changes once created, so only the
+        # mapping is cached here and the document comes from get_by_id
+        influencer_id = influencer_id_by_user_cache.get(str(user_id))
+        if influencer_id is not None:
+            return Influencer.get_by_id(influencer_id)
+
+        influencer = db.influencers.find_one({"user_id": user_id})
+        if influencer:
+            influencer_id_by_user_cache.set(str(user_id), influencer['_id'])
+            influencer_cache.set(str(influencer['_id']), dict(influencer))
+        return influencer
 
     @staticmethod
-    def get_all(page=1, per_page=10, specialty=None, sort_by=None):
-        """Get all influencers with pagination and filtering"""
+    def list_query(specialty=None):
+        """Build the filter used by get_all"""
         query = {}
 
         if specialty:
             query["specialty"] = {"$regex": specialty, "$options": "i"}
 
+        return query
+
+    @staticmethod
+    def get_list_version(specialty=None):
+        """Return the latest ``updated_at`` of the influencers matching a listing filter
+
+        Used for ETag generation, read from the ``updated_at`` index. Every
+        write that changes a listing sets ``updated_at``: profiles are only
+        ever created or updated, follows and unfollows bump it along with
+        ``followers_count``, and User.update bumps it for the embedded user.
+        """
+        latest = db.influencers.find_one(
+            Influencer.list_query(specialty), {"updated_at": 1}, sort=[("updated_at", -1)]
+        )
+        return (latest.get('updated_at') if latest else None,)
+
+    @staticmethod
+    def get_all(page=1, per_page=10, specialty=None, sort_by=None, cursor=None, fields=None):
+        """Get all influencers with pagination and filtering
+
+        ``fields`` selects the returned fields as for Meal.projection, from
+        FIELDS. The compact LIST_FIELDS default embeds a public summary of
+        the user (USER_SUMMARY_FIELDS); ``fields=*`` embeds the full user as
+        before.
+        """
+        query = Influencer.list_query(specialty)
+
         # Define sort order
-        sort_order = [("created_at", -1)]  # Default: newest first
+        sort_field = "created_at"  # Default: newest first
         if sort_by == "followers":
-            sort_order = [("followers_count", -1)]
-
-        # Calculate skip value for pagination
-        skip = (page - 1) * per_page
+            sort_field = "followers_count"
 
-        # Get total count for pagination
-        total = db.influencers.count_documents(query)
+        projection = field_projection(
+            fields, Influencer.FIELDS, Influencer.LIST_FIELDS, {'user': 'user_id'}, always=(sort_field,)
+        )
+        requested = requested_fields(fields, Influencer.LIST_FIELDS)
 
         # Get influencers with pagination
-        cursor = db.influencers.find(query).sort(sort_order).skip(skip).limit(per_page)
+        docs, pagination = paginate(db.influencers, query, page, per_page, cursor, sort_field,
+                                    projection=projection)
 
         # Convert cursor to list of dictionaries
         influencers = []
-        for inf in cursor:
+        for inf in docs:
+            inf_dict = Influencer.to_dict(inf)
+            if requested is not None and 'user' not in requested:
+                influencers.append(inf_dict)
+                continue
+
             # Get user data
             user = User.get_by_id(inf['user_id'])
             if user:
-                inf_dict = Influencer.to_dict(inf)
-                inf_dict['user'] = User.to_dict(user)
+                user_dict = User.to_dict(user)
+                if requested is not None:
+                    user_dict = {key: user_dict.get(key) for key in Influencer.USER_SUMMARY_FIELDS}
+                inf_dict['user'] = user_dict
                 influencers.append(inf_dict)
 
-        return {
-            "influencers": influencers,
-            "total": total,
-            "pages": (total + per_page - 1) // per_page,  # Ceiling division
-            "current_page": page
-        }
+        return {"influencers": select_fields(influencers, fields, Influencer.LIST_FIELDS), **pagination}
 
     @staticmethod
     def update(influencer_id, **kwargs):
@@ -285,6 +876,7 @@ class Influencer:
             {"_id": influencer_id},
             {"$set": kwargs}
         )
+        influencer_cache.invalidate(str(influencer_id))
         return Influencer.get_by_id(influencer_id)
 
     @staticmethod
@@ -309,23 +901,36 @@ class Influencer:
             if key in inf_dict and isinstance(inf_dict[key], datetime):
                 inf_dict[key] = inf_dict[key].isoformat()
 
-        # Parse social media links if it's a JSON string
-        if 'social_media_links' in inf_dict and isinstance(inf_dict['social_media_links'], str):
-            try:
-                inf_dict['social_media_links'] = json.loads(inf_dict['social_media_links'])
-            except:
-                pass
+        # Documents written before social media links were stored natively
+        # hold a JSON string until scripts/migrate_json_fields.py has run
+        if isinstance(inf_dict.get('social_media_links'), str):
+            inf_dict['social_media_links'] = decode_json_field(inf_dict['social_media_links'])
 
         return inf_dict
 
     @staticmethod
-    def get_followers(influencer_id):
-        """Get list of users following this influencer"""
+    def get_followers(influencer_id, per_page=20, cursor=None):
+        """Get one page of an influencer's followers, most recent first
+
+        Returns ``{"followers", "next_cursor"}``. Followers are public
+        summaries (USER_SUMMARY_FIELDS) read with one $in query after the
+        edges are read from the ``(influencer_id, created_at)`` index.
+        """
         if isinstance(influencer_id, str):
             influencer_id = ObjectId(influencer_id)
 
-        followers = db.users.find({"following": influencer_id})
-        return [User.to_dict(user) for user in followers]
+        edges, pagination = paginate(
+            db.follows, {"influencer_id": influencer_id}, page=None, per_page=per_page, cursor=cursor,
+            projection={"user_id": 1, "created_at": 1}
+        )
+        user_ids = [edge['user_id'] for edge in edges]
+        projection = {"username": 1, "name": 1, "bio": 1}
+        by_id = {user['_id']: user for user in db.users.find({"_id": {"$in": user_ids}}, projection)}
+
+        return {
+            "followers": [User.to_dict(by_id[user_id]) for user_id in user_ids if user_id in by_id],
+            **pagination
+        }
 
     @staticmethod
     def get_followers_count(influencer_id):
@@ -333,7 +938,42 @@ class Influencer:
         if isinstance(influencer_id, str):
             influencer_id = ObjectId(influencer_id)
 
-        return db.users.count_documents({"following": influencer_id})
+        influencer = db.influencers.find_one({"_id": influencer_id}, {"followers_count": 1})
+        if not influencer:
+            return 0
+        return influencer.get('followers_count', 0)
+
+    @staticmethod
+    def reconcile_followers_counts(batch_size=1000):
+        """Recompute every followers_count from the follows collection
+
+        Counts all follow edges in a single aggregation pass, then rewrites
+        only the influencers whose stored counter has drifted. Returns the
+        number of influencers that were corrected.
+        """
+        counts = {
+            row['_id']: row['count']
+            for row in db.follows.aggregate([
+                {"$group": {"_id": "$influencer_id", "count": {"$sum": 1}}}
+            ])
+        }
+
+        corrected = 0
+        updates = []
+        for inf in db.influencers.find({}, {"followers_count": 1}):
+            count = counts.get(inf['_id'], 0)
+            if inf.get('followers_count') != count:
+                updates.append(UpdateOne(
+                    {"_id": inf['_id']},
+                    {"$set": {"followers_count": count, "updated_at": datetime.utcnow()}}
+                ))
+            if len(updates) >= batch_size:
+                corrected += db.influencers.bulk_write(updates, ordered=False).modified_count
+                updates = []
+        if updates:
+            corrected += db.influencers.bulk_write(updates, ordered=False).modified_count
+
+        return corrected
 
     @staticmethod
     def get_specialties():
@@ -342,11 +982,53 @@ class Influencer:
 
 
 class Meal:
+    # Numeric fields that listings can filter with min_<field>/max_<field>
+    RANGE_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'prep_time', 'cook_time', 'total_time')
+
+    # Histogram bin width per field reported by get_stats
+    STATS_BIN_WIDTHS = {
+        'calories': 50,
+        'protein': 5,
+        'carbs': 5,
+        'fat': 5,
+        'prep_time': 5,
+        'cook_time': 5,
+        'total_time': 5
+    }
+    STATS_PERCENTILES = (10, 25, 50, 75, 90, 95)
+
+    # Fields list endpoints can select with fields=, and the compact default
+    # that leaves out instructions, ingredients and affiliate links
+    FIELDS = ('title', 'description', 'image_url', 'ingredients', 'instructions', 'prep_time',
+              'cook_time', 'total_time', 'servings', 'calories', 'protein', 'carbs', 'fat', 'tags',
+              'affiliate_links', 'influencer_id', 'influencer', 'created_at', 'updated_at')
+    LIST_FIELDS = ('title', 'image_url', 'calories', 'protein', 'carbs', 'fat', 'total_time',
+                   'tags', 'influencer')
+
+    # Fields a bulk import row may set, with the defaults POST /api/meals/ uses
+    IMPORT_FIELDS = {
+        'title': None,
+        'description': None,
+        'image_url': '',
+        'ingredients': [],
+        'instructions': '',
+        'prep_time': None,
+        'cook_time': None,
+        'servings': None,
+        'calories': None,
+        'protein': None,
+        'carbs': None,
+        'fat': None,
+        'tags': [],
+        'affiliate_links': []
+    }
+    NUMERIC_FIELDS = ('prep_time', 'cook_time', 'servings', 'calories', 'protein', 'carbs', 'fat')
+
     @staticmethod
-    def create(influencer_id, title, description=None, image_url=None, ingredients=None,
-               instructions=None, prep_time=None, cook_time=None, servings=None,
-               calories=None, protein=None, carbs=None, fat=None, tags=None, affiliate_links=None):
-        """Create a new meal"""
+    def new_document(influencer_id, title, description=None, image_url=None, ingredients=None,
+                     instructions=None, prep_time=None, cook_time=None, servings=None,
+                     calories=None, protein=None, carbs=None, fat=None, tags=None, affiliate_links=None):
+        """Build the document for a new meal without inserting it"""
         if isinstance(influencer_id, str):
             influencer_id = ObjectId(influencer_id)
 
@@ -354,12 +1036,13 @@ class Meal:
         if tags and isinstance(tags, str):
             tags = tags.split(',')
 
-        meal = {
+        now = datetime.utcnow()
+        return {
             "influencer_id": influencer_id,
             "title": title,
             "description": description,
             "image_url": image_url,
-            "ingredients": ingredients,  # Should be a JSON string or dict
+            "ingredients": ingredients,  # List of ingredient dicts
             "instructions": instructions,
             "prep_time": prep_time,
             "cook_time": cook_time,
@@ -368,16 +1051,124 @@ class Meal:
             "protein": protein,
             "carbs": carbs,
             "fat": fat,
+            "total_time": total_time(prep_time, cook_time),  # Indexed for range filters
             "tags": tags,
-            "affiliate_links": affiliate_links,  # Should be a JSON string or dict
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            "affiliate_links": affiliate_links,  # List or dict of links
+            "created_at": now,
+            "updated_at": now
         }
 
+    @staticmethod
+    def create(influencer_id, title, **fields):
+        """Create a new meal"""
+        meal = Meal.new_document(influencer_id, title, **fields)
+
         result = db.meals.insert_one(meal)
+        meal['_id'] = result.inserted_id
+        meal_search_index.upsert(meal)
+        Meal.fan_out([meal])
         meal['_id'] = str(result.inserted_id)
         return meal
 
+    @staticmethod
+    def validate_import_row(row):
+        """Return the Meal.new_document fields for one import row, or raise ValueError"""
+        if not isinstance(row, dict):
+            raise ValueError('Row must be a JSON object')
+        if not row.get('title') or not row.get('description'):
+            raise ValueError('Missing required fields')
+
+        fields = {key: row.get(key, default) for key, default in Meal.IMPORT_FIELDS.items()}
+        for key in Meal.NUMERIC_FIELDS:
+            value = fields[key]
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f'{key} must be a number')
+        if not isinstance(fields['tags'], (list, str)):
+            raise ValueError('tags must be a list or a comma-separated string')
+
+        fields['ingredients'] = decode_json_field(fields['ingredients'])
+        fields['affiliate_links'] = decode_json_field(fields['affiliate_links'])
+        return fields
+
+    @staticmethod
+    def import_ndjson(influencer_id, lines, batch_size=500, max_errors=100):
+        """Create meals from an iterable of NDJSON lines
+
+        Rows are validated as they are read and inserted in unordered
+        ``insert_many`` batches, so memory use is bounded by ``batch_size``
+        rather than the size of the upload. Each batch reaches follower
+        timelines through one Meal.fan_out. Blank lines are skipped. Returns
+        ``{"imported", "failed", "errors"}`` where ``errors`` holds the first
+        ``max_errors`` per-row failures by line number.
+        """
+        if isinstance(influencer_id, str):
+            influencer_id = ObjectId(influencer_id)
+
+        summary = {"imported": 0, "failed": 0, "errors": []}
+
+        def fail(line_number, message):
+            summary['failed'] += 1
+            if len(summary['errors']) < max_errors:
+                summary['errors'].append({"line": line_number, "error": message})
+
+        def flush(batch):
+            docs = [doc for _, doc in batch]
+            failed = {}
+            try:
+                db.meals.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                failed = {error['index']: error['errmsg'] for error in e.details.get('writeErrors', [])}
+
+            imported = []
+            for index, (line_number, doc) in enumerate(batch):
+                if index in failed:
+                    fail(line_number, failed[index])
+                    continue
+                imported.append(doc)
+                meal_search_index.upsert(doc)
+            summary['imported'] += len(imported)
+            Meal.fan_out(imported)
+
+        batch = []
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                fields = Meal.validate_import_row(json.loads(line))
+            except ValueError as e:  # Includes JSONDecodeError
+                fail(line_number, str(e))
+                continue
+
+            batch.append((line_number, Meal.new_document(influencer_id, **fields)))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+
+        if batch:
+            flush(batch)
+
+        return summary
+
+    @staticmethod
+    def fan_out(meals):
+        """Add new meals of one influencer to the timelines of followers who have one
+
+        The followers are looked up once and the entries inserted in batches,
+        however many meals are passed.
+        """
+        if not meals:
+            return
+        followers = [follower['user_id'] for follower in db.follows.find(
+            {"influencer_id": meals[0]['influencer_id'], "timeline_enabled": True},
+            {"user_id": 1}
+        )]
+        insert_timeline_entries([{
+            "user_id": user_id,
+            "influencer_id": meal['influencer_id'],
+            "meal_id": meal['_id'],
+            "created_at": meal['created_at']
+        } for meal in meals for user_id in followers])
+
     @staticmethod
     def get_by_id(meal_id):
         """Get meal by ID"""
@@ -386,59 +1177,357 @@ class Meal:
         return db.meals.find_one({"_id": meal_id})
 
     @staticmethod
-    def get_by_influencer(influencer_id, page=1, per_page=10):
-        """Get meals by influencer ID with pagination"""
-        if isinstance(influencer_id, str):
-            influencer_id = ObjectId(influencer_id)
+    def projection(fields=None, sort_field='created_at'):
+        """Mongo projection for a meal list's ``fields=`` parameter
+
+        Defaults to LIST_FIELDS; ``"*"`` returns every field. ``influencer``
+        (the resolved name) reads ``influencer_id``, and the sort key is
+        always included so cursors can be built.
+        """
+        return field_projection(
+            fields, Meal.FIELDS, Meal.LIST_FIELDS, {'influencer': 'influencer_id'}, always=(sort_field,)
+        )
 
-        # Calculate skip value for pagination
-        skip = (page - 1) * per_page
+    @staticmethod
+    def select_fields(meal_dicts, fields=None):
+        """Trim serialized meals to a list's ``fields=`` parameter; see select_fields"""
+        return select_fields(meal_dicts, fields, Meal.LIST_FIELDS)
+
+    @staticmethod
+    def get_by_ids(meal_ids, projection=None):
+        """Get meals by ID with one query, in the order given, skipping missing ones"""
+        meal_ids = [ObjectId(meal_id) if isinstance(meal_id, str) else meal_id for meal_id in meal_ids]
+        if not meal_ids:
+            return []
 
-        # Get total count for pagination
-        total = db.meals.count_documents({"influencer_id": influencer_id})
+        by_id = {meal['_id']: meal for meal in db.meals.find({"_id": {"$in": meal_ids}}, projection)}
+        return [by_id[meal_id] for meal_id in meal_ids if meal_id in by_id]
+
+    @staticmethod
+    def list_query(tag=None, influencer_id=None, ranges=None):
+        """Build the filter used by get_all
+
+        ``ranges`` maps fields in RANGE_FIELDS to ``(min, max)`` pairs,
+        either of which may be None.
+        """
+        query = {}
+
+        if tag:
+            query["tags"] = tag
+
+        if influencer_id:
+            if isinstance(influencer_id, str):
+                influencer_id = ObjectId(influencer_id)
+            query["influencer_id"] = influencer_id
+
+        for field, (low, high) in (ranges or {}).items():
+            bounds = {}
+            if low is not None:
+                bounds["$gte"] = low
+            if high is not None:
+                bounds["$lte"] = high
+            if bounds:
+                query[field] = bounds
+
+        return query
+
+    @staticmethod
+    def get_list_version(tag=None, influencer_id=None, ranges=None, count=True):
+        """Return ``(count, latest updated_at, names version)`` of the meals matching a listing filter
+
+        Used for ETag generation. Every part is answered from the
+        ``updated_at`` indexes without reading the matching documents; pass
+        the count to get_all as ``total`` so the page does not count again.
+        Cursor pages report no total, so they pass ``count=False`` and get
+        ``None`` instead: their cost stays independent of the listing's size,
+        at the price of a deletion going unnoticed until something else in
+        the listing changes or the cached copy expires. The names version
+        (see get_names_version) changes when an influencer is renamed.
+        """
+        query = Meal.list_query(tag, influencer_id, ranges)
+        total = db.meals.count_documents(query) if count else None
+        latest = db.meals.find_one(query, {"updated_at": 1}, sort=[("updated_at", -1)])
+        return (total, latest.get('updated_at') if latest else None, Meal.get_names_version())
+
+    @staticmethod
+    def get_names_version():
+        """Return the latest ``updated_at`` of any influencer's user
+
+        Meals show their influencer's name, which lives on the user, so a
+        rename must change meal list ETags. Read from the
+        ``users_influencer_updated_at`` index.
+        """
+        latest = db.users.find_one({"is_influencer": True}, {"updated_at": 1}, sort=[("updated_at", -1)])
+        return latest.get('updated_at') if latest else None
+
+    @staticmethod
+    def get_influencer_updated_at(meal):
+        """Return the ``updated_at`` of the user whose name ``meal`` shows, for its ETag"""
+        influencer = Influencer.get_by_id(meal['influencer_id']) if meal.get('influencer_id') else None
+        user = User.get_by_id(influencer['user_id']) if influencer else None
+        return user.get('updated_at') if user else None
+
+    @staticmethod
+    def get_all(page=1, per_page=10, tag=None, influencer_id=None, cursor=None, ranges=None, fields=None,
+                total=None):
+        """Get meals with pagination, optionally filtered by tag, influencer and nutrition ranges
+
+        Only ``fields`` (see Meal.projection) are read from the database.
+        ``total`` is the listing's count if already known (get_list_version).
+        """
+        query = Meal.list_query(tag, influencer_id, ranges)
 
         # Get meals with pagination
-        cursor = db.meals.find({"influencer_id": influencer_id}).sort("created_at", -1).skip(skip).limit(per_page)
+        docs, pagination = paginate(
+            db.meals, query, page, per_page, cursor, projection=Meal.projection(fields), total=total
+        )
 
-        # Convert cursor to list of dictionaries
-        meals = [Meal.to_dict(meal) for meal in cursor]
+        return {"meals": Meal.select_fields(Meal.to_dict_many(docs), fields), **pagination}
+
+    @staticmethod
+    def get_stats(tag=None, influencer_id=None, ranges=None):
+        """Histograms, summary statistics and percentiles of each macro
+
+        Computed server-side in a single aggregation: one $facet per field
+        groups the matching meals into fixed-width bins, and the bins are
+        summarised here.
+        """
+        facets = {
+            field: [
+                {"$match": {field: {"$type": "number"}}},
+                {"$group": {
+                    "_id": {"$multiply": [{"$floor": {"$divide": ["$" + field, width]}}, width]},
+                    "count": {"$sum": 1},
+                    "min": {"$min": "$" + field},
+                    "max": {"$max": "$" + field},
+                    "sum": {"$sum": "$" + field}
+                }}
+            ]
+            for field, width in Meal.STATS_BIN_WIDTHS.items()
+        }
+
+        pipeline = [
+            {"$match": Meal.list_query(tag, influencer_id, ranges)},
+            {"$facet": facets}
+        ]
+        row = next(iter(db.meals.aggregate(pipeline)), {})
+
+        return {
+            field: summarize_histogram(row.get(field, []), width, Meal.STATS_PERCENTILES)
+            for field, width in Meal.STATS_BIN_WIDTHS.items()
+        }
+
+    @staticmethod
+    def backfill_total_time(batch_size=1000):
+        """Set total_time on meals created before it was stored, returning the number updated"""
+        updated = 0
+        updates = []
+        cursor = db.meals.find({"total_time": {"$exists": False}}, {"prep_time": 1, "cook_time": 1})
+        for meal in cursor.batch_size(batch_size):
+            value = total_time(meal.get('prep_time'), meal.get('cook_time'))
+            updates.append(UpdateOne({"_id": meal['_id']}, {"$set": {"total_time": value}}))
+            if len(updates) >= batch_size:
+                updated += db.meals.bulk_write(updates, ordered=False).modified_count
+                updates = []
+        if updates:
+            updated += db.meals.bulk_write(updates, ordered=False).modified_count
+        return updated
+
+    @staticmethod
+    def search(q, page=1, per_page=10, fields=None):
+        """Full-text search over title, description, tags and ingredient names
+
+        Results are ranked by relevance using the ``meal_text`` index. When
+        the server has no text index (or is mongomock), the in-process
+        inverted index in search_index.py is used instead.
+        """
+        per_page = page_size(per_page, page)
+        skip = (page - 1) * per_page
+        projection = Meal.projection(fields)
+
+        try:
+            text_query = {"$text": {"$search": q}}
+            total = db.meals.count_documents(text_query)
+            cursor = db.meals.find(
+                text_query,
+                {**(projection or {}), "score": {"$meta": "textScore"}}
+            ).sort([("score", {"$meta": "textScore"})]).skip(skip).limit(per_page)
+            docs = list(cursor)
+            for doc in docs:
+                doc.pop('score', None)
+        except (OperationFailure, NotImplementedError) as e:
+            # 27 is IndexNotFound: the text index has not been created
+            if isinstance(e, OperationFailure) and e.code != 27:
+                raise
+            meal_search_index.ensure_built(db.meals)
+            total, ranked = meal_search_index.search(q, skip + per_page)
+            docs = Meal.get_by_ids((meal_id for meal_id, _ in ranked[skip:]), projection)
 
         return {
-            "meals": meals,
+            "meals": Meal.select_fields(Meal.to_dict_many(docs), fields),
             "total": total,
             "pages": (total + per_page - 1) // per_page,  # Ceiling division
             "current_page": page
         }
 
     @staticmethod
-    def update(meal_id, **kwargs):
-        """Update meal fields"""
+    def export_batches(tag=None, influencer_id=None, updated_after=None, updated_before=None,
+                       batch_size=1000):
+        """Yield every matching meal as lists of dictionaries, ``batch_size`` at a time
+
+        Meals are read from a single cursor in ``_id`` order with a large
+        server batch size and never counted, and influencer names are
+        resolved once per batch, so memory use does not grow with the
+        catalog.
+        """
+        ranges = {}
+        if updated_after or updated_before:
+            ranges['updated_at'] = (updated_after, updated_before)
+        query = Meal.list_query(tag=tag, influencer_id=influencer_id, ranges=ranges)
+
+        batch = []
+        for meal in db.meals.find(query).sort("_id", 1).batch_size(batch_size):
+            batch.append(meal)
+            if len(batch) >= batch_size:
+                yield Meal.to_dict_many(batch)
+                batch = []
+        if batch:
+            yield Meal.to_dict_many(batch)
+
+    @staticmethod
+    def get_by_influencer(influencer_id, page=1, per_page=10, cursor=None, fields=None):
+        """Get meals by influencer ID with pagination"""
+        return Meal.get_all(page=page, per_page=per_page, influencer_id=influencer_id, cursor=cursor,
+                            fields=fields)
+
+    @staticmethod
+    def update(meal_id, influencer_id=None, **kwargs):
+        """Update meal fields, returning the updated meal
+
+        With ``influencer_id``, only a meal owned by that influencer is
+        updated and None is returned otherwise, so ownership is checked by
+        the write itself.
+        """
         if isinstance(meal_id, str):
             meal_id = ObjectId(meal_id)
 
+        query = {"_id": meal_id}
+        if influencer_id is not None:
+            query["influencer_id"] = ObjectId(influencer_id) if isinstance(influencer_id, str) else influencer_id
+
         # Process tags if they're a string
         if 'tags' in kwargs and isinstance(kwargs['tags'], str):
             kwargs['tags'] = kwargs['tags'].split(',')
 
+        # Keep the denormalized total time in step with its parts
+        if 'prep_time' in kwargs or 'cook_time' in kwargs:
+            times = {}
+            if 'prep_time' not in kwargs or 'cook_time' not in kwargs:
+                times = db.meals.find_one(query, {"prep_time": 1, "cook_time": 1}) or {}
+            times.update((k, kwargs[k]) for k in ('prep_time', 'cook_time') if k in kwargs)
+            kwargs['total_time'] = total_time(times.get('prep_time'), times.get('cook_time'))
+
         kwargs['updated_at'] = datetime.utcnow()
 
-        db.meals.update_one(
-            {"_id": meal_id},
-            {"$set": kwargs}
+        meal = db.meals.find_one_and_update(
+            query,
+            {"$set": kwargs},
+            return_document=ReturnDocument.AFTER
         )
-        return Meal.get_by_id(meal_id)
+        if meal:
+            meal_search_index.upsert(meal)
+        return meal
 
     @staticmethod
-    def delete(meal_id):
-        """Delete a meal"""
+    def delete(meal_id, influencer_id=None):
+        """Delete a meal, returning False if nothing was deleted
+
+        ``influencer_id`` restricts the delete to that influencer's meal,
+        as in Meal.update.
+        """
         if isinstance(meal_id, str):
             meal_id = ObjectId(meal_id)
 
-        db.meals.delete_one({"_id": meal_id})
+        query = {"_id": meal_id}
+        if influencer_id is not None:
+            query["influencer_id"] = ObjectId(influencer_id) if isinstance(influencer_id, str) else influencer_id
+
+        if not db.meals.delete_one(query).deleted_count:
+            return False
+        db.timelines.delete_many({"meal_id": meal_id})
+        db.favorites.delete_many({"meal_id": meal_id})
+        meal_search_index.remove(meal_id)
+        return True
 
     @staticmethod
-    def to_dict(meal):
-        """Convert meal document to dictionary"""
+    def get_influencer_names(influencer_ids):
+        """Map influencer IDs to the display name of their user
+
+        Runs one query against influencers and one against users no matter
+        how many IDs are passed in.
+        """
+        influencer_ids = list(set(influencer_ids))
+        if not influencer_ids:
+            return {}
+
+        # Serve what we can from the entity caches and batch the rest
+        user_ids = {}
+        missing = []
+        for inf_id in influencer_ids:
+            cached = influencer_cache.get(str(inf_id))
+            if cached is not None:
+                user_ids[inf_id] = cached['user_id']
+            else:
+                missing.append(inf_id)
+
+        if missing:
+            influencers = db.influencers.find(
+                {"_id": {"$in": missing}},
+                {"user_id": 1}
+            )
+            user_ids.update((inf['_id'], inf['user_id']) for inf in influencers)
+        if not user_ids:
+            return {}
+
+        user_names = {}
+        missing = []
+        for user_id in set(user_ids.values()):
+            cached = user_cache.get(str(user_id))
+            if cached is not None:
+                user_names[user_id] = cached.get('name', 'Unknown')
+            else:
+                missing.append(user_id)
+
+        if missing:
+            users = db.users.find(
+                {"_id": {"$in": missing}},
+                {"name": 1}
+            )
+            user_names.update((user['_id'], user.get('name', 'Unknown')) for user in users)
+
+        return {
+            inf_id: user_names[user_id]
+            for inf_id, user_id in user_ids.items()
+            if user_id in user_names
+        }
+
+    @staticmethod
+    def to_dict_many(meals):
+        """Convert meal documents to dictionaries, resolving influencer names in one batch"""
+        meals = list(meals)
+        influencer_names = Meal.get_influencer_names(
+            meal['influencer_id'] for meal in meals if meal.get('influencer_id')
+        )
+        return [Meal.to_dict(meal, influencer_names) for meal in meals]
+
+    @staticmethod
+    def to_dict(meal, influencer_names=None):
+        """Convert meal document to dictionary
+
+        ``influencer_names`` is the mapping returned by ``get_influencer_names``;
+        list endpoints should go through ``to_dict_many`` so it is built once
+        per page instead of once per meal.
+        """
         if not meal:
             return None
 
@@ -455,23 +1544,19 @@ class Meal:
             meal_dict['influencer_id'] = str(influencer_id)
 
             # Get influencer info
-            influencer = Influencer.get_by_id(influencer_id)
-            if influencer:
-                user = User.get_by_id(influencer['user_id'])
-                if user:
-                    meal_dict['influencer'] = user.get('name', 'Unknown')
+            if influencer_names is None:
+                influencer_names = Meal.get_influencer_names([influencer_id])
+            if influencer_id in influencer_names:
+                meal_dict['influencer'] = influencer_names[influencer_id]
 
         # Convert datetime objects to ISO format strings
         for key in ['created_at', 'updated_at']:
             if key in meal_dict and isinstance(meal_dict[key], datetime):
                 meal_dict[key] = meal_dict[key].isoformat()
 
-        # Parse JSON strings
+        # Legacy documents hold JSON strings until scripts/migrate_json_fields.py has run
         for key in ['ingredients', 'affiliate_links']:
-            if key in meal_dict and isinstance(meal_dict[key], str):
-                try:
-                    meal_dict[key] = json.loads(meal_dict[key])
-                except:
-                    pass
+            if isinstance(meal_dict.get(key), str):
+                meal_dict[key] = decode_json_field(meal_dict[key])
 
         return meal_dict
@@ -0,0 +1,395 @@
+"""Personalized meal recommendations scored with NumPy
+
+A user's per-meal calorie and macro targets are derived from their
+profile (``nutrition_targets``). Every meal in the catalog is then scored
+against those targets in one vectorized pass over ``MealMatrix``, an
+in-memory snapshot of the catalog's macros, tags (one-hot) and
+influencers that is rebuilt once it is older than RECOMMENDATION_REFRESH
+seconds. Meals close to the targets score highest; matching the user's
+dietary preferences and the tags of their favorites, and coming from an
+influencer they follow, add to the score. The top ``limit`` meals are
+selected with ``argpartition``, so only those are sorted.
+
+``plan_meals`` picks distinct meals for one or more days so each day's
+totals land close to the daily targets, searching the best-scoring meals
+that carry every one of the user's dietary preferences.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from mongo_models import Meal, User, db, meal_plan_cache
+
+RECOMMENDATION_REFRESH = float(os.getenv('RECOMMENDATION_REFRESH', 300))
+
+MACROS = ('calories', 'protein', 'carbs', 'fat')
+# How much a relative miss on each macro costs
+MACRO_WEIGHTS = np.array([2.0, 1.5, 1.0, 1.0], dtype=np.float32)
+# Only the most common tags get a one-hot column
+MAX_TAG_COLUMNS = 64
+TAG_WEIGHT = 0.5
+FOLLOW_BOOST = 0.5
+# Favorites whose tags count towards the user's tag preferences
+FAVORITES_SAMPLE = 100
+MEALS_PER_DAY = 3
+
+# Meal plans are searched among this many best-scoring meals
+MEAL_PLAN_POOL = 2000
+MEAL_PLAN_TIME_BUDGET = float(os.getenv('MEAL_PLAN_TIME_BUDGET', 200))
+MAX_PLAN_DAYS = 7
+MAX_MEALS_PER_DAY = 6
+
+ACTIVITY_FACTORS = {
+    'sedentary': 1.2,
+    'light': 1.375,
+    'moderate': 1.55,
+    'active': 1.725,
+    'very_active': 1.9,
+}
+DEFAULT_DAILY_CALORIES = 2000.0
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def nutrition_targets(user, meals_per_day=MEALS_PER_DAY):
+    """Return per-meal ``{calories, protein, carbs, fat}`` targets for a user
+
+    Daily energy is the Mifflin-St Jeor estimate (averaging its male and
+    female constants, since sex is not stored) times the activity factor,
+    or DEFAULT_DAILY_CALORIES if height, weight or age is missing. Protein
+    is 1.6 g per kg of body weight (or 25% of energy), fat 30% of energy
+    and carbs the rest, all split over ``meals_per_day`` meals (pass 1
+    for daily targets).
+    """
+    height, weight, age = (_number(user.get(key)) for key in ('height', 'weight', 'age'))
+    factor = ACTIVITY_FACTORS.get((user.get('activity_level') or '').lower(), ACTIVITY_FACTORS['light'])
+
+    if height and weight and age:
+        daily_calories = (10 * weight + 6.25 * height - 5 * age - 78) * factor
+    else:
+        daily_calories = DEFAULT_DAILY_CALORIES
+
+    protein = 1.6 * weight if weight else 0.25 * daily_calories / 4
+    fat = 0.3 * daily_calories / 9
+    carbs = max(0.0, (daily_calories - protein * 4 - fat * 9) / 4)
+
+    return {
+        'calories': round(daily_calories / meals_per_day),
+        'protein': round(protein / meals_per_day),
+        'carbs': round(carbs / meals_per_day),
+        'fat': round(fat / meals_per_day)
+    }
+
+
+class MealMatrix:
+    """Immutable column-oriented snapshot of the meal catalog used for scoring"""
+
+    PROJECTION = {"calories": 1, "protein": 1, "carbs": 1, "fat": 1, "tags": 1, "influencer_id": 1}
+
+    def __init__(self, meals):
+        meals = list(meals)
+        self.meal_ids = [meal['_id'] for meal in meals]
+        self.row_by_id = {meal_id: row for row, meal_id in enumerate(self.meal_ids)}
+
+        # Missing macros are stored as 0; meals without calories are never recommended
+        self.macros = np.array(
+            [[_number(meal.get(macro)) or 0.0 for macro in MACROS] for meal in meals],
+            dtype=np.float32
+        ).reshape(len(meals), len(MACROS))
+        self.unrated = self.macros[:, 0] == 0
+
+        tag_counts = {}
+        for meal in meals:
+            for tag in set(meal.get('tags') or []):
+                tag_counts[tag] = tag_counts.get(tag, 0) + 1
+        self.tags = sorted(tag_counts, key=lambda tag: (-tag_counts[tag], tag))[:MAX_TAG_COLUMNS]
+        self.tag_columns = {tag: column for column, tag in enumerate(self.tags)}
+
+        self.tag_matrix = np.zeros((len(meals), len(self.tags)), dtype=np.float32)
+        for row, meal in enumerate(meals):
+            for tag in meal.get('tags') or []:
+                column = self.tag_columns.get(tag)
+                if column is not None:
+                    self.tag_matrix[row, column] = 1.0
+
+        influencer_index = {}
+        self.influencers = np.array(
+            [influencer_index.setdefault(meal.get('influencer_id'), len(influencer_index)) for meal in meals],
+            dtype=np.int32
+        )
+        self.influencer_index = influencer_index
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.meal_ids)
+
+    def tag_vector(self, tags):
+        """One weight per tag column: how often each of ``tags`` occurs, scaled to a maximum of 1"""
+        vector = np.zeros(len(self.tags), dtype=np.float32)
+        for tag in tags:
+            column = self.tag_columns.get(tag)
+            if column is not None:
+                vector[column] += 1.0
+        peak = vector.max() if len(vector) else 0.0
+        return vector / peak if peak > 0 else vector
+
+    def score(self, targets, tag_preferences=None, followed_influencers=()):
+        """Score every meal: closeness to ``targets`` plus tag and influencer boosts
+
+        Meals without calories score ``-inf`` and are left out by ``top``.
+        """
+        target = np.array([targets[macro] for macro in MACROS], dtype=np.float32)
+        relative_miss = (self.macros - target) / np.maximum(target, 1.0)
+        scores = -np.sqrt((relative_miss * relative_miss) @ MACRO_WEIGHTS)
+
+        if tag_preferences is not None and tag_preferences.any():
+            scores += TAG_WEIGHT * (self.tag_matrix @ tag_preferences)
+
+        followed = [self.influencer_index[inf_id] for inf_id in followed_influencers if inf_id in self.influencer_index]
+        if followed:
+            scores += FOLLOW_BOOST * np.isin(self.influencers, followed)
+
+        scores[self.unrated] = -np.inf
+        return scores
+
+    def top(self, scores, limit):
+        """Return ``(rows, scores)`` of the ``limit`` best meals, best first"""
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return np.array([], dtype=np.intp), np.array([], dtype=np.float32)
+        rows = np.argpartition(-scores, limit - 1)[:limit]
+        rows = rows[np.argsort(-scores[rows], kind='stable')]
+        rows = rows[np.isfinite(scores[rows])]
+        return rows, scores[rows]
+
+
+class MealMatrixCache:
+    """Holds the current MealMatrix and rebuilds it once it is older than ``ttl``
+
+    Only one thread rebuilds; others keep scoring against the previous
+    snapshot meanwhile.
+    """
+
+    def __init__(self, ttl=RECOMMENDATION_REFRESH):
+        self.ttl = ttl
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def get(self, collection):
+        matrix = self._matrix
+        if matrix is not None and time.monotonic() - matrix.built_at <= self.ttl:
+            return matrix
+
+        # Block only when there is no snapshot to fall back on
+        if not self._lock.acquire(blocking=matrix is None):
+            return matrix
+        try:
+            if self._matrix is matrix:
+                self._matrix = MealMatrix(collection.find({}, MealMatrix.PROJECTION))
+            return self._matrix
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        self._matrix = None
+
+
+meal_matrix = MealMatrixCache()
+
+
+def dietary_tags(user):
+    """The user's dietary preference tags, skipping the blank ones older profile updates stored"""
+    return [tag.strip() for tag in user.get('dietary_preferences') or [] if isinstance(tag, str) and tag.strip()]
+
+
+def tag_preferences(user, matrix):
+    """Tag weights for ``user``: their dietary preferences plus the tags of their recent favorites"""
+    favorite_ids = [
+        edge['meal_id'] for edge in
+        db.favorites.find({"user_id": user['_id']}, {"meal_id": 1})
+        .sort([("created_at", -1), ("_id", -1)]).limit(FAVORITES_SAMPLE)
+    ]
+    preferred_tags = dietary_tags(user)
+    for meal_id in favorite_ids:
+        row = matrix.row_by_id.get(meal_id)
+        if row is not None:
+            preferred_tags.extend(matrix.tags[column] for column in np.flatnonzero(matrix.tag_matrix[row]))
+    return matrix.tag_vector(preferred_tags)
+
+
+def recommend(user, limit=10, fields=None):
+    """Return ``{"targets", "meals"}`` with the ``limit`` best meals for ``user``
+
+    Each meal carries its ``score``. ``fields`` selects meal fields as for
+    Meal.projection.
+    """
+    projection = Meal.projection(fields)
+    matrix = meal_matrix.get(db.meals)
+    targets = nutrition_targets(user)
+
+    scores = matrix.score(targets, tag_preferences(user, matrix), User.get_following_ids(user['_id']))
+    rows, top_scores = matrix.top(scores, limit)
+
+    score_by_id = {matrix.meal_ids[row]: float(score) for row, score in zip(rows, top_scores)}
+    meals = Meal.get_by_ids(list(score_by_id), projection)
+    meal_dicts = Meal.select_fields(Meal.to_dict_many(meals), fields)
+    for meal, meal_dict in zip(meals, meal_dicts):
+        meal_dict['score'] = round(score_by_id[meal['_id']], 4)
+
+    return {"targets": targets, "meals": meal_dicts}
+
+
+def rows_with_tags(matrix, tags):
+    """Boolean mask of the rated meals in ``matrix`` that carry every one of ``tags``"""
+    mask = ~matrix.unrated
+    columns = [matrix.tag_columns.get(tag) for tag in tags]
+    if None not in columns:
+        return mask & matrix.tag_matrix[:, columns].all(axis=1)
+
+    # A tag too rare for a one-hot column; ask MongoDB which meals have it
+    tagged = np.zeros(len(matrix), dtype=bool)
+    for meal in db.meals.find({"tags": {"$all": list(tags)}}, {"_id": 1}):
+        row = matrix.row_by_id.get(meal['_id'])
+        if row is not None:
+            tagged[row] = True
+    return mask & tagged
+
+
+def search_plan(relative, days, meals_per_day, deadline):
+    """Choose ``days`` x ``meals_per_day`` distinct rows of ``relative`` whose daily sums are close to 1
+
+    ``relative`` holds each candidate's macros as fractions of the daily
+    targets. A greedy pass fills each slot with the meal closest to what
+    the day still needs per remaining slot; local search then swaps planned
+    meals for unused ones while that lowers the day's error, until nothing
+    improves or ``deadline`` (a time.perf_counter value) has passed.
+    Returns ``(plan, totals)``: candidate rows per day and slot, and each
+    day's relative totals.
+    """
+    plan = np.empty((days, meals_per_day), dtype=np.intp)
+    totals = np.zeros((days, len(MACROS)), dtype=np.float32)
+    used = np.zeros(len(relative), dtype=bool)
+
+    for day in range(days):
+        for slot in range(meals_per_day):
+            wanted = (1 - totals[day]) / (meals_per_day - slot)
+            error = np.square(relative - wanted) @ MACRO_WEIGHTS
+            error[used] = np.inf
+            row = int(np.argmin(error))
+            plan[day, slot] = row
+            used[row] = True
+            totals[day] += relative[row]
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for day in range(days):
+            current = np.square(totals[day] - 1) @ MACRO_WEIGHTS
+            for slot in range(meals_per_day):
+                rest = totals[day] - relative[plan[day, slot]]
+                error = np.square(rest + relative - 1) @ MACRO_WEIGHTS
+                error[used] = np.inf
+                row = int(np.argmin(error))
+                if error[row] < current - 1e-6:
+                    used[plan[day, slot]] = False
+                    used[row] = True
+                    plan[day, slot] = row
+                    totals[day] = rest + relative[row]
+                    current = error[row]
+                    improved = True
+            if time.perf_counter() >= deadline:
+                break
+
+    return plan, totals
+
+
+def _is_count(value):
+    # JSON true/false arrive as bool, which is an int subclass
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def plan_version(user):
+    """What a user's cached meal plans depend on: their profile and favorites
+
+    ``updated_at`` moves on every profile change (User.update). Favorites
+    are summarised by their count and newest edge, both read from the
+    ``(user_id, created_at)`` index, so any add or remove changes the
+    version however many processes serve the user.
+    """
+    favorites = {"user_id": user['_id']}
+    newest = db.favorites.find_one(favorites, {"created_at": 1}, sort=[("created_at", -1), ("_id", -1)])
+    return (
+        user.get('updated_at'),
+        db.favorites.count_documents(favorites),
+        newest['_id'] if newest else None
+    )
+
+
+def plan_meals(user, days=1, meals_per_day=MEALS_PER_DAY, fields=None):
+    """Return ``{"targets", "days"}``: distinct meals for each day that add up close to the daily targets
+
+    Candidates are the MEAL_PLAN_POOL meals that score best for ``user``
+    (as in ``recommend``) among those tagged with every dietary
+    preference. The search stops improving the plan after
+    MEAL_PLAN_TIME_BUDGET milliseconds. Each day lists its ``meals``, their
+    macro ``totals`` and the ``deviation`` from the targets. Plans are
+    cached per user under plan_version, so every process rebuilds them
+    once the profile or favorites change.
+    """
+    if not _is_count(days) or not 1 <= days <= MAX_PLAN_DAYS:
+        raise ValueError(f'days must be between 1 and {MAX_PLAN_DAYS}')
+    if not _is_count(meals_per_day) or not 1 <= meals_per_day <= MAX_MEALS_PER_DAY:
+        raise ValueError(f'meals_per_day must be between 1 and {MAX_MEALS_PER_DAY}')
+    if isinstance(fields, (list, tuple)) and all(isinstance(name, str) for name in fields):
+        fields = ','.join(fields)
+    elif fields is not None and not isinstance(fields, str):
+        raise ValueError('fields must be a comma-separated string or a list of field names')
+    projection = Meal.projection(fields)
+
+    user_key = str(user['_id'])
+    version = plan_version(user)
+    plan_key = (days, meals_per_day, fields)
+    cached = meal_plan_cache.get(user_key)
+    plans = cached['plans'] if cached and cached['version'] == version else {}
+    if plan_key in plans:
+        return plans[plan_key]
+
+    deadline = time.perf_counter() + MEAL_PLAN_TIME_BUDGET / 1000
+    matrix = meal_matrix.get(db.meals)
+    targets = nutrition_targets(user, meals_per_day=1)
+
+    scores = matrix.score(
+        nutrition_targets(user, meals_per_day), tag_preferences(user, matrix), User.get_following_ids(user['_id'])
+    )
+    scores[~rows_with_tags(matrix, dietary_tags(user))] = -np.inf
+    rows, _ = matrix.top(scores, MEAL_PLAN_POOL)
+    if len(rows) < days * meals_per_day:
+        raise ValueError('Not enough meals match your dietary preferences for this plan')
+
+    target = np.array([targets[macro] for macro in MACROS], dtype=np.float32)
+    relative = matrix.macros[rows] / np.maximum(target, 1.0)
+    plan, totals = search_plan(relative, days, meals_per_day, deadline)
+
+    meal_ids = [matrix.meal_ids[row] for row in rows[plan.ravel()]]
+    meals = Meal.get_by_ids(meal_ids, projection)
+    meal_dicts = dict(zip((str(meal['_id']) for meal in meals), Meal.select_fields(Meal.to_dict_many(meals), fields)))
+
+    result = {"targets": targets, "days": []}
+    for day, day_totals in enumerate(totals):
+        day_ids = meal_ids[day * meals_per_day:(day + 1) * meals_per_day]
+        result["days"].append({
+            "meals": [meal_dicts[str(meal_id)] for meal_id in day_ids if str(meal_id) in meal_dicts],
+            "totals": {macro: round(float(total)) for macro, total in zip(MACROS, day_totals * target)},
+            "deviation": round(float(np.sqrt(np.square(day_totals - 1) @ MACRO_WEIGHTS)), 4)
+        })
+
+    meal_plan_cache.set(user_key, {"version": version, "plans": {**plans, plan_key: result}})
+    return result
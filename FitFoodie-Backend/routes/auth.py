@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from mongo_models import User
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from datetime import timedelta
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from claims import create_user_token
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -36,13 +36,10 @@ def register():
 
     # Update user to be an influencer if requested
     if data.get('is_influencer', False):
-        User.update(user['_id'], is_influencer=True)
+        user = User.set_influencer(user['_id'])
 
     # Create access token
-    access_token = create_access_token(
-        identity=str(user['_id']),
-        expires_delta=timedelta(days=1)
-    )
+    access_token = create_user_token(user)
 
     return jsonify({
         'message': 'User registered successfully',
@@ -65,11 +62,8 @@ def login():
     if not user or not User.check_password(user, data['password']):
         return jsonify({'error': 'Invalid username or password'}), 401
 
-    # Create access token
-    access_token = create_access_token(
-        identity=str(user['_id']),
-        expires_delta=timedelta(days=1)
-    )
+    # Create access token; it carries the user's role claims
+    access_token = create_user_token(user)
 
     return jsonify({
         'message': 'Login successful',
@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
-from mongo_models import User, Influencer
+from mongo_models import User, Influencer, decode_json_field
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson.objectid import ObjectId
-import json
+from http_cache import make_etag, conditional_response
+from claims import create_user_token
 
 influencers_bp = Blueprint('influencers', __name__)
 
@@ -12,16 +13,23 @@ def get_influencers():
     per_page = request.args.get('per_page', 10, type=int)
     specialty = request.args.get('specialty')
     sort_by = request.args.get('sort_by')
+    cursor = request.args.get('cursor')
+    fields = request.args.get('fields')  # Comma-separated, or * for every field
 
-    # Get influencers with pagination and filtering
-    result = Influencer.get_all(
-        page=page,
-        per_page=per_page,
-        specialty=specialty,
-        sort_by=sort_by
-    )
+    etag = make_etag(request.full_path, *Influencer.get_list_version(specialty=specialty))
 
-    return jsonify(result), 200
+    # Get influencers with pagination and filtering
+    try:
+        return conditional_response(etag, lambda: (jsonify(Influencer.get_all(
+            page=page,
+            per_page=per_page,
+            specialty=specialty,
+            sort_by=sort_by,
+            cursor=cursor,
+            fields=fields
+        )), 200))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @influencers_bp.route('/<influencer_id>', methods=['GET'])
 def get_influencer(influencer_id):
@@ -38,14 +46,43 @@ def get_influencer(influencer_id):
         # Get user data
         user = User.get_by_id(influencer['user_id'])
 
-        # Create response with combined data
-        influencer_dict = Influencer.to_dict(influencer)
-        influencer_dict['user'] = User.to_dict(user)
+        etag = make_etag(
+            influencer['_id'],
+            influencer.get('updated_at'),
+            influencer.get('followers_count', 0),
+            user.get('updated_at') if user else None
+        )
+
+        def build():
+            # Create response with combined data
+            influencer_dict = Influencer.to_dict(influencer)
+            influencer_dict['user'] = User.to_dict(user)
+
+            # Followers count is maintained on the influencer document
+            influencer_dict['followers_count'] = influencer.get('followers_count', 0)
+
+            return jsonify(influencer_dict), 200
+
+        return conditional_response(etag, build)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # Get followers count
-        influencer_dict['followers_count'] = Influencer.get_followers_count(influencer['_id'])
+@influencers_bp.route('/<influencer_id>/followers', methods=['GET'])
+def get_followers(influencer_id):
+    try:
+        if not ObjectId.is_valid(influencer_id):
+            return jsonify({'error': 'Invalid influencer ID format'}), 400
+
+        if not Influencer.get_by_id(influencer_id):
+            return jsonify({'error': 'Influencer not found'}), 404
+
+        per_page = request.args.get('per_page', 20, type=int)
+        cursor = request.args.get('cursor')
 
-        return jsonify(influencer_dict), 200
+        # One page of followers, most recent first
+        return jsonify(Influencer.get_followers(influencer_id, per_page=per_page, cursor=cursor)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -74,25 +111,24 @@ def create_influencer_profile():
 
         data = request.get_json()
 
-        # Process social media links
-        social_media_links = data.get('social_media_links')
-        if social_media_links and isinstance(social_media_links, dict):
-            social_media_links = json.dumps(social_media_links)
-
         # Create influencer profile
         influencer = Influencer.create(
             user_id=user_id,
             specialty=data.get('specialty', ''),
-            social_media_links=social_media_links
+            social_media_links=decode_json_field(data.get('social_media_links'))
         )
 
+        # The role change revoked the old token; issue one with the new claims
+        user = User.get_by_id(user_id)
+
         # Get the created influencer with user data
         influencer_dict = Influencer.to_dict(influencer)
         influencer_dict['user'] = User.to_dict(user)
 
         return jsonify({
             'message': 'Influencer profile created successfully',
-            'influencer': influencer_dict
+            'influencer': influencer_dict,
+            'access_token': create_user_token(user, influencer['_id'])
         }), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -117,10 +153,7 @@ def update_influencer_profile():
             update_data['specialty'] = data['specialty']
 
         if 'social_media_links' in data:
-            social_media_links = data['social_media_links']
-            if isinstance(social_media_links, dict):
-                social_media_links = json.dumps(social_media_links)
-            update_data['social_media_links'] = social_media_links
+            update_data['social_media_links'] = decode_json_field(data['social_media_links'])
 
         # Update the influencer
         updated = Influencer.update(influencer['_id'], **update_data)
@@ -159,13 +192,10 @@ def follow_influencer(influencer_id):
         if not influencer:
             return jsonify({'error': 'Influencer not found'}), 404
 
-        # Check if already following
-        if 'following' in user and ObjectId(influencer_id) in user['following']:
+        # Follow the influencer; the update is a no-op if already following
+        if not User.follow_influencer(user_id, influencer_id):
             return jsonify({'error': 'Already following this influencer'}), 400
 
-        # Follow the influencer
-        User.follow_influencer(user_id, influencer_id)
-
         # Get updated followers count
         followers_count = Influencer.get_followers_count(influencer_id)
 
@@ -196,13 +226,10 @@ def unfollow_influencer(influencer_id):
         if not influencer:
             return jsonify({'error': 'Influencer not found'}), 404
 
-        # Check if not following
-        if 'following' not in user or ObjectId(influencer_id) not in user['following']:
+        # Unfollow the influencer; the update is a no-op if not following
+        if not User.unfollow_influencer(user_id, influencer_id):
             return jsonify({'error': 'Not following this influencer'}), 400
 
-        # Unfollow the influencer
-        User.unfollow_influencer(user_id, influencer_id)
-
         # Get updated followers count
         followers_count = Influencer.get_followers_count(influencer_id)
 
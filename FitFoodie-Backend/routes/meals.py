@@ -1,43 +1,129 @@
-from flask import Blueprint, request, jsonify
-from mongo_models import Meal, User, Influencer, ObjectId
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from mongo_models import Meal, User, ObjectId, decode_json_field
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import json
+from http_cache import make_etag, conditional_response
+from export import EXPORT_FORMATS, export_chunks
+from claims import influencer_required
 
 meals_bp = Blueprint('meals', __name__)
 
+def parse_ranges(args):
+    """Read min_<field>/max_<field> query parameters for Meal.RANGE_FIELDS"""
+    ranges = {}
+    for field in Meal.RANGE_FIELDS:
+        low = args.get(f'min_{field}', type=float)
+        high = args.get(f'max_{field}', type=float)
+        if low is not None or high is not None:
+            ranges[field] = (low, high)
+    return ranges
+
 @meals_bp.route('/', methods=['GET'])
 def get_meals():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
+        cursor = request.args.get('cursor')
         tag = request.args.get('tag')
         influencer_id = request.args.get('influencer_id')
+        ranges = parse_ranges(request.args)
+        fields = request.args.get('fields')  # Comma-separated, or * for every field
 
-        # Build query
-        query = {}
-
-        if tag:
-            query['tags'] = tag
+        if influencer_id and not ObjectId.is_valid(influencer_id):
+            return jsonify({'error': 'Invalid influencer ID format'}), 400
 
-        if influencer_id:
-            if ObjectId.is_valid(influencer_id):
-                query['influencer_id'] = ObjectId(influencer_id)
-            else:
-                return jsonify({'error': 'Invalid influencer ID format'}), 400
+        # The page only changes if a matching meal is added, removed or updated,
+        # or an influencer is renamed; the count doubles as the page total, and
+        # cursor pages skip it
+        total, *version = Meal.get_list_version(
+            tag=tag, influencer_id=influencer_id, ranges=ranges, count=not cursor
+        )
+        etag = make_etag(request.full_path, total, *version)
 
         # Get meals with pagination
-        skip = (page - 1) * per_page
-        total = db.meals.count_documents(query)
+        return conditional_response(etag, lambda: (jsonify(Meal.get_all(
+            page=page,
+            per_page=per_page,
+            tag=tag,
+            influencer_id=influencer_id,
+            cursor=cursor,
+            ranges=ranges,
+            fields=fields,
+            total=total
+        )), 200))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        cursor = db.meals.find(query).sort('created_at', -1).skip(skip).limit(per_page)
-        meals_list = [Meal.to_dict(meal) for meal in cursor]
+@meals_bp.route('/stats', methods=['GET'])
+def get_meal_stats():
+    try:
+        tag = request.args.get('tag')
+        influencer_id = request.args.get('influencer_id')
 
-        return jsonify({
-            'meals': meals_list,
-            'total': total,
-            'pages': (total + per_page - 1) // per_page,  # Ceiling division
-            'current_page': page
-        }), 200
+        if influencer_id and not ObjectId.is_valid(influencer_id):
+            return jsonify({'error': 'Invalid influencer ID format'}), 400
+
+        stats = Meal.get_stats(tag=tag, influencer_id=influencer_id, ranges=parse_ranges(request.args))
+
+        return jsonify(stats), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@meals_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_meals():
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        tag = request.args.get('tag')
+        influencer_id = request.args.get('influencer_id')
+
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': f"Format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+        if influencer_id and not ObjectId.is_valid(influencer_id):
+            return jsonify({'error': 'Invalid influencer ID format'}), 400
+
+        # Optional updated_at window, as ISO 8601 timestamps
+        try:
+            updated_after, updated_before = (
+                datetime.fromisoformat(request.args[key]) if request.args.get(key) else None
+                for key in ('updated_after', 'updated_before')
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid updated_after/updated_before timestamp'}), 400
+
+        batches = Meal.export_batches(
+            tag=tag,
+            influencer_id=influencer_id,
+            updated_after=updated_after,
+            updated_before=updated_before
+        )
+
+        # Streamed straight from the Mongo cursor, one batch at a time
+        return Response(
+            stream_with_context(export_chunks(batches, fmt)),
+            mimetype=EXPORT_FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename=meals.{fmt}'}
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@meals_bp.route('/search', methods=['GET'])
+def search_meals():
+    try:
+        q = request.args.get('q', '').strip()
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 10, type=int)
+        fields = request.args.get('fields')
+
+        if not q:
+            return jsonify({'error': 'Missing search query'}), 400
+
+        return jsonify(Meal.search(q, page=page, per_page=per_page, fields=fields)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -52,43 +138,29 @@ def get_meal(meal_id):
         if not meal:
             return jsonify({'error': 'Meal not found'}), 404
 
-        return jsonify(Meal.to_dict(meal)), 200
+        etag = make_etag(meal['_id'], meal.get('updated_at'), Meal.get_influencer_updated_at(meal))
+        return conditional_response(etag, lambda: (jsonify(Meal.to_dict(meal)), 200))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @meals_bp.route('/', methods=['POST'])
-@jwt_required()
-def create_meal():
+@influencer_required('create meals')
+def create_meal(influencer_id):
     try:
-        user_id = get_jwt_identity()
-        user = User.get_by_id(user_id)
-
-        if not user or not user.get('is_influencer', False):
-            return jsonify({'error': 'Only influencers can create meals'}), 403
-
-        influencer = Influencer.get_by_user_id(user_id)
-
-        if not influencer:
-            return jsonify({'error': 'Influencer profile not found'}), 404
-
         data = request.get_json()
 
         # Check if required fields are present
         if not all(k in data for k in ('title', 'description')):
             return jsonify({'error': 'Missing required fields'}), 400
 
-        # Process ingredients and affiliate links if they're objects
-        ingredients = data.get('ingredients', '[]')
-        if isinstance(ingredients, dict) or isinstance(ingredients, list):
-            ingredients = json.dumps(ingredients)
-
-        affiliate_links = data.get('affiliate_links', '[]')
-        if isinstance(affiliate_links, dict) or isinstance(affiliate_links, list):
-            affiliate_links = json.dumps(affiliate_links)
+        # Ingredients and affiliate links are stored as structured BSON; older
+        # clients may still send them as JSON-encoded strings
+        ingredients = decode_json_field(data.get('ingredients', []))
+        affiliate_links = decode_json_field(data.get('affiliate_links', []))
 
         # Create new meal
         meal = Meal.create(
-            influencer_id=influencer['_id'],
+            influencer_id=influencer_id,
             title=data['title'],
             description=data['description'],
             image_url=data.get('image_url', ''),
@@ -112,29 +184,26 @@ def create_meal():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@meals_bp.route('/import', methods=['POST'])
+@influencer_required('import meals')
+def import_meals(influencer_id):
+    try:
+        # One meal per line, in the same shape as POST /api/meals/. The body
+        # is read line by line as it arrives rather than buffered.
+        summary = Meal.import_ndjson(influencer_id, request.stream)
+
+        status = 201 if summary['imported'] else 400
+        return jsonify(summary), status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @meals_bp.route('/<meal_id>', methods=['PUT'])
-@jwt_required()
-def update_meal(meal_id):
+@influencer_required('update meals')
+def update_meal(meal_id, influencer_id):
     try:
         if not ObjectId.is_valid(meal_id):
             return jsonify({'error': 'Invalid meal ID format'}), 400
 
-        user_id = get_jwt_identity()
-        user = User.get_by_id(user_id)
-
-        if not user or not user.get('is_influencer', False):
-            return jsonify({'error': 'Only influencers can update meals'}), 403
-
-        meal = Meal.get_by_id(meal_id)
-
-        if not meal:
-            return jsonify({'error': 'Meal not found'}), 404
-
-        influencer = Influencer.get_by_user_id(user_id)
-
-        if not influencer or str(meal['influencer_id']) != str(influencer['_id']):
-            return jsonify({'error': 'You can only update your own meals'}), 403
-
         data = request.get_json()
         update_data = {}
 
@@ -146,10 +215,7 @@ def update_meal(meal_id):
         if 'image_url' in data:
             update_data['image_url'] = data['image_url']
         if 'ingredients' in data:
-            ingredients = data['ingredients']
-            if isinstance(ingredients, dict) or isinstance(ingredients, list):
-                ingredients = json.dumps(ingredients)
-            update_data['ingredients'] = ingredients
+            update_data['ingredients'] = decode_json_field(data['ingredients'])
         if 'instructions' in data:
             update_data['instructions'] = data['instructions']
         if 'prep_time' in data:
@@ -169,13 +235,15 @@ def update_meal(meal_id):
         if 'tags' in data:
             update_data['tags'] = data['tags']
         if 'affiliate_links' in data:
-            affiliate_links = data['affiliate_links']
-            if isinstance(affiliate_links, dict) or isinstance(affiliate_links, list):
-                affiliate_links = json.dumps(affiliate_links)
-            update_data['affiliate_links'] = affiliate_links
+            update_data['affiliate_links'] = decode_json_field(data['affiliate_links'])
 
-        # Update meal
-        updated_meal = Meal.update(meal_id, **update_data)
+        # Update meal; only matches if it belongs to this influencer
+        updated_meal = Meal.update(meal_id, influencer_id=influencer_id, **update_data)
+
+        if not updated_meal:
+            if not Meal.get_by_id(meal_id):
+                return jsonify({'error': 'Meal not found'}), 404
+            return jsonify({'error': 'You can only update your own meals'}), 403
 
         return jsonify({
             'message': 'Meal updated successfully',
@@ -185,31 +253,18 @@ def update_meal(meal_id):
         return jsonify({'error': str(e)}), 500
 
 @meals_bp.route('/<meal_id>', methods=['DELETE'])
-@jwt_required()
-def delete_meal(meal_id):
+@influencer_required('delete meals')
+def delete_meal(meal_id, influencer_id):
     try:
         if not ObjectId.is_valid(meal_id):
             return jsonify({'error': 'Invalid meal ID format'}), 400
 
-        user_id = get_jwt_identity()
-        user = User.get_by_id(user_id)
-
-        if not user or not user.get('is_influencer', False):
-            return jsonify({'error': 'Only influencers can delete meals'}), 403
-
-        meal = Meal.get_by_id(meal_id)
-
-        if not meal:
-            return jsonify({'error': 'Meal not found'}), 404
-
-        influencer = Influencer.get_by_user_id(user_id)
-
-        if not influencer or str(meal['influencer_id']) != str(influencer['_id']):
+        # Delete meal; only matches if it belongs to this influencer
+        if not Meal.delete(meal_id, influencer_id=influencer_id):
+            if not Meal.get_by_id(meal_id):
+                return jsonify({'error': 'Meal not found'}), 404
             return jsonify({'error': 'You can only delete your own meals'}), 403
 
-        # Delete meal
-        Meal.delete(meal_id)
-
         return jsonify({
             'message': 'Meal deleted successfully'
         }), 200
@@ -234,13 +289,10 @@ def favorite_meal(meal_id):
         if not meal:
             return jsonify({'error': 'Meal not found'}), 404
 
-        # Check if meal is already favorited
-        if 'favorite_meals' in user and ObjectId(meal_id) in user['favorite_meals']:
+        # Add meal to favorites; a no-op if it already is one
+        if not User.add_to_favorites(user_id, meal_id):
             return jsonify({'error': 'Meal already favorited'}), 400
 
-        # Add meal to favorites
-        User.add_to_favorites(user_id, meal_id)
-
         return jsonify({
             'message': 'Meal favorited successfully'
         }), 200
@@ -260,18 +312,12 @@ def unfavorite_meal(meal_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        meal = Meal.get_by_id(meal_id)
-
-        if not meal:
-            return jsonify({'error': 'Meal not found'}), 404
-
-        # Check if meal is in favorites
-        if 'favorite_meals' not in user or ObjectId(meal_id) not in user['favorite_meals']:
+        # Remove meal from favorites; a no-op if it is not one
+        if not User.remove_from_favorites(user_id, meal_id):
+            if not Meal.get_by_id(meal_id):
+                return jsonify({'error': 'Meal not found'}), 404
             return jsonify({'error': 'Meal not in favorites'}), 400
 
-        # Remove meal from favorites
-        User.remove_from_favorites(user_id, meal_id)
-
         return jsonify({
             'message': 'Meal unfavorited successfully'
         }), 200
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from mongo_models import User, Meal, Influencer
+from mongo_models import User, ObjectId
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 users_bp = Blueprint('users', __name__)
@@ -60,17 +60,82 @@ def get_favorites():
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    # Get favorite meals
-    favorites = []
-    if 'favorite_meals' in user:
-        for meal_id in user['favorite_meals']:
-            meal = Meal.get_by_id(meal_id)
-            if meal:
-                favorites.append(Meal.to_dict(meal))
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    cursor = request.args.get('cursor')
+    fields = request.args.get('fields')  # Comma-separated, or * for every field
 
-    return jsonify({
-        'favorites': favorites
-    }), 200
+    # Get one page of favorite meals
+    try:
+        return jsonify(User.get_favorites(user, page=page, per_page=per_page, cursor=cursor, fields=fields)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@users_bp.route('/feed', methods=['GET'])
+@jwt_required()
+def get_feed():
+    user_id = get_jwt_identity()
+    user = User.get_by_id(user_id)
+
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+
+    per_page = request.args.get('per_page', 10, type=int)
+    cursor = request.args.get('cursor')
+    fields = request.args.get('fields')
+
+    # One page of meals from every followed influencer, newest first
+    try:
+        return jsonify(User.get_feed(user, per_page=per_page, cursor=cursor, fields=fields)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@users_bp.route('/recommendations', methods=['GET'])
+@jwt_required()
+def get_recommendations():
+    # Imported here so NumPy only loads once recommendations are used
+    from recommendations import recommend
+
+    user_id = get_jwt_identity()
+    user = User.get_by_id(user_id)
+
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    fields = request.args.get('fields')
+
+    # The meals scoring best against the user's nutrition targets
+    try:
+        return jsonify(recommend(user, limit=limit, fields=fields)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@users_bp.route('/meal-plan', methods=['POST'])
+@jwt_required()
+def create_meal_plan():
+    # Imported here so NumPy only loads once meal plans are used
+    from recommendations import plan_meals, MEALS_PER_DAY
+
+    user_id = get_jwt_identity()
+    user = User.get_by_id(user_id)
+
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+
+    data = request.get_json(silent=True) or {}
+
+    # Distinct meals per day whose totals land close to the user's daily targets
+    try:
+        plan = plan_meals(
+            user,
+            days=data.get('days', 1),
+            meals_per_day=data.get('meals_per_day', MEALS_PER_DAY),
+            fields=data.get('fields')
+        )
+        return jsonify(plan), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @users_bp.route('/following', methods=['GET'])
 @jwt_required()
@@ -81,18 +146,31 @@ def get_following():
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    # Get following influencers
-    following = User.get_following(user_id)
+    per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor')
 
+    # One page of followed influencers, most recently followed first
+    try:
+        return jsonify(User.get_following(user_id, per_page=per_page, cursor=cursor)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@users_bp.route('/following/<influencer_id>', methods=['GET'])
+@jwt_required()
+def is_following(influencer_id):
+    if not ObjectId.is_valid(influencer_id):
+        return jsonify({'error': 'Invalid influencer ID format'}), 400
+
+    # A single lookup on the unique (user_id, influencer_id) edge
     return jsonify({
-        'following': following
+        'following': User.is_following(get_jwt_identity(), influencer_id)
     }), 200
 
 @users_bp.route('/change-password', methods=['PUT'])
 @jwt_required()
 def change_password():
     user_id = get_jwt_identity()
-    user = User.get_by_id(user_id)
+    user = User.get_credentials(user_id)
 
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -106,9 +184,7 @@ def change_password():
         return jsonify({'error': 'Current password is incorrect'}), 401
 
     # Update password
-    from werkzeug.security import generate_password_hash
-    password_hash = generate_password_hash(data['new_password'])
-    User.update(user_id, password_hash=password_hash)
+    User.set_password(user_id, data['new_password'])
 
     return jsonify({
         'message': 'Password changed successfully'
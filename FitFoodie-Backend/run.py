@@ -1,4 +1,7 @@
-from app import app
+from app import create_app, check_readiness
+
+app = create_app()
 
 if __name__ == '__main__':
+    check_readiness(app)
     app.run(debug=True, host='0.0.0.0', port=5000)
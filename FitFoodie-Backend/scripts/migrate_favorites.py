@@ -0,0 +1,88 @@
+"""Move favorite_meals arrays from user documents into the favorites collection
+
+Users used to store their favorites as an unbounded ``favorite_meals``
+array. This script streams the users that still have one, upserts an edge
+per favorite in batches and then removes the array. It is safe to re-run:
+edges are upserted on the unique ``(user_id, meal_id)`` key, and an array is
+only removed after its edges are written. Each edge gets a ``created_at``
+just before the migration time, in array order, so favorites keep their
+relative order.
+
+    python scripts/migrate_favorites.py --batch-size 1000
+"""
+import argparse
+from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pymongo import UpdateOne
+from indexes import INDEXES
+from mongo_models import db, user_cache
+
+
+def flush(edges, user_ids, dry_run=False):
+    if dry_run:
+        return
+    if edges:
+        db.favorites.bulk_write(edges, ordered=False)
+    db.users.update_many({"_id": {"$in": user_ids}}, {"$unset": {"favorite_meals": ""}})
+    for user_id in user_ids:
+        user_cache.invalidate(str(user_id))
+
+
+def migrate(batch_size, dry_run=False):
+    """Migrate every user with a favorite_meals array, returning (users, edges)"""
+    now = datetime.utcnow()
+    users = db.users.find(
+        {"favorite_meals": {"$exists": True}},
+        {"favorite_meals": 1},
+        no_cursor_timeout=True
+    ).batch_size(batch_size)
+
+    migrated_users = 0
+    migrated_edges = 0
+    edges = []
+    user_ids = []
+
+    for user in users:
+        favorite_ids = user.get('favorite_meals') or []
+        for position, meal_id in enumerate(favorite_ids):
+            created_at = now - timedelta(milliseconds=len(favorite_ids) - position)
+            edges.append(UpdateOne(
+                {"user_id": user['_id'], "meal_id": meal_id},
+                {"$setOnInsert": {"created_at": created_at}},
+                upsert=True
+            ))
+        user_ids.append(user['_id'])
+        migrated_users += 1
+        migrated_edges += len(favorite_ids)
+
+        if len(edges) >= batch_size or len(user_ids) >= batch_size:
+            flush(edges, user_ids, dry_run)
+            edges = []
+            user_ids = []
+
+    if user_ids:
+        flush(edges, user_ids, dry_run)
+
+    return migrated_users, migrated_edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help='count favorites without writing')
+    args = parser.parse_args()
+
+    # The unique key is what makes the upserts idempotent
+    if not args.dry_run:
+        db.favorites.create_indexes(INDEXES['favorites'])
+
+    users, edges = migrate(args.batch_size, args.dry_run)
+    print(f'favorites: migrated {edges} favorite(s) from {users} user(s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Move following arrays from user documents into the follows collection
+
+Users used to store the influencers they follow as a ``following`` array.
+This script streams the users that still have one, upserts an edge per
+followed influencer in batches, recounts ``following_count`` from the
+edges and then removes the array. Edges of users with a feed timeline are flagged for
+Meal.fan_out. It is safe to re-run: edges are upserted on the unique
+``(user_id, influencer_id)`` key, and an array is only removed after its
+edges are written. Each edge gets a ``created_at`` just before the
+migration time, in array order, so lists keep their relative order.
+
+    python scripts/migrate_follows.py --batch-size 1000
+"""
+import argparse
+from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pymongo import UpdateOne
+from indexes import INDEXES
+from mongo_models import db, user_cache
+
+
+def flush(edges, user_ids, dry_run=False):
+    if dry_run:
+        return
+    if edges:
+        db.follows.bulk_write(edges, ordered=False)
+
+    # Counted from the edges, which may predate the migration or repeat
+    # entries of the array, rather than from the array's length
+    counts = {row['_id']: row['count'] for row in db.follows.aggregate([
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+    ])}
+    db.users.bulk_write([UpdateOne(
+        {"_id": user_id},
+        {"$set": {"following_count": counts.get(user_id, 0)}, "$unset": {"following": ""}}
+    ) for user_id in user_ids], ordered=False)
+    for user_id in user_ids:
+        user_cache.invalidate(str(user_id))
+
+
+def migrate(batch_size, dry_run=False):
+    """Migrate every user with a following array, returning (users, edges)"""
+    now = datetime.utcnow()
+    users = db.users.find(
+        {"following": {"$exists": True}},
+        {"following": 1, "timeline_enabled": 1},
+        no_cursor_timeout=True
+    ).batch_size(batch_size)
+
+    migrated_users = 0
+    migrated_edges = 0
+    edges = []
+    user_ids = []
+
+    for user in users:
+        following = user.get('following') or []
+        for position, influencer_id in enumerate(following):
+            edge = {"created_at": now - timedelta(milliseconds=len(following) - position)}
+            if user.get('timeline_enabled'):
+                edge["timeline_enabled"] = True
+            edges.append(UpdateOne(
+                {"user_id": user['_id'], "influencer_id": influencer_id},
+                {"$setOnInsert": edge},
+                upsert=True
+            ))
+        user_ids.append(user['_id'])
+        migrated_users += 1
+        migrated_edges += len(following)
+
+        if len(edges) >= batch_size or len(user_ids) >= batch_size:
+            flush(edges, user_ids, dry_run)
+            edges = []
+            user_ids = []
+
+    if user_ids:
+        flush(edges, user_ids, dry_run)
+
+    return migrated_users, migrated_edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help='count follows without writing')
+    args = parser.parse_args()
+
+    # The unique key is what makes the upserts idempotent
+    if not args.dry_run:
+        db.follows.create_indexes(INDEXES['follows'])
+
+    users, edges = migrate(args.batch_size, args.dry_run)
+    print(f'follows: migrated {edges} follow(s) from {users} user(s)')
+
+
+if __name__ == '__main__':
+    main()
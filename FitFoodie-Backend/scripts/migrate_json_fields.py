@@ -0,0 +1,76 @@
+"""Convert legacy JSON-string fields to native BSON
+
+Meals used to store ``ingredients`` and ``affiliate_links`` and influencers
+used to store ``social_media_links`` as JSON-encoded strings. This script
+streams the affected documents and rewrites them in batches. It is safe
+to re-run: only string values are touched, and values that are not valid
+JSON are left as they are.
+
+    python scripts/migrate_json_fields.py --batch-size 1000
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pymongo import UpdateOne
+from mongo_models import db
+
+FIELDS = {
+    'meals': ['ingredients', 'affiliate_links'],
+    'influencers': ['social_media_links']
+}
+
+
+def migrate_collection(collection, fields, batch_size, dry_run=False):
+    """Rewrite string values of ``fields`` in ``collection``, returning (converted, skipped)"""
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+
+    converted = 0
+    skipped = 0
+    updates = []
+
+    for doc in collection.find(query, projection, no_cursor_timeout=True).batch_size(batch_size):
+        changes = {}
+        for field in fields:
+            value = doc.get(field)
+            if not isinstance(value, str):
+                continue
+            try:
+                changes[field] = json.loads(value)
+            except ValueError:
+                skipped += 1
+
+        if changes:
+            updates.append(UpdateOne({"_id": doc['_id']}, {"$set": changes}))
+
+        if len(updates) >= batch_size:
+            if not dry_run:
+                collection.bulk_write(updates, ordered=False)
+            converted += len(updates)
+            updates = []
+
+    if updates:
+        if not dry_run:
+            collection.bulk_write(updates, ordered=False)
+        converted += len(updates)
+
+    return converted, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help='count documents without writing')
+    args = parser.parse_args()
+
+    for name, fields in FIELDS.items():
+        converted, skipped = migrate_collection(db[name], fields, args.batch_size, args.dry_run)
+        print(f'{name}: converted {converted} document(s), left {skipped} unparseable value(s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""In-memory inverted index used for meal search when Mongo text search is unavailable
+
+Production search runs on the ``meal_text`` text index. mongomock and
+servers without that index fall back to ``MealSearchIndex``, which scores
+only the meals that share a term with the query, so lookups do not scan
+the whole catalog.
+"""
+from collections import defaultdict
+import heapq
+import json
+import math
+import re
+import threading
+import time
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'the', 'to', 'with'
+])
+
+# Relative weight of a term match in each field, mirroring the text index
+FIELD_WEIGHTS = {
+    'title': 10,
+    'tags': 5,
+    'ingredients': 3,
+    'description': 1
+}
+
+
+def tokenize(text):
+    """Split text into lowercase terms, dropping stop words and plural suffixes"""
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def ingredient_names(ingredients):
+    """Extract ingredient names from a stored ingredients value"""
+    if isinstance(ingredients, str):
+        try:
+            ingredients = json.loads(ingredients)
+        except ValueError:
+            return [ingredients]
+    if not isinstance(ingredients, list):
+        return []
+
+    names = []
+    for item in ingredients:
+        if isinstance(item, dict):
+            name = item.get('name')
+            if name:
+                names.append(str(name))
+        elif item:
+            names.append(str(item))
+    return names
+
+
+def searchable_fields(meal):
+    """Return the text of each searchable field of a meal document"""
+    return {
+        'title': meal.get('title') or '',
+        'description': meal.get('description') or '',
+        'tags': ' '.join(meal.get('tags') or []),
+        'ingredients': ' '.join(ingredient_names(meal.get('ingredients')))
+    }
+
+
+class MealSearchIndex:
+    """Weighted inverted index over meal titles, descriptions, tags and ingredients
+
+    Rebuilds run aside from the index being served, like the recommendation
+    matrix snapshot (recommendations.MealMatrixCache): only one thread
+    rebuilds, other searches keep using the previous postings meanwhile,
+    and writes made during the rebuild are replayed onto the new postings
+    before they replace the old ones.
+    """
+
+    PROJECTION = {"title": 1, "description": 1, "tags": 1, "ingredients": 1}
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._postings = defaultdict(dict)  # term -> {meal_id: weight}
+        self._doc_terms = {}  # meal_id -> terms, for removal
+        self._built_at = None
+        self._pending = None  # (meal_id, meal or None) written while a rebuild reads the collection
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+
+    def build(self, meals):
+        """Replace the index contents with ``meals``, serving the current contents until done"""
+        postings, doc_terms = defaultdict(dict), {}
+        with self._lock:
+            self._pending = []
+        try:
+            for meal in meals:
+                self._add(meal, postings, doc_terms)
+
+            with self._lock:
+                for meal_id, meal in self._pending:
+                    self._remove(meal_id, postings, doc_terms)
+                    if meal is not None:
+                        self._add(meal, postings, doc_terms)
+                self._postings, self._doc_terms = postings, doc_terms
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def is_fresh(self):
+        built_at = self._built_at
+        return built_at is not None and time.monotonic() - built_at <= self.ttl
+
+    def ensure_built(self, collection):
+        """Build the index from ``collection`` if it is empty or older than the TTL
+
+        Callers wait only while there is no index yet; once there is, a
+        stale index is rebuilt by one caller while the others search it.
+        """
+        if self.is_fresh():
+            return
+
+        if not self._build_lock.acquire(blocking=self._built_at is None):
+            return
+        try:
+            if not self.is_fresh():
+                self.build(collection.find({}, self.PROJECTION))
+        finally:
+            self._build_lock.release()
+
+    def _add(self, meal, postings=None, doc_terms=None):
+        postings = self._postings if postings is None else postings
+        doc_terms = self._doc_terms if doc_terms is None else doc_terms
+
+        weights = defaultdict(float)
+        for field, text in searchable_fields(meal).items():
+            for term in tokenize(text):
+                weights[term] += FIELD_WEIGHTS[field]
+
+        meal_id = meal['_id']
+        for term, weight in weights.items():
+            postings[term][meal_id] = weight
+        doc_terms[meal_id] = list(weights)
+
+    def _remove(self, meal_id, postings=None, doc_terms=None):
+        postings = self._postings if postings is None else postings
+        doc_terms = self._doc_terms if doc_terms is None else doc_terms
+
+        for term in doc_terms.pop(meal_id, []):
+            term_postings = postings.get(term)
+            if term_postings is not None:
+                term_postings.pop(meal_id, None)
+                if not term_postings:
+                    del postings[term]
+
+    def upsert(self, meal):
+        """Index a new or changed meal; a no-op until the index has been built"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((meal['_id'], meal))
+            if self._built_at is None:
+                return
+            self._remove(meal['_id'])
+            self._add(meal)
+
+    def remove(self, meal_id):
+        """Drop a meal from the index"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((meal_id, None))
+            self._remove(meal_id)
+
+    def search(self, query, limit):
+        """Return the number of matching meals and the ``limit`` best ``(meal_id, score)`` pairs
+
+        A meal matches if it contains any query term. Only the postings of
+        the query terms are visited.
+        """
+        with self._lock:
+            total = len(self._doc_terms) or 1
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = 1 + math.log(total / len(postings))
+                for meal_id, weight in postings.items():
+                    scores[meal_id] += weight * idf
+
+        top = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], str(item[0])))
+        return len(scores), top
+
+
+meal_search_index = MealSearchIndex()
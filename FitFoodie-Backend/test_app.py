@@ -1,13 +1,7 @@
-from flask import Flask, jsonify
+from app import create_app
 
-app = Flask(__name__)
-
-@app.route('/')
-def index():
-    return jsonify({
-        'message': 'Welcome to FitFoodie API',
-        'status': 'online'
-    })
+# The API's core routes without the blueprints, models or a database connection
+app = create_app({'BLUEPRINTS': []})
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,109 @@
+"""Shared fixtures: the Flask app against an in-memory mongomock database
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+# Hash inline and cheaply; both are read when hashing.py is imported
+os.environ.setdefault('HASH_POOL_SIZE', '0')
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-that-is-long-enough')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+mongomock = pytest.importorskip('mongomock')
+
+import mongo_models
+from app import create_app
+from indexes import INDEXES
+from search_index import MealSearchIndex
+
+
+def modules_using_db():
+    """Modules that bind the database at import time"""
+    yield mongo_models
+    try:
+        import recommendations
+    except ImportError:  # NumPy is only needed for recommendations
+        return
+    yield recommendations
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh mongomock database with the declared indexes, and empty caches"""
+    database = mongomock.MongoClient().fitfoodie
+    for name, indexes in INDEXES.items():
+        database[name].create_indexes(indexes)
+
+    for module in modules_using_db():
+        monkeypatch.setattr(module, 'db', database)
+        if hasattr(module, 'meal_matrix'):
+            module.meal_matrix.invalidate()
+    # mongomock has no text indexes, so search always uses the fallback
+    monkeypatch.setattr(mongo_models, 'meal_search_index', MealSearchIndex())
+
+    for cache in (mongo_models.user_cache, mongo_models.influencer_cache, mongo_models.influencer_id_by_user_cache,
+                  mongo_models.claims_version_cache, mongo_models.meal_plan_cache):
+        cache.clear()
+    return database
+
+
+@pytest.fixture
+def app(db):
+    # Indexes are built on the mongomock database by the db fixture instead
+    return create_app({'TESTING': True, 'ENSURE_INDEXES_ON_STARTUP': False})
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def auth(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def register(client, username, **fields):
+    """Register a user through the API, returning ``(user, headers)``"""
+    response = client.post('/api/auth/register', json={
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': 'password',
+        **fields
+    })
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    return body['user'], auth(body['access_token'])
+
+
+def register_influencer(client, username):
+    """Register a user with an influencer profile, returning ``(influencer, headers)``"""
+    _, headers = register(client, username)
+    response = client.post('/api/influencers/profile', json={'specialty': 'nutrition'}, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    return body['influencer'], auth(body['access_token'])
+
+
+def create_meal(client, headers, title, **fields):
+    response = client.post('/api/meals/', json={'title': title, 'description': title, **fields}, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['meal']
+
+
+def count_calls(monkeypatch, collection, method):
+    """Record the filter of every ``collection.method`` call"""
+    calls = []
+    original = getattr(collection, method)
+
+    def counting(*args, **kwargs):
+        calls.append(args[0] if args else kwargs.get('filter'))
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(collection, method, counting)
+    return calls
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+import app as app_module
+import indexes
+from app import create_app
+from conftest import count_calls
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..')
+
+
+def test_blueprints_are_optional():
+    client = create_app({'BLUEPRINTS': ['auth']}).test_client()
+
+    assert client.get('/api/health').get_json() == {'status': 'ok'}
+    assert client.get('/api/meals/').status_code == 404
+    assert client.post('/api/auth/login', json={}).status_code == 400
+
+
+def test_building_the_app_does_not_touch_mongodb():
+    # An unreachable server would stall the import for the full selection timeout
+    script = (
+        "import sys, time; start = time.perf_counter(); import app; "
+        "app.create_app({'BLUEPRINTS': []}); lean = 'mongo_models' not in sys.modules; "
+        "app.create_app(); print(lean, time.perf_counter() - start < 5)"
+    )
+    env = {**os.environ, 'MONGODB_URI': 'mongodb://127.0.0.1:1/fitfoodie?serverSelectionTimeoutMS=10000'}
+
+    output = subprocess.run([sys.executable, '-c', script], cwd=BACKEND, env=env, capture_output=True, text=True)
+
+    assert output.stdout.split() == ['True', 'True'], output.stderr
+
+
+def test_ready_ensures_indexes_once(db, monkeypatch):
+    db.meals.drop_index('meals_updated_at')
+    calls = count_calls(monkeypatch, indexes, 'ensure_indexes')
+    client = create_app({'TESTING': True, 'ENSURE_INDEXES_ON_STARTUP': True}).test_client()
+
+    assert client.get('/ready').get_json() == {'status': 'ready', 'mongodb': 'ok'}
+    assert client.get('/ready').status_code == 200
+
+    assert len(calls) == 1
+    assert 'meals_updated_at' in db.meals.index_information()
+
+
+def test_ready_reports_an_unreachable_database(app, db, monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise ServerSelectionTimeoutError('no servers found')
+
+    monkeypatch.setattr(db, 'command', unreachable)
+
+    response = app.test_client().get('/ready')
+
+    assert response.status_code == 503
+    assert response.get_json() == {'status': 'unavailable', 'mongodb': 'no servers found'}
+    assert app.test_client().get('/api/health').status_code == 200
+
+
+def test_module_level_app_is_built_on_first_access():
+    assert app_module.app is app_module.app
+    assert 'meals' in app_module.app.blueprints
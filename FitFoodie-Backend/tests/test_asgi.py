@@ -0,0 +1,158 @@
+from bson import ObjectId
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('asgiref')
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+from starlette.testclient import TestClient
+
+import asgi
+import mongo_models
+from conftest import create_meal, register, register_influencer
+
+
+def with_client_address(app):
+    # This Starlette's TestClient sends no client address, which asgiref's WSGI bridge requires
+    async def wrapped(scope, receive, send):
+        if scope['type'] == 'http' and not scope.get('client'):
+            scope = {**scope, 'client': ('testclient', 50000)}
+        await app(scope, receive, send)
+    return wrapped
+
+
+@pytest.fixture
+def asgi_client(db, monkeypatch):
+    """The ASGI app, with motor reading the same mongomock database as the Flask routes"""
+    async_db = mongomock_motor.AsyncMongoMockClient(mock_mongo_client=db.client).get_database(db.name)
+    monkeypatch.setattr(asgi, 'get_async_db', lambda: async_db)
+    with TestClient(with_client_address(asgi.app)) as client:
+        yield client
+
+
+def test_meal_lists_match_the_flask_routes(client, asgi_client):
+    _, headers = register_influencer(client, 'chef')
+    for n in range(3):
+        create_meal(client, headers, f'meal {n}', calories=100 * n, tags=['lunch'])
+
+    for url in ('/api/meals/?per_page=2', '/api/meals/?per_page=0', '/api/meals/?tag=lunch&min_calories=100',
+                '/api/meals/?fields=title'):
+        flask_response = client.get(url)
+        response = asgi_client.get(url)
+        assert response.status_code == 200
+        assert response.json() == flask_response.get_json()
+        assert response.headers['etag'] == flask_response.headers['ETag']
+
+    cursor = client.get('/api/meals/?per_page=2').get_json()['next_cursor']
+    page = asgi_client.get(f'/api/meals/?per_page=2&cursor={cursor}').json()
+    assert [meal['title'] for meal in page['meals']] == ['meal 0']
+    assert 'total' not in page
+
+    assert asgi_client.get('/api/meals/?cursor=nope').status_code == 400
+    assert asgi_client.get('/api/meals/?influencer_id=nope').status_code == 400
+
+
+def test_meal_detail_revalidates(client, asgi_client):
+    _, headers = register_influencer(client, 'chef')
+    meal = create_meal(client, headers, 'soup')
+    url = f"/api/meals/{meal['id']}"
+
+    response = asgi_client.get(url)
+    assert response.json() == client.get(url).get_json()
+
+    cached = asgi_client.get(url, headers={'If-None-Match': response.headers['etag']})
+    assert cached.status_code == 304
+    assert cached.headers['cache-control'] == 'public, max-age=30'
+
+
+def test_renaming_an_influencer_changes_meal_etags(client, asgi_client):
+    _, headers = register_influencer(client, 'chef')
+    meal = create_meal(client, headers, 'soup')
+    urls = ['/api/meals/', f"/api/meals/{meal['id']}"]
+    etags = [asgi_client.get(url).headers['etag'] for url in urls]
+
+    client.put('/api/users/profile', json={'name': 'Chef Ada'}, headers=headers)
+
+    for url, etag in zip(urls, etags):
+        response = asgi_client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200, url
+        assert 'Chef Ada' in response.text, url
+        assert response.headers['etag'] == client.get(url).headers['ETag']
+
+
+def test_other_routes_fall_through_to_flask(client, asgi_client):
+    _, headers = register_influencer(client, 'chef')
+    create_meal(client, headers, 'lentil soup')
+
+    assert asgi_client.get('/api/meals/search?q=lentil').json()['total'] == 1
+    assert asgi_client.get('/api/meals/not-an-id').status_code == client.get('/api/meals/not-an-id').status_code
+    assert asgi_client.get('/api/health').json() == {'status': 'ok'}
+
+
+def test_follow_and_unfollow(client, asgi_client, db):
+    influencer, _ = register_influencer(client, 'chef')
+    _, headers = register(client, 'fan')
+    follow = f"/api/influencers/follow/{influencer['id']}"
+    unfollow = f"/api/influencers/unfollow/{influencer['id']}"
+
+    assert asgi_client.post(follow).status_code == 401
+    assert asgi_client.post(follow, headers=headers).json()['followers_count'] == 1
+    response = asgi_client.post(follow, headers=headers)
+    assert (response.status_code, response.json()['error']) == (400, 'Already following this influencer')
+
+    # The Flask routes see the change through the shared cache invalidation
+    assert client.get(f"/api/influencers/{influencer['id']}").get_json()['followers_count'] == 1
+    assert asgi_client.get(f"/api/influencers/{influencer['id']}").json()['followers_count'] == 1
+
+    assert asgi_client.delete(unfollow, headers=headers).json()['followers_count'] == 0
+    assert asgi_client.delete(unfollow, headers=headers).status_code == 400
+
+
+def test_tokens_revoked_by_another_process_are_refused(client, asgi_client, db):
+    influencer, _ = register_influencer(client, 'chef')
+    user, headers = register(client, 'fan')
+    db.users.update_one({"_id": ObjectId(user['id'])}, {"$inc": {"claims_version": 1}})
+    for cache in (mongo_models.user_cache, mongo_models.claims_version_cache):
+        cache.clear()
+
+    response = asgi_client.post(f"/api/influencers/follow/{influencer['id']}", headers=headers)
+
+    assert (response.status_code, response.json()) == (401, {'msg': 'Token has been revoked'})
+
+
+def test_native_routes_send_the_flask_cors_headers(client, asgi_client):
+    _, headers = register_influencer(client, 'chef')
+    meal = create_meal(client, headers, 'soup')
+    origin = {'Origin': 'https://app.example.com'}
+
+    for url in ('/api/meals/', f"/api/meals/{meal['id']}", '/api/health'):
+        flask_response = client.get(url, headers=origin)
+        response = asgi_client.get(url, headers=origin)
+        assert response.headers['access-control-allow-origin'] == flask_response.headers['Access-Control-Allow-Origin']
+
+    preflight = asgi_client.options('/api/meals/', headers={
+        **origin, 'Access-Control-Request-Method': 'GET', 'Access-Control-Request-Headers': 'Authorization'
+    })
+    assert preflight.status_code == 200
+    assert 'GET' in preflight.headers['access-control-allow-methods']
+
+
+def test_native_routes_are_measured(client, asgi_client, monkeypatch):
+    monkeypatch.setitem(asgi.flask_app.config, 'METRICS_TOKEN', 'scraper')
+    _, headers = register_influencer(client, 'chef')
+    meal = create_meal(client, headers, 'soup')
+    series = 'fitfoodie_http_request_mongo_commands_count{blueprint="meals",endpoint="meals.get_meal"}'
+
+    def measured():
+        # Metrics are process-wide, so compare before and after
+        body = asgi_client.get('/metrics', headers={'Authorization': 'Bearer scraper'}).text
+        lines = [line for line in body.splitlines() if line.startswith(series)]
+        return int(lines[0].split()[-1]) if lines else 0
+
+    before = measured()
+    response = asgi_client.get(f"/api/meals/{meal['id']}")
+
+    assert 'server-timing' not in response.headers
+    assert measured() == before + 1
+    operator = asgi_client.get(f"/api/meals/{meal['id']}", headers={'X-Metrics-Token': 'scraper'})
+    assert operator.headers['server-timing'].startswith('app;dur=')
@@ -0,0 +1,69 @@
+import os
+import random
+import sys
+
+from bson import ObjectId
+from flask_jwt_extended import create_access_token
+
+from conftest import auth
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import bench_endpoints
+from seed import seed
+
+SIZES = dict(users=6, influencers=3, meals=12, favorites=2, follows=2)
+
+
+def test_seed_is_reproducible(db):
+    ids = seed(db, random_seed=7, **SIZES)
+    first = list(db.meals.find({}, {"_id": 0, "title": 1, "tags": 1, "calories": 1}))
+
+    assert seed(db, random_seed=7, **SIZES)['meal_ids'] != ids['meal_ids']
+    assert list(db.meals.find({}, {"_id": 0, "title": 1, "tags": 1, "calories": 1})) == first
+    assert db.users.count_documents({}) == 6
+    assert db.influencers.count_documents({}) == 3
+    assert db.meals.count_documents({}) == 12
+
+    followers = sum(influencer['followers_count'] for influencer in db.influencers.find())
+    assert followers == 6 * 2
+
+
+def test_seeded_users_can_be_served(app, client, db):
+    ids = seed(db, random_seed=7, **SIZES)
+    user_id = ids['user_ids'][-1]
+    with app.app_context():
+        headers = auth(create_access_token(identity=str(user_id)))
+
+    response = client.get('/api/users/profile', headers=headers)
+
+    assert response.status_code == 200
+    assert len(client.get('/api/users/favorites', headers=headers).get_json()['favorites']) == 2
+    assert len(client.get('/api/users/following', headers=headers).get_json()['following']) == 2
+    assert client.get('/api/influencers/').status_code == 200
+
+
+def test_every_scenario_runs_against_a_seeded_database(app, db):
+    from hashing import password_hasher
+
+    ids = seed(db, password_hash=password_hasher.hash(bench_endpoints.BENCH_PASSWORD), random_seed=7, **SIZES)
+    rng = random.Random(7)
+    with app.app_context():
+        tokens = [create_access_token(identity=str(user_id)) for user_id in ids['user_ids']]
+
+    for scenario in bench_endpoints.build_scenarios(ids, rng):
+        latencies, elapsed = bench_endpoints.run_test_client(app, scenario, 3, tokens, rng)
+        summary = bench_endpoints.summarize(latencies, elapsed, round_trips=6)
+        assert summary['requests'] == 3
+        assert summary['round_trips_per_request'] == 2
+
+
+def test_compare_flags_regressions_past_the_threshold(capsys):
+    baseline = {'results': {'meals_list': {'p95_ms': 10.0, 'round_trips_per_request': 2}}}
+
+    slower = {'results': {'meals_list': {'p95_ms': 10.5, 'round_trips_per_request': 3}}}
+    assert bench_endpoints.compare(slower, baseline, threshold=0.1) is True
+    assert 'meals_list round_trips_per_request: 2 -> 3' in capsys.readouterr().out
+
+    assert bench_endpoints.compare(slower, baseline, threshold=0.6) is False
+    assert bench_endpoints.compare({'results': {'new': {'p95_ms': 1}}}, baseline, threshold=0) is False
@@ -0,0 +1,58 @@
+import time
+
+from cache import TTLCache
+from conftest import count_calls, register
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = TTLCache('test', maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats() == {"size": 2, "maxsize": 2, "ttl": 60, "hits": 3, "misses": 1, "evictions": 1}
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache('test', maxsize=10, ttl=30)
+    cache.set('a', 1)
+
+    now[0] += 29
+    assert cache.get('a') == 1
+    now[0] += 2
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_a_zero_size_or_ttl_disables_caching():
+    for cache in (TTLCache('test', maxsize=0, ttl=30), TTLCache('test', maxsize=10, ttl=0)):
+        cache.set('a', 1)
+        assert cache.get('a') is None
+
+
+def test_user_lookups_are_served_from_the_cache(client, db, monkeypatch):
+    _, headers = register(client, 'eater', name='Eve')
+    lookups = count_calls(monkeypatch, db.users, 'find_one')
+    before = client.get('/api/cache/stats').get_json()['users']
+
+    for _ in range(3):
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+    after = client.get('/api/cache/stats').get_json()['users']
+    # The token's claims_version, then the user: both are read once and cached
+    assert len(lookups) == 2
+    assert after['hits'] >= before['hits'] + 2
+
+
+def test_profile_updates_invalidate_the_cached_user(client):
+    _, headers = register(client, 'eater', name='Eve')
+    client.get('/api/auth/me', headers=headers)
+
+    client.put('/api/users/profile', json={'name': 'Eva'}, headers=headers)
+
+    assert client.get('/api/auth/me', headers=headers).get_json()['name'] == 'Eva'
@@ -0,0 +1,93 @@
+from bson import ObjectId
+from flask_jwt_extended import create_access_token
+
+import mongo_models
+from conftest import auth, count_calls, create_meal, register, register_influencer
+
+
+def test_only_influencers_can_create_meals(client):
+    _, headers = register(client, 'eater')
+
+    response = client.post('/api/meals/', json={'title': 'toast', 'description': 'toast'}, headers=headers)
+
+    assert response.status_code == 403
+    assert response.get_json()['error'] == 'Only influencers can create meals'
+
+
+def test_becoming_an_influencer_revokes_the_old_token(client):
+    _, old_headers = register(client, 'chef')
+
+    response = client.post('/api/influencers/profile', json={'specialty': 'baking'}, headers=old_headers)
+    assert response.status_code == 201
+    new_headers = auth(response.get_json()['access_token'])
+
+    assert client.get('/api/auth/me', headers=old_headers).status_code == 401
+    assert client.get('/api/auth/me', headers=new_headers).status_code == 200
+    create_meal(client, new_headers, 'bread')
+
+
+def test_login_issues_influencer_claims(client):
+    register_influencer(client, 'chef')
+
+    response = client.post('/api/auth/login', json={'username': 'chef', 'password': 'password'})
+    assert response.status_code == 200
+
+    create_meal(client, auth(response.get_json()['access_token']), 'bread')
+
+
+def test_influencers_can_only_change_their_own_meals(client):
+    _, owner_headers = register_influencer(client, 'owner')
+    _, other_headers = register_influencer(client, 'other')
+    meal = create_meal(client, owner_headers, 'soup')
+
+    response = client.put(f"/api/meals/{meal['id']}", json={'title': 'stolen'}, headers=other_headers)
+    assert response.status_code == 403
+    assert client.delete(f"/api/meals/{meal['id']}", headers=other_headers).status_code == 403
+
+    missing = str(ObjectId())
+    assert client.put(f'/api/meals/{missing}', json={'title': 'ghost'}, headers=owner_headers).status_code == 404
+    assert client.delete(f'/api/meals/{missing}', headers=owner_headers).status_code == 404
+
+    response = client.put(f"/api/meals/{meal['id']}", json={'title': 'stew'}, headers=owner_headers)
+    assert response.status_code == 200
+    assert client.delete(f"/api/meals/{meal['id']}", headers=owner_headers).status_code == 200
+
+
+def test_tokens_without_claims_must_log_in_again(app, client):
+    influencer, _ = register_influencer(client, 'chef')
+    with app.app_context():
+        headers = auth(create_access_token(identity=influencer['user_id']))
+
+    # Identity-only routes still accept them
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+    response = client.post('/api/meals/', json={'title': 'bread', 'description': 'bread'}, headers=headers)
+    assert response.status_code == 401
+    assert 'log in again' in response.get_json()['error']
+
+
+def test_role_changes_made_by_another_process_revoke_old_tokens(client, db):
+    user, headers = register(client, 'chef')
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+    # Written straight to the database, as another worker would, then this
+    # process's caches expire (ENTITY_CACHE_TTL)
+    db.users.update_one({"_id": ObjectId(user['id'])}, {"$inc": {"claims_version": 1}})
+    for cache in (mongo_models.user_cache, mongo_models.claims_version_cache):
+        cache.clear()
+
+    response = client.get('/api/auth/me', headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()['msg'] == 'Token has been revoked'
+
+
+def test_revocation_checks_read_the_user_once_per_ttl(client, db, monkeypatch):
+    _, headers = register_influencer(client, 'chef')
+    for cache in (mongo_models.user_cache, mongo_models.claims_version_cache):
+        cache.clear()
+    reads = count_calls(monkeypatch, db.users, 'find_one')
+
+    for n in range(3):
+        create_meal(client, headers, f'bread {n}')
+
+    assert reads == [{"_id": reads[0]['_id']}]
@@ -0,0 +1,89 @@
+import pytest
+
+import database
+
+
+class FakeClient:
+    """Records how MongoClient was constructed instead of connecting"""
+
+    instances = []
+
+    def __init__(self, uri, **options):
+        self.uri = uri
+        self.options = options
+        self.closed = False
+        self.pings = 0
+        self.admin = self
+        FakeClient.instances.append(self)
+
+    def get_database(self):
+        return {'meals': f'meals of client {len(FakeClient.instances)}'}
+
+    def command(self, name):
+        assert name == 'ping'
+        self.pings += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fresh_client(monkeypatch):
+    """No client yet, with MongoClient replaced by FakeClient"""
+    FakeClient.instances = []
+    monkeypatch.setattr(database, 'MongoClient', FakeClient)
+    monkeypatch.setattr(database, '_client', None)
+    monkeypatch.setattr(database, '_database', None)
+    monkeypatch.setattr(database, '_pid', None)
+    for variable in list(database.INT_OPTIONS) + list(database.STRING_OPTIONS):
+        monkeypatch.delenv(variable, raising=False)
+    return FakeClient.instances
+
+
+def test_the_client_is_created_on_first_use(fresh_client, monkeypatch):
+    monkeypatch.setenv('MONGODB_URI', 'mongodb://db.internal:27017/fitfoodie')
+    lazy = database.LazyDatabase()
+    assert fresh_client == []
+
+    assert lazy['meals'] == 'meals of client 1'
+    assert database.get_client() is database.get_client()
+    assert len(fresh_client) == 1
+    assert fresh_client[0].uri == 'mongodb://db.internal:27017/fitfoodie'
+
+
+def test_a_forked_process_builds_its_own_client(fresh_client, monkeypatch):
+    parent = database.get_client()
+
+    monkeypatch.setattr(database.os, 'getpid', lambda: -1)
+    child = database.get_client()
+
+    assert child is not parent
+    assert database.get_db() == {'meals': 'meals of client 2'}
+    # The parent's sockets are left alone
+    assert not parent.closed
+
+    database.close_client()
+    assert child.closed
+    assert database.get_client() is not child
+
+
+def test_client_options_come_from_the_environment(fresh_client, monkeypatch):
+    monkeypatch.setenv('MONGO_MAX_POOL_SIZE', '50')
+    monkeypatch.setenv('MONGO_MIN_POOL_SIZE', '3')
+    monkeypatch.setenv('MONGO_COMPRESSORS', 'zstd,zlib')
+
+    options = database.client_options()
+
+    assert options['maxPoolSize'] == 50
+    assert options['minPoolSize'] == 3
+    assert options['compressors'] == 'zstd,zlib'
+    assert 'socketTimeoutMS' not in options
+    assert options['event_listeners'] == [database.mongo_listener]
+
+
+def test_warm_pool_pings_once_per_connection(fresh_client, monkeypatch):
+    monkeypatch.setenv('MONGO_MIN_POOL_SIZE', '4')
+
+    database.warm_pool()
+
+    assert fresh_client[0].pings == 4
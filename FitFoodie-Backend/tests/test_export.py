@@ -0,0 +1,95 @@
+import csv
+from datetime import datetime
+import io
+import json
+
+from bson import ObjectId
+
+import mongo_models
+from conftest import create_meal, register, register_influencer
+from export import CSV_COLUMNS
+
+
+def export(client, headers, query=''):
+    return client.get(f'/api/meals/export?{query}', headers=headers)
+
+
+def test_ndjson_export_streams_every_matching_meal(client):
+    _, headers = register_influencer(client, 'chef')
+    meals = [create_meal(client, headers, f'meal {n}', tags=['lunch' if n % 2 else 'dinner']) for n in range(4)]
+
+    response = export(client, headers)
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=meals.ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == [meal['id'] for meal in meals]
+    assert all(row['influencer'] == '' for row in rows)
+
+    lunch = export(client, headers, 'tag=lunch').get_data(as_text=True).splitlines()
+    assert [json.loads(line)['title'] for line in lunch] == ['meal 1', 'meal 3']
+
+
+def test_csv_export_flattens_lists(client):
+    _, headers = register_influencer(client, 'chef')
+    create_meal(client, headers, 'soup', tags=['lunch', 'vegan'], calories=250,
+                ingredients=[{'name': 'leek', 'amount': '1'}])
+
+    response = export(client, headers, 'format=csv')
+
+    assert response.mimetype == 'text/csv'
+    (row,) = csv.DictReader(io.StringIO(response.get_data(as_text=True)))
+    assert (row['title'], row['tags'], row['calories']) == ('soup', 'lunch,vegan', '250')
+    assert json.loads(row['ingredients']) == [{'name': 'leek', 'amount': '1'}]
+
+
+def test_empty_csv_export_has_a_header(client):
+    _, headers = register(client, 'eater')
+
+    body = export(client, headers, 'format=csv').get_data(as_text=True)
+
+    assert body.splitlines() == [','.join(CSV_COLUMNS)]
+
+
+def test_export_filters_on_the_updated_at_window(client, db):
+    _, headers = register_influencer(client, 'chef')
+    old, new = create_meal(client, headers, 'old'), create_meal(client, headers, 'new')
+    db.meals.update_one({"_id": ObjectId(old['id'])}, {"$set": {"updated_at": datetime(2020, 1, 1)}})
+
+    after = export(client, headers, 'updated_after=2021-01-01').get_data(as_text=True).splitlines()
+    before = export(client, headers, 'updated_before=2021-01-01T00:00:00').get_data(as_text=True).splitlines()
+
+    assert [json.loads(line)['id'] for line in after] == [new['id']]
+    assert [json.loads(line)['id'] for line in before] == [old['id']]
+
+
+def test_export_rejects_bad_parameters(client):
+    _, headers = register(client, 'eater')
+
+    assert export(client, headers, 'format=xml').status_code == 400
+    assert export(client, headers, 'influencer_id=nope').status_code == 400
+    assert export(client, headers, 'updated_after=yesterday').status_code == 400
+    assert client.get('/api/meals/export').status_code == 401
+
+
+def test_export_batches_are_bounded(db):
+    influencer_id = db.influencers.insert_one({"user_id": ObjectId()}).inserted_id
+    db.meals.insert_many([{"influencer_id": influencer_id, "title": f"meal {n}"} for n in range(5)])
+
+    batches = list(mongo_models.Meal.export_batches(batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_cli_export(app, client, tmp_path):
+    _, headers = register_influencer(client, 'chef')
+    create_meal(client, headers, 'soup', tags=['lunch'])
+    create_meal(client, headers, 'toast', tags=['breakfast'])
+    output = tmp_path / 'meals.csv'
+
+    app.test_cli_runner().invoke(args=['export-meals', '--format', 'csv', '--tag', 'lunch', '--output', str(output)])
+
+    rows = list(csv.DictReader(output.open()))
+    assert [row['title'] for row in rows] == ['soup']
@@ -0,0 +1,103 @@
+import os
+import sys
+
+from bson import ObjectId
+
+from conftest import count_calls, create_meal, register, register_influencer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import migrate_favorites
+
+
+def favorite_ids(client, headers, per_page=10):
+    """Walk the favorites list with cursors, returning every meal ID in order"""
+    ids = []
+    url = f'/api/users/favorites?per_page={per_page}'
+    response = client.get(url, headers=headers).get_json()
+    while True:
+        ids.extend(meal['id'] for meal in response['favorites'])
+        if not response['next_cursor']:
+            return ids
+        response = client.get(f"{url}&cursor={response['next_cursor']}", headers=headers).get_json()
+
+
+def test_favorites_are_edges_listed_newest_first(client, db, monkeypatch):
+    _, chef_headers = register_influencer(client, 'chef')
+    meals = [create_meal(client, chef_headers, f'meal {n}') for n in range(5)]
+    user, headers = register(client, 'eater')
+
+    for meal in meals:
+        assert client.post(f"/api/meals/favorite/{meal['id']}", headers=headers).status_code == 200
+
+    meal_reads = count_calls(monkeypatch, db.meals, 'find')
+    assert favorite_ids(client, headers, per_page=2) == [meal['id'] for meal in reversed(meals)]
+    # One $in query per page
+    assert len(meal_reads) == 3
+    assert db.favorites.count_documents({"user_id": ObjectId(user['id'])}) == 5
+    assert 'favorite_meals' not in db.users.find_one({"_id": ObjectId(user['id'])})
+
+
+def test_favoriting_twice_keeps_one_edge(client, db):
+    _, chef_headers = register_influencer(client, 'chef')
+    meal = create_meal(client, chef_headers, 'soup')
+    _, headers = register(client, 'eater')
+
+    assert client.post(f"/api/meals/favorite/{meal['id']}", headers=headers).status_code == 200
+    response = client.post(f"/api/meals/favorite/{meal['id']}", headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Meal already favorited'
+    assert db.favorites.count_documents({}) == 1
+
+
+def test_unfavorite(client):
+    _, chef_headers = register_influencer(client, 'chef')
+    meal = create_meal(client, chef_headers, 'soup')
+    _, headers = register(client, 'eater')
+    client.post(f"/api/meals/favorite/{meal['id']}", headers=headers)
+
+    assert client.delete(f"/api/meals/favorite/{meal['id']}", headers=headers).status_code == 200
+    assert favorite_ids(client, headers) == []
+
+    response = client.delete(f"/api/meals/favorite/{meal['id']}", headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Meal not in favorites'
+    assert client.delete(f'/api/meals/favorite/{ObjectId()}', headers=headers).status_code == 404
+
+
+def test_deleting_a_meal_removes_its_favorites(client, db):
+    _, chef_headers = register_influencer(client, 'chef')
+    kept = create_meal(client, chef_headers, 'kept')
+    deleted = create_meal(client, chef_headers, 'deleted')
+    _, headers = register(client, 'eater')
+    for meal in (kept, deleted):
+        client.post(f"/api/meals/favorite/{meal['id']}", headers=headers)
+
+    assert client.delete(f"/api/meals/{deleted['id']}", headers=chef_headers).status_code == 200
+
+    assert favorite_ids(client, headers) == [kept['id']]
+    assert db.favorites.count_documents({"meal_id": ObjectId(deleted['id'])}) == 0
+
+
+def test_legacy_favorite_arrays_are_migrated(client, db, monkeypatch):
+    _, chef_headers = register_influencer(client, 'chef')
+    meals = [create_meal(client, chef_headers, f'meal {n}') for n in range(3)]
+    user, headers = register(client, 'eater')
+    db.users.update_one(
+        {"_id": ObjectId(user['id'])},
+        {"$set": {"favorite_meals": [ObjectId(meal['id']) for meal in meals]}}
+    )
+
+    # The legacy array neither breaks logging in nor leaks into responses
+    response = client.post('/api/auth/login', json={'username': 'eater', 'password': 'password'})
+    assert response.status_code == 200
+    assert 'favorite_meals' not in response.get_json()['user']
+
+    monkeypatch.setattr(migrate_favorites, 'db', db)
+    assert migrate_favorites.migrate(batch_size=2) == (1, 3)
+    assert migrate_favorites.migrate(batch_size=2) == (0, 0)
+
+    # Array order is kept, so the last favorited meal comes first
+    assert favorite_ids(client, headers) == [meal['id'] for meal in reversed(meals)]
+    assert 'favorite_meals' not in db.users.find_one({"_id": ObjectId(user['id'])})
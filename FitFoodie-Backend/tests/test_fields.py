@@ -0,0 +1,82 @@
+import pytest
+
+from conftest import count_calls, create_meal, register, register_influencer
+
+
+@pytest.fixture
+def meal(client):
+    _, headers = register_influencer(client, 'chef')
+    return create_meal(client, headers, 'soup', calories=250, tags=['lunch'], instructions='Simmer',
+                       ingredients=[{'name': 'leek', 'amount': '1'}])
+
+
+def test_meal_lists_are_compact_by_default(client, meal):
+    (listed,) = client.get('/api/meals/').get_json()['meals']
+
+    assert (listed['id'], listed['title'], listed['calories'], listed['tags']) == (meal['id'], 'soup', 250, ['lunch'])
+    assert 'influencer' in listed
+    for field in ('instructions', 'ingredients', 'affiliate_links', 'description'):
+        assert field not in listed
+
+
+def test_fields_select_what_is_read_and_returned(client, meal):
+    (listed,) = client.get('/api/meals/?fields=title,instructions').get_json()['meals']
+    assert listed == {'id': meal['id'], 'title': 'soup', 'instructions': 'Simmer'}
+
+    # Fields read only for sorting or behind an alias are not returned
+    (listed,) = client.get('/api/meals/?fields=influencer').get_json()['meals']
+    assert set(listed) == {'id', 'influencer'}
+
+    (full,) = client.get('/api/meals/?fields=*').get_json()['meals']
+    assert full['ingredients'] == [{'name': 'leek', 'amount': '1'}]
+    assert full['description'] == 'soup'
+
+
+def test_cursors_work_with_any_fieldset(client):
+    _, headers = register_influencer(client, 'chef')
+    meals = [create_meal(client, headers, f'meal {n}') for n in range(3)]
+
+    first = client.get('/api/meals/?fields=title&per_page=2').get_json()
+    rest = client.get(f"/api/meals/?fields=title&per_page=2&cursor={first['next_cursor']}").get_json()
+
+    assert [m['id'] for m in first['meals'] + rest['meals']] == [m['id'] for m in reversed(meals)]
+
+
+def test_every_list_rejects_unknown_fields(client, meal):
+    _, headers = register(client, 'eater')
+
+    for url in ('/api/meals/', '/api/meals/search?q=soup&', '/api/influencers/',
+                '/api/users/favorites', '/api/users/feed'):
+        separator = '' if url.endswith('&') else '?'
+        response = client.get(f'{url}{separator}fields=password_hash', headers=headers)
+        assert response.status_code == 400, url
+        assert response.get_json()['error'] == 'Unknown field(s): password_hash'
+
+
+def test_influencer_lists_embed_a_public_user_summary(client, db, monkeypatch):
+    register_influencer(client, 'chef')
+
+    (influencer,) = client.get('/api/influencers/').get_json()['influencers']
+    assert set(influencer['user']) == {'id', 'username', 'name', 'bio'}
+    assert influencer['specialty'] == 'nutrition'
+
+    (full,) = client.get('/api/influencers/?fields=*').get_json()['influencers']
+    assert full['user']['email'] == 'chef@example.com'
+
+    lookups = count_calls(monkeypatch, db.users, 'find_one')
+    (bare,) = client.get('/api/influencers/?fields=specialty').get_json()['influencers']
+    assert set(bare) == {'id', 'specialty'}
+    assert lookups == []
+
+
+def test_favorites_search_and_feed_accept_fields(client, meal):
+    influencer = client.get('/api/influencers/').get_json()['influencers'][0]
+    _, headers = register(client, 'eater')
+    client.post(f"/api/meals/favorite/{meal['id']}", headers=headers)
+    client.post(f"/api/influencers/follow/{influencer['id']}", headers=headers)
+
+    for url in ('/api/users/favorites?fields=title', '/api/users/feed?fields=title',
+                '/api/meals/search?q=soup&fields=title'):
+        body = client.get(url, headers=headers).get_json()
+        (listed,) = body.get('favorites', body.get('meals'))
+        assert listed == {'id': meal['id'], 'title': 'soup'}, url
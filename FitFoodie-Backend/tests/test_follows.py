@@ -0,0 +1,188 @@
+import os
+import sys
+
+from bson import ObjectId
+
+from conftest import register, register_influencer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import migrate_follows
+
+
+def follow(client, influencer, headers):
+    return client.post(f"/api/influencers/follow/{influencer['id']}", headers=headers)
+
+
+def unfollow(client, influencer, headers):
+    return client.delete(f"/api/influencers/unfollow/{influencer['id']}", headers=headers)
+
+
+def walk(client, url, key, headers=None, per_page=2):
+    """Follow next_cursor to the last page, returning every item's ID in order"""
+    ids = []
+    response = client.get(f'{url}?per_page={per_page}', headers=headers).get_json()
+    while True:
+        ids.extend(item['id'] for item in response[key])
+        if not response['next_cursor']:
+            return ids
+        response = client.get(f"{url}?per_page={per_page}&cursor={response['next_cursor']}", headers=headers).get_json()
+
+
+def test_follow_and_unfollow_maintain_the_counter(client, db):
+    influencer, _ = register_influencer(client, 'chef')
+    _, headers = register(client, 'fan')
+
+    response = follow(client, influencer, headers)
+    assert response.status_code == 200
+    assert response.get_json()['followers_count'] == 1
+    assert client.get(f"/api/influencers/{influencer['id']}").get_json()['followers_count'] == 1
+
+    response = unfollow(client, influencer, headers)
+    assert response.status_code == 200
+    assert response.get_json()['followers_count'] == 0
+
+    response = unfollow(client, influencer, headers)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Not following this influencer'
+    assert db.influencers.find_one({"_id": ObjectId(influencer['id'])})['followers_count'] == 0
+
+
+def test_following_twice_counts_once(client, db):
+    influencer, _ = register_influencer(client, 'chef')
+    _, headers = register(client, 'fan')
+
+    assert follow(client, influencer, headers).status_code == 200
+    response = follow(client, influencer, headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Already following this influencer'
+    assert db.influencers.find_one({"_id": ObjectId(influencer['id'])})['followers_count'] == 1
+
+
+def test_influencers_sort_by_followers_with_cursors(client):
+    influencers = [register_influencer(client, f'chef{n}')[0] for n in range(3)]
+    fans = [register(client, f'fan{n}')[1] for n in range(2)]
+    for headers in fans:
+        follow(client, influencers[1], headers)
+    follow(client, influencers[2], fans[0])
+
+    ids = []
+    response = client.get('/api/influencers/?sort_by=followers&per_page=1').get_json()
+    while True:
+        ids.extend(influencer['id'] for influencer in response['influencers'])
+        if not response['next_cursor']:
+            break
+        response = client.get(
+            f"/api/influencers/?sort_by=followers&per_page=1&cursor={response['next_cursor']}"
+        ).get_json()
+
+    assert ids == [influencers[1]['id'], influencers[2]['id'], influencers[0]['id']]
+
+
+def test_reconcile_followers_rewrites_drifted_counters(app, client, db):
+    influencers = [register_influencer(client, f'chef{n}')[0] for n in range(3)]
+    _, headers = register(client, 'fan')
+    follow(client, influencers[0], headers)
+    follow(client, influencers[1], headers)
+    db.influencers.update_one({"_id": ObjectId(influencers[0]['id'])}, {"$set": {"followers_count": 7}})
+    db.influencers.update_one({"_id": ObjectId(influencers[2]['id'])}, {"$unset": {"followers_count": ""}})
+
+    result = app.test_cli_runner().invoke(args=['reconcile-followers'])
+
+    assert 'Corrected followers_count on 2 influencer(s)' in result.output
+    counts = [db.influencers.find_one({"_id": ObjectId(influencer['id'])})['followers_count'] for influencer in influencers]
+    assert counts == [1, 1, 0]
+
+
+def test_follows_are_edges_with_a_following_count(client, db):
+    influencer, _ = register_influencer(client, 'chef')
+    user, headers = register(client, 'fan')
+    url = f"/api/users/following/{influencer['id']}"
+
+    follow(client, influencer, headers)
+    assert client.get(url, headers=headers).get_json() == {'following': True}
+    assert db.follows.count_documents({"user_id": ObjectId(user['id'])}) == 1
+    assert db.users.find_one({"_id": ObjectId(user['id'])})['following_count'] == 1
+
+    unfollow(client, influencer, headers)
+    assert client.get(url, headers=headers).get_json() == {'following': False}
+    assert db.follows.count_documents({}) == 0
+    assert db.users.find_one({"_id": ObjectId(user['id'])})['following_count'] == 0
+
+
+def test_following_twice_keeps_one_edge_without_the_unique_index(client, db):
+    influencer, _ = register_influencer(client, 'chef')
+    _, headers = register(client, 'fan')
+    # As on a deployment where the index build has not finished yet
+    db.follows.drop_index('follows_user_influencer')
+
+    assert client.post(f"/api/influencers/follow/{influencer['id']}", headers=headers).status_code == 200
+    response = client.post(f"/api/influencers/follow/{influencer['id']}", headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Already following this influencer'
+    assert db.follows.count_documents({}) == 1
+    assert db.influencers.find_one({"_id": ObjectId(influencer['id'])})['followers_count'] == 1
+
+
+def test_following_and_followers_are_paginated_newest_first(client):
+    influencers = [register_influencer(client, f'chef{n}')[0] for n in range(3)]
+    fans = [register(client, f'fan{n}') for n in range(3)]
+
+    for influencer in influencers:
+        follow(client, influencer, fans[0][1])
+    for _, headers in fans[1:]:
+        follow(client, influencers[0], headers)
+
+    following = walk(client, '/api/users/following', 'following', headers=fans[0][1])
+    assert following == [influencer['id'] for influencer in reversed(influencers)]
+
+    followers = walk(client, f"/api/influencers/{influencers[0]['id']}/followers", 'followers')
+    assert followers == [user['id'] for user, _ in reversed(fans)]
+
+    assert client.get('/api/users/following?cursor=not-a-cursor', headers=fans[0][1]).status_code == 400
+
+
+def test_legacy_following_arrays_are_migrated(client, db, monkeypatch):
+    influencers = [register_influencer(client, f'chef{n}')[0] for n in range(2)]
+    user, headers = register(client, 'fan')
+    db.users.update_one(
+        {"_id": ObjectId(user['id'])},
+        {"$set": {"following": [ObjectId(influencer['id']) for influencer in influencers]}}
+    )
+
+    # The legacy array neither breaks logging in nor leaks into responses
+    response = client.post('/api/auth/login', json={'username': 'fan', 'password': 'password'})
+    assert response.status_code == 200
+    assert 'following' not in response.get_json()['user']
+
+    monkeypatch.setattr(migrate_follows, 'db', db)
+    assert migrate_follows.migrate(batch_size=1) == (1, 2)
+    assert migrate_follows.migrate(batch_size=1) == (0, 0)
+
+    assert walk(client, '/api/users/following', 'following', headers=headers) == [
+        influencer['id'] for influencer in reversed(influencers)
+    ]
+    migrated = db.users.find_one({"_id": ObjectId(user['id'])})
+    assert migrated['following_count'] == 2
+    assert 'following' not in migrated
+
+
+def test_migration_counts_edges_that_already_exist(client, db, monkeypatch):
+    influencers = [register_influencer(client, f'chef{n}')[0] for n in range(3)]
+    user, headers = register(client, 'fan')
+    # Followed through the new API after deploying, then the legacy array is migrated
+    client.post(f"/api/influencers/follow/{influencers[0]['id']}", headers=headers)
+    client.post(f"/api/influencers/follow/{influencers[2]['id']}", headers=headers)
+    db.users.update_one(
+        {"_id": ObjectId(user['id'])},
+        {"$set": {"following": [ObjectId(influencers[0]['id']), ObjectId(influencers[1]['id'])]}}
+    )
+
+    monkeypatch.setattr(migrate_follows, 'db', db)
+    assert migrate_follows.migrate(batch_size=1) == (1, 2)
+
+    assert db.follows.count_documents({"user_id": ObjectId(user['id'])}) == 3
+    assert db.users.find_one({"_id": ObjectId(user['id'])})['following_count'] == 3
+    assert len(walk(client, '/api/users/following', 'following', headers=headers)) == 3
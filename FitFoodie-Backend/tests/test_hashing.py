@@ -0,0 +1,104 @@
+from concurrent.futures import Future
+
+import pytest
+
+import hashing
+import mongo_models
+from conftest import register
+from hashing import HashingPoolSaturated, HashingService, default_pool_size
+
+
+def login(client, password='password'):
+    return client.post('/api/auth/login', json={'username': 'eater', 'password': password})
+
+
+def test_hashes_round_trip_through_the_pool():
+    service = HashingService('pbkdf2:sha256:1000', pool_size=1, queue_depth=0, timeout=30)
+    try:
+        password_hash = service.hash('secret')
+        assert password_hash.startswith('pbkdf2:sha256:1000$')
+        assert service.verify(password_hash, 'secret')
+        assert not service.verify(password_hash, 'wrong')
+    finally:
+        service.shutdown()
+
+
+def test_a_full_pool_sheds_logins_with_a_503(client, monkeypatch):
+    register(client, 'eater')
+    saturated = HashingService('pbkdf2:sha256:1000', pool_size=1, queue_depth=0, timeout=30)
+    saturated._slots.acquire()  # the only slot is busy
+    monkeypatch.setattr(mongo_models, 'password_hasher', saturated)
+
+    with pytest.raises(HashingPoolSaturated):
+        saturated.hash('secret')
+
+    response = login(client)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_a_timed_out_hash_is_shed_and_keeps_its_slot(monkeypatch):
+    service = HashingService('pbkdf2:sha256:1000', pool_size=1, queue_depth=0, timeout=0.01)
+    pending = Future()
+    monkeypatch.setattr(service, '_get_executor', lambda: type('Executor', (), {'submit': lambda *_: pending})())
+
+    with pytest.raises(HashingPoolSaturated, match='timed out'):
+        service.hash('secret')
+
+    # The slot stays taken until the stuck hash actually finishes
+    with pytest.raises(HashingPoolSaturated, match='capacity'):
+        service.hash('secret')
+    pending.set_result('done')
+    assert service._slots.acquire(blocking=False)
+
+
+@pytest.mark.parametrize('cpus, workers, expected', [(8, '2', 4), (8, None, 4), (2, '4', 1), (None, '3', 1), (16, '0', 16)])
+def test_pools_share_the_cores_between_workers(monkeypatch, cpus, workers, expected):
+    monkeypatch.setattr(hashing.os, 'cpu_count', lambda: cpus)
+    if workers is None:
+        monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+    else:
+        monkeypatch.setenv('WEB_CONCURRENCY', workers)
+
+    assert default_pool_size() == expected
+
+
+def test_login_upgrades_hashes_made_with_other_parameters(client, db, monkeypatch):
+    register(client, 'eater')
+    stronger = HashingService('pbkdf2:sha256:2000', pool_size=0, queue_depth=0, timeout=30)
+    monkeypatch.setattr(mongo_models, 'password_hasher', stronger)
+
+    assert login(client).status_code == 200
+    assert db.users.find_one({"username": "eater"})['password_hash'].startswith('pbkdf2:sha256:2000$')
+    assert login(client).status_code == 200
+    assert login(client, 'wrong').status_code == 401
+
+
+def test_change_password(client):
+    _, headers = register(client, 'eater')
+
+    response = client.put('/api/users/change-password', headers=headers,
+                          json={'current_password': 'wrong', 'new_password': 'better'})
+    assert response.status_code == 401
+
+    response = client.put('/api/users/change-password', headers=headers,
+                          json={'current_password': 'password', 'new_password': 'better'})
+    assert response.status_code == 200
+    assert login(client).status_code == 401
+    assert login(client, 'better').status_code == 200
+
+
+def test_change_password_checks_the_stored_hash_not_the_cached_user(client, db):
+    _, headers = register(client, 'eater')
+    assert client.get('/api/auth/me', headers=headers).status_code == 200  # caches the user
+
+    # Changed through another process, whose write this process's cache does not see
+    db.users.update_one({"username": "eater"}, {"$set": {"password_hash": mongo_models.password_hasher.hash('elsewhere')}})
+
+    response = client.put('/api/users/change-password', headers=headers,
+                          json={'current_password': 'password', 'new_password': 'better'})
+    assert response.status_code == 401
+    response = client.put('/api/users/change-password', headers=headers,
+                          json={'current_password': 'elsewhere', 'new_password': 'better'})
+    assert response.status_code == 200
+    assert login(client, 'better').status_code == 200
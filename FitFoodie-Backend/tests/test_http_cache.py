@@ -0,0 +1,108 @@
+from conftest import count_calls, create_meal, register, register_influencer
+
+
+def revalidate(client, url, etag, headers=None):
+    return client.get(url, headers={'If-None-Match': f'"{etag}"', **(headers or {})})
+
+
+def test_meal_detail_is_revalidated_until_it_changes(client):
+    _, headers = register_influencer(client, 'chef')
+    meal = create_meal(client, headers, 'soup')
+    url = f"/api/meals/{meal['id']}"
+
+    response = client.get(url)
+    etag = response.headers['ETag'].strip('"')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'public, max-age=30'
+
+    response = revalidate(client, url, etag)
+    assert response.status_code == 304
+    assert response.get_data() == b''
+
+    client.put(url, json={'title': 'stew'}, headers=headers)
+    response = revalidate(client, url, etag)
+    assert response.status_code == 200
+    assert response.get_json()['title'] == 'stew'
+
+
+def test_meal_list_etag_follows_the_matching_meals(client):
+    _, headers = register_influencer(client, 'chef')
+    create_meal(client, headers, 'soup', tags=['lunch'])
+    etag = client.get('/api/meals/?tag=lunch').headers['ETag'].strip('"')
+
+    assert revalidate(client, '/api/meals/?tag=lunch', etag).status_code == 304
+    # Another page or filter is another representation
+    assert revalidate(client, '/api/meals/?tag=lunch&per_page=5', etag).status_code == 200
+
+    # Meals outside the filter leave the page alone
+    create_meal(client, headers, 'toast', tags=['breakfast'])
+    assert revalidate(client, '/api/meals/?tag=lunch', etag).status_code == 304
+
+    create_meal(client, headers, 'salad', tags=['lunch'])
+    assert revalidate(client, '/api/meals/?tag=lunch', etag).status_code == 200
+
+
+def test_meal_listings_count_at_most_once(client, db, monkeypatch):
+    _, headers = register_influencer(client, 'chef')
+    for n in range(3):
+        create_meal(client, headers, f'meal {n}')
+    counts = count_calls(monkeypatch, db.meals, 'count_documents')
+
+    first = client.get('/api/meals/?per_page=2').get_json()
+    assert first['total'] == 3
+    assert len(counts) == 1
+
+    client.get(f"/api/meals/?per_page=2&cursor={first['next_cursor']}")
+    assert len(counts) == 1
+
+
+def test_follows_change_the_influencer_etags(client):
+    influencer, _ = register_influencer(client, 'chef')
+    _, headers = register(client, 'fan')
+    detail = f"/api/influencers/{influencer['id']}"
+    list_etag = client.get('/api/influencers/?sort_by=followers').headers['ETag'].strip('"')
+    detail_etag = client.get(detail).headers['ETag'].strip('"')
+
+    assert revalidate(client, detail, detail_etag).status_code == 304
+    client.post(f"/api/influencers/follow/{influencer['id']}", headers=headers)
+
+    assert revalidate(client, '/api/influencers/?sort_by=followers', list_etag).status_code == 200
+    assert revalidate(client, detail, detail_etag).status_code == 200
+
+
+def test_influencer_list_etags_do_not_aggregate(client, db, monkeypatch):
+    influencer, _ = register_influencer(client, 'chef')
+    _, headers = register(client, 'fan')
+    aggregates = count_calls(monkeypatch, db.influencers, 'aggregate')
+    etag = client.get('/api/influencers/').headers['ETag'].strip('"')
+
+    client.post(f"/api/influencers/follow/{influencer['id']}", headers=headers)
+    etag = revalidate(client, '/api/influencers/', etag).headers['ETag'].strip('"')
+    client.delete(f"/api/influencers/unfollow/{influencer['id']}", headers=headers)
+
+    assert revalidate(client, '/api/influencers/', etag).status_code == 200
+    assert aggregates == []
+
+
+def test_renaming_an_influencer_changes_meal_and_influencer_etags(client):
+    _, headers = register_influencer(client, 'chef')
+    meal = create_meal(client, headers, 'soup')
+    urls = ['/api/meals/', f"/api/meals/{meal['id']}", '/api/influencers/']
+    etags = [client.get(url).headers['ETag'].strip('"') for url in urls]
+    assert [revalidate(client, url, etag).status_code for url, etag in zip(urls, etags)] == [304] * 3
+
+    assert client.put('/api/users/profile', json={'name': 'Chef Ada'}, headers=headers).status_code == 200
+
+    for url, etag in zip(urls, etags):
+        response = revalidate(client, url, etag)
+        assert response.status_code == 200, url
+        assert 'Chef Ada' in response.get_data(as_text=True), url
+
+
+def test_requests_with_credentials_are_cached_privately(client):
+    _, headers = register_influencer(client, 'chef')
+    meal = create_meal(client, headers, 'soup')
+
+    response = client.get(f"/api/meals/{meal['id']}", headers=headers)
+
+    assert response.headers['Cache-Control'] == 'private, no-cache'
@@ -0,0 +1,103 @@
+import json
+
+from bson import ObjectId
+
+import mongo_models
+from conftest import count_calls, register, register_influencer
+
+
+def ndjson(*rows):
+    return '\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+
+
+def import_meals(client, headers, body):
+    return client.post('/api/meals/import', data=body, headers={**headers, 'Content-Type': 'application/x-ndjson'})
+
+
+def test_rows_are_imported_and_bad_lines_reported(client, db):
+    _, headers = register_influencer(client, 'chef')
+    body = ndjson(
+        {'title': 'Oat bowl', 'description': 'oats', 'calories': 300, 'tags': 'breakfast,quick'},
+        '',
+        '{"title": "broken"',
+        {'title': 'No description'},
+        {'title': 'Soup', 'description': 'soup', 'calories': '300'},
+        ['not', 'an', 'object'],
+        {'title': 'Stew', 'description': 'stew', 'prep_time': 10, 'cook_time': 50},
+    )
+
+    response = import_meals(client, headers, body)
+
+    assert response.status_code == 201
+    summary = response.get_json()
+    assert (summary['imported'], summary['failed']) == (2, 4)
+    assert [error['line'] for error in summary['errors']] == [3, 4, 5, 6]
+    assert summary['errors'][1]['error'] == 'Missing required fields'
+    assert summary['errors'][2]['error'] == 'calories must be a number'
+    assert summary['errors'][3]['error'] == 'Row must be a JSON object'
+
+    oats = db.meals.find_one({"title": "Oat bowl"})
+    assert oats['tags'] == ['breakfast', 'quick']
+    assert db.meals.find_one({"title": "Stew"})['total_time'] == 60
+
+
+def test_imported_meals_are_searchable_and_fanned_out(client, db, monkeypatch):
+    monkeypatch.setattr(mongo_models, 'FEED_FANOUT_THRESHOLD', 0)
+    influencer, headers = register_influencer(client, 'chef')
+    user, fan_headers = register(client, 'fan')
+    client.post(f"/api/influencers/follow/{influencer['id']}", headers=fan_headers)
+
+    import_meals(client, headers, ndjson(*({'title': f'Lentil curry {n}', 'description': 'curry'} for n in range(3))))
+
+    assert client.get('/api/meals/search?q=lentil').get_json()['total'] == 3
+    assert db.timelines.count_documents({"user_id": ObjectId(user['id'])}) == 3
+
+
+def test_rows_are_inserted_in_batches(db, monkeypatch):
+    influencer_id = ObjectId()
+    inserts = count_calls(monkeypatch, db.meals, 'insert_many')
+    lines = [json.dumps({'title': f'meal {n}', 'description': 'meal'}) for n in range(5)]
+
+    summary = mongo_models.Meal.import_ndjson(influencer_id, lines, batch_size=2, max_errors=1)
+
+    assert [len(docs) for docs in inserts] == [2, 2, 1]
+    assert summary == {'imported': 5, 'failed': 0, 'errors': []}
+    assert db.meals.count_documents({"influencer_id": influencer_id}) == 5
+
+    summary = mongo_models.Meal.import_ndjson(influencer_id, ['{}', 'null', '[]'], max_errors=1)
+    assert (summary['failed'], len(summary['errors'])) == (3, 1)
+
+
+def test_each_batch_fans_out_at_once(client, db, monkeypatch):
+    monkeypatch.setattr(mongo_models, 'FEED_FANOUT_THRESHOLD', 0)
+    influencer, _ = register_influencer(client, 'chef')
+    fans = [register(client, f'fan{n}')[1] for n in range(2)]
+    for headers in fans:
+        client.post(f"/api/influencers/follow/{influencer['id']}", headers=headers)
+    follower_reads = count_calls(monkeypatch, db.follows, 'find')
+    timeline_inserts = count_calls(monkeypatch, db.timelines, 'insert_many')
+    lines = [json.dumps({'title': f'meal {n}', 'description': 'meal'}) for n in range(5)]
+
+    mongo_models.Meal.import_ndjson(influencer['id'], lines, batch_size=2)
+
+    assert len(follower_reads) == 3
+    assert [len(entries) for entries in timeline_inserts] == [4, 4, 2]
+    assert db.timelines.count_documents({}) == 10
+
+
+def test_only_influencers_can_import(client):
+    _, headers = register(client, 'eater')
+
+    response = import_meals(client, headers, ndjson({'title': 'Toast', 'description': 'toast'}))
+
+    assert response.status_code == 403
+
+
+def test_an_import_with_nothing_valid_is_rejected(client, db):
+    _, headers = register_influencer(client, 'chef')
+
+    response = import_meals(client, headers, ndjson('not json', {'title': 'Toast'}))
+
+    assert response.status_code == 400
+    assert response.get_json()['imported'] == 0
+    assert db.meals.count_documents({}) == 0
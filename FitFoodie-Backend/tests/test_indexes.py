@@ -0,0 +1,60 @@
+import mongomock
+import pymongo
+import pytest
+
+from indexes import INDEXES, ensure_indexes, index_report, missing_indexes
+
+
+@pytest.fixture
+def empty_db():
+    return mongomock.MongoClient().fitfoodie
+
+
+def declared_names():
+    return sorted(f"{name}.{index.document['name']}" for name, indexes in INDEXES.items() for index in indexes)
+
+
+def test_ensure_builds_every_declared_index_once(empty_db):
+    created = ensure_indexes(empty_db, log=lambda message: None)
+
+    assert sorted(created) == declared_names()
+    assert missing_indexes(empty_db) == {}
+    assert ensure_indexes(empty_db, log=lambda message: None) == []
+
+
+def test_existing_indexes_are_matched_by_key(empty_db):
+    empty_db.users.create_index([('username', pymongo.ASCENDING)], unique=True)  # auto-named username_1
+
+    created = ensure_indexes(empty_db, log=lambda message: None)
+
+    assert 'users.users_username' not in created
+    assert 'username_1' in empty_db.users.index_information()
+
+
+def test_cli_ensure(app, db):
+    db.influencers.drop_index('influencers_created_at')
+
+    result = app.test_cli_runner().invoke(args=['indexes', 'ensure'])
+
+    assert 'Created 1 index(es)' in result.output
+    assert 'influencers_created_at' in db.influencers.index_information()
+
+
+def test_report_flags_missing_undeclared_and_unused_indexes(db, monkeypatch):
+    db.influencers.drop_index('influencers_specialty')
+    db.influencers.create_index([('verified', pymongo.ASCENDING)], name='influencers_verified')
+    for name in INDEXES:
+        # mongomock has no $indexStats; report every live index but one as used
+        collection = db[name]
+        names = list(collection.index_information())
+        monkeypatch.setattr(collection, 'aggregate', lambda pipeline, names=names: [
+            {'name': index_name, 'accesses': {'ops': 0 if index_name == 'influencers_followers_count' else 5}}
+            for index_name in names
+        ])
+
+    report = index_report(db)
+
+    assert report['influencers']['missing'] == ['influencers_specialty']
+    assert report['influencers']['undeclared'] == ['influencers_verified']
+    assert report['influencers']['unused'] == ['influencers_followers_count']
+    assert report['users'] == {'missing': [], 'undeclared': [], 'unused': []}
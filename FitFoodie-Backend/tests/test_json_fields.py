@@ -0,0 +1,89 @@
+from datetime import datetime
+import json
+import os
+import sys
+
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+from conftest import auth, create_meal, register, register_influencer
+import json_provider
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import migrate_json_fields
+
+INGREDIENTS = [{'name': 'oats', 'amount': '50g'}, {'name': 'milk', 'amount': '200ml'}]
+
+
+def test_structured_fields_are_stored_natively(client, db):
+    _, headers = register_influencer(client, 'chef')
+
+    meal = create_meal(client, headers, 'porridge', ingredients=INGREDIENTS, affiliate_links={'oats': 'https://example.com'})
+
+    stored = db.meals.find_one({"_id": ObjectId(meal['id'])})
+    assert stored['ingredients'] == INGREDIENTS
+    assert stored['affiliate_links'] == {'oats': 'https://example.com'}
+    assert meal['ingredients'] == INGREDIENTS
+
+
+def test_json_strings_from_older_clients_are_decoded(client, db):
+    _, headers = register(client, 'chef')
+    response = client.post('/api/influencers/profile', headers=headers, json={
+        'specialty': 'baking', 'social_media_links': json.dumps({'instagram': '@chef'})
+    })
+    assert response.status_code == 201
+
+    meal = create_meal(client, auth(response.get_json()['access_token']), 'porridge', ingredients=json.dumps(INGREDIENTS))
+
+    assert db.meals.find_one({"_id": ObjectId(meal['id'])})['ingredients'] == INGREDIENTS
+    assert db.influencers.find_one({})['social_media_links'] == {'instagram': '@chef'}
+
+
+def test_legacy_documents_are_decoded_when_read(client, db):
+    meal_id = db.meals.insert_one({
+        "title": "legacy", "ingredients": json.dumps(INGREDIENTS), "affiliate_links": "not json",
+        "created_at": datetime(2024, 1, 1)
+    }).inserted_id
+
+    meal = client.get(f'/api/meals/{meal_id}').get_json()
+
+    assert meal['ingredients'] == INGREDIENTS
+    assert meal['affiliate_links'] == 'not json'
+
+
+def test_migration_rewrites_only_legacy_strings(db):
+    legacy = db.meals.insert_one({"ingredients": json.dumps(INGREDIENTS), "affiliate_links": "not json"}).inserted_id
+    native = db.meals.insert_one({"ingredients": INGREDIENTS, "affiliate_links": []}).inserted_id
+    fields = migrate_json_fields.FIELDS['meals']
+
+    assert migrate_json_fields.migrate_collection(db.meals, fields, batch_size=1, dry_run=True) == (1, 1)
+    assert isinstance(db.meals.find_one({"_id": legacy})['ingredients'], str)
+
+    assert migrate_json_fields.migrate_collection(db.meals, fields, batch_size=1) == (1, 1)
+    assert db.meals.find_one({"_id": legacy})['ingredients'] == INGREDIENTS
+    assert db.meals.find_one({"_id": legacy})['affiliate_links'] == 'not json'
+    assert db.meals.find_one({"_id": native})['ingredients'] == INGREDIENTS
+
+    assert migrate_json_fields.migrate_collection(db.meals, fields, batch_size=1) == (0, 1)
+
+
+def test_orjson_output_matches_the_stock_provider(app):
+    payload = {'b': [1, 2.5, None], 'a': datetime(2024, 1, 2, 3, 4, 5), 'c': {'z': 'ü', 'y': True}}
+
+    assert json.loads(app.json.dumps(payload)) == json.loads(DefaultJSONProvider(app).dumps(payload))
+    assert app.json.dumps(payload).index('"a"') < app.json.dumps(payload).index('"b"')
+    assert app.json.loads('{"a": [1, 2]}') == {'a': [1, 2]}
+
+
+def test_jsonify_responses_use_orjson(app, monkeypatch):
+    calls = []
+    dumps = json_provider.orjson.dumps
+    monkeypatch.setattr(json_provider.orjson, 'dumps', lambda *args, **kwargs: calls.append(kwargs) or dumps(*args, **kwargs))
+
+    with app.app_context():
+        assert json.loads(app.json.response({'a': 1}).get_data()) == {'a': 1}
+        assert app.json.dumps({'a': 1}, indent=2) == '{\n  "a": 1\n}'
+        assert app.json.dumps({'a': 1}, indent=4) == json.dumps({'a': 1}, indent=4)
+
+    assert len(calls) == 2
@@ -0,0 +1,141 @@
+from datetime import datetime
+
+from bson import ObjectId
+import pytest
+
+from conftest import create_meal, register, register_influencer
+from mongo_models import user_cache
+
+pytest.importorskip('numpy')
+
+import recommendations
+
+
+@pytest.fixture
+def catalog(client):
+    _, headers = register_influencer(client, 'chef')
+    return [
+        create_meal(client, headers, f'meal {n}', calories=300 + 40 * n, protein=20 + n,
+                    carbs=40 + 2 * n, fat=10 + n, tags=['vegan'] if n % 2 else ['keto'])
+        for n in range(12)
+    ]
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Count plan searches, i.e. plans that were not served from the cache"""
+    calls = []
+    search_plan = recommendations.search_plan
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return search_plan(*args, **kwargs)
+
+    monkeypatch.setattr(recommendations, 'search_plan', counting)
+    return calls
+
+
+def test_plan_has_distinct_meals_per_day(client, catalog):
+    _, headers = register(client, 'eater', height=180, weight=80, age=30, activity_level='moderate')
+
+    response = client.post('/api/users/meal-plan', json={'days': 2, 'meals_per_day': 3}, headers=headers)
+
+    assert response.status_code == 200
+    days = response.get_json()['days']
+    assert [len(day['meals']) for day in days] == [3, 3]
+    meal_ids = [meal['id'] for day in days for meal in day['meals']]
+    assert len(set(meal_ids)) == 6
+
+
+def test_plan_respects_dietary_preferences(client, catalog):
+    _, headers = register(client, 'eater', dietary_preferences=['vegan'])
+
+    response = client.post('/api/users/meal-plan', json={'meals_per_day': 3, 'fields': 'tags'}, headers=headers)
+
+    assert response.status_code == 200
+    assert all('vegan' in meal['tags'] for meal in response.get_json()['days'][0]['meals'])
+
+    response = client.post('/api/users/meal-plan', json={'days': 7, 'meals_per_day': 6}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_blank_dietary_preferences_are_ignored(client, db, catalog):
+    user, headers = register(client, 'eater', dietary_preferences=['vegan'])
+    user_id = ObjectId(user['id'])
+
+    assert client.put('/api/users/profile', json={'dietary_preferences': []}, headers=headers).status_code == 200
+    assert db.users.find_one({"_id": user_id})['dietary_preferences'] == []
+    assert client.post('/api/users/meal-plan', json={}, headers=headers).status_code == 200
+
+    client.put('/api/users/profile', json={'dietary_preferences': ['vegan', ' ', '']}, headers=headers)
+    assert db.users.find_one({"_id": user_id})['dietary_preferences'] == ['vegan']
+
+    # Profiles updated before blanks were dropped
+    db.users.update_one({"_id": user_id}, {"$set": {"dietary_preferences": [''], "updated_at": datetime.utcnow()}})
+    user_cache.clear()
+    response = client.post('/api/users/meal-plan', json={'meals_per_day': 6}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()['days'][0]['meals']) == 6
+
+
+@pytest.mark.parametrize('body', [
+    {'days': True},
+    {'meals_per_day': False},
+    {'days': '2'},
+    {'days': 0},
+    {'meals_per_day': 7},
+    {'fields': 5},
+    {'fields': ['title', 5]},
+    {'fields': {'title': 1}},
+    {'fields': 'bogus'},
+])
+def test_invalid_input_is_a_bad_request(client, catalog, body):
+    _, headers = register(client, 'eater')
+
+    response = client.post('/api/users/meal-plan', json=body, headers=headers)
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_fields_may_be_a_list(client, catalog):
+    _, headers = register(client, 'eater')
+
+    response = client.post('/api/users/meal-plan', json={'fields': ['title', 'calories']}, headers=headers)
+
+    assert response.status_code == 200
+    meal = response.get_json()['days'][0]['meals'][0]
+    assert set(meal) == {'id', 'title', 'calories'}
+
+
+def test_plans_are_cached_until_favorites_change(client, catalog, searches):
+    _, headers = register(client, 'eater')
+
+    first = client.post('/api/users/meal-plan', json={}, headers=headers).get_json()
+    assert client.post('/api/users/meal-plan', json={}, headers=headers).get_json() == first
+    assert len(searches) == 1
+
+    client.post(f"/api/meals/favorite/{catalog[0]['id']}", headers=headers)
+    client.post('/api/users/meal-plan', json={}, headers=headers)
+    assert len(searches) == 2
+
+    client.delete(f"/api/meals/favorite/{catalog[0]['id']}", headers=headers)
+    client.post('/api/users/meal-plan', json={}, headers=headers)
+    assert len(searches) == 3
+
+
+def test_plans_are_rebuilt_after_writes_by_another_process(client, db, catalog, searches):
+    user, headers = register(client, 'eater')
+    user_id = ObjectId(user['id'])
+    client.post('/api/users/meal-plan', json={}, headers=headers)
+
+    # Written straight to the database, as another worker would, so this
+    # process's caches are not told about the change
+    db.favorites.insert_one({"user_id": user_id, "meal_id": ObjectId(catalog[1]['id']), "created_at": datetime.utcnow()})
+    client.post('/api/users/meal-plan', json={}, headers=headers)
+    assert len(searches) == 2
+
+    db.users.update_one({"_id": user_id}, {"$set": {"weight": 95, "updated_at": datetime.utcnow()}})
+    user_cache.clear()  # as it would after ENTITY_CACHE_TTL
+    client.post('/api/users/meal-plan', json={}, headers=headers)
+    assert len(searches) == 3
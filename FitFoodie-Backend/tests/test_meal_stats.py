@@ -0,0 +1,90 @@
+from bson import ObjectId
+from werkzeug.datastructures import MultiDict
+
+from conftest import create_meal, register_influencer
+from mongo_models import summarize_histogram
+from routes.meals import parse_ranges
+
+
+def titles(client, query):
+    return sorted(meal['title'] for meal in client.get(f'/api/meals/?{query}').get_json()['meals'])
+
+
+def test_parse_ranges():
+    args = MultiDict({'min_calories': '200', 'max_protein': '30.5', 'min_fat': '', 'max_sugar': '5'})
+
+    assert parse_ranges(args) == {'calories': (200.0, None), 'protein': (None, 30.5)}
+
+
+def test_meals_are_filtered_by_nutrition_ranges(client):
+    _, headers = register_influencer(client, 'chef')
+    create_meal(client, headers, 'light', calories=250, protein=10, prep_time=5, cook_time=5)
+    create_meal(client, headers, 'medium', calories=500, protein=30, prep_time=10, cook_time=20)
+    create_meal(client, headers, 'heavy', calories=900, protein=45, prep_time=20)
+
+    assert titles(client, 'min_calories=300') == ['heavy', 'medium']
+    assert titles(client, 'min_calories=300&max_calories=600') == ['medium']
+    assert titles(client, 'min_protein=10&max_protein=30') == ['light', 'medium']
+    assert titles(client, 'max_total_time=20') == ['heavy', 'light']
+
+
+def test_total_time_follows_prep_and_cook_time(client, db):
+    _, headers = register_influencer(client, 'chef')
+    meal = create_meal(client, headers, 'soup', prep_time=10, cook_time=20)
+    stored = lambda: db.meals.find_one({"_id": ObjectId(meal['id'])})['total_time']
+    assert stored() == 30
+
+    client.put(f"/api/meals/{meal['id']}", json={'cook_time': 5}, headers=headers)
+    assert stored() == 15
+
+    client.put(f"/api/meals/{meal['id']}", json={'prep_time': None}, headers=headers)
+    assert stored() == 5
+
+
+def test_backfill_total_time(app, db):
+    influencer_id = ObjectId()
+    db.meals.insert_many([
+        {"influencer_id": influencer_id, "prep_time": 10, "cook_time": 15},
+        {"influencer_id": influencer_id, "prep_time": 10},
+        {"influencer_id": influencer_id, "total_time": 40},
+    ])
+
+    result = app.test_cli_runner().invoke(args=['backfill-total-time'])
+
+    assert 'Set total_time on 2 meal(s)' in result.output
+    assert sorted(meal.get('total_time') or 0 for meal in db.meals.find()) == [10, 25, 40]
+
+
+def test_stats_summarise_each_macro(client):
+    _, headers = register_influencer(client, 'chef')
+    for calories in (120, 160, 170, 480):
+        create_meal(client, headers, f'meal {calories}', calories=calories, tags=['lunch'])
+    create_meal(client, headers, 'toast', calories=900, tags=['breakfast'])
+
+    stats = client.get('/api/meals/stats?tag=lunch').get_json()
+
+    calories = stats['calories']
+    assert (calories['count'], calories['min'], calories['max'], calories['mean']) == (4, 120, 480, 232.5)
+    assert calories['histogram'] == [
+        {'min': 100, 'max': 150, 'count': 1},
+        {'min': 150, 'max': 200, 'count': 2},
+        {'min': 450, 'max': 500, 'count': 1},
+    ]
+    assert calories['percentiles']['p50'] == 165
+    assert stats['protein'] == {
+        'count': 0, 'min': None, 'max': None, 'mean': None, 'percentiles': {}, 'histogram': []
+    }
+
+    assert client.get('/api/meals/stats?max_calories=150').get_json()['calories']['count'] == 1
+
+
+def test_percentiles_are_interpolated_within_a_bin():
+    bins = [
+        {'_id': 0, 'count': 1, 'min': 2, 'max': 2, 'sum': 2},
+        {'_id': 10, 'count': 3, 'min': 10, 'max': 16, 'sum': 39},
+    ]
+
+    summary = summarize_histogram(bins, 10, (0, 50, 100))
+
+    assert summary['percentiles'] == {'p0': 2, 'p50': 11.5, 'p100': 16}
+    assert summary['mean'] == 10.25
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from conftest import count_calls
+
+
+def add_influencer(db, name):
+    user_id = db.users.insert_one({"username": name.lower(), "email": f"{name.lower()}@example.com", "name": name}).inserted_id
+    return db.influencers.insert_one({"user_id": user_id, "specialty": "nutrition"}).inserted_id
+
+
+def add_meals(db, influencer_id, count, start=datetime(2024, 1, 1)):
+    return db.meals.insert_many([{
+        "influencer_id": influencer_id,
+        "title": f"meal {n}",
+        "created_at": start + timedelta(minutes=n),
+        "updated_at": start + timedelta(minutes=n)
+    } for n in range(count)]).inserted_ids
+
+
+def test_listing_resolves_influencer_names_in_one_batch(client, db, monkeypatch):
+    ada = add_influencer(db, 'Ada')
+    bob = add_influencer(db, 'Bob')
+    add_meals(db, ada, 3)
+    add_meals(db, bob, 3, start=datetime(2024, 2, 1))
+    influencer_reads = count_calls(monkeypatch, db.influencers, 'find')
+    user_reads = count_calls(monkeypatch, db.users, 'find')
+    single_reads = count_calls(monkeypatch, db.influencers, 'find_one')
+
+    response = client.get('/api/meals/')
+
+    assert response.status_code == 200
+    names = [meal['influencer'] for meal in response.get_json()['meals']]
+    assert names == ['Bob'] * 3 + ['Ada'] * 3
+    assert len(influencer_reads) == 1
+    # The only other read is the ETag's names version (Meal.get_names_version)
+    assert len([query for query in user_reads if '_id' in query]) == 1
+    assert single_reads == []
+
+
+def test_meals_of_missing_influencers_have_no_name(client, db):
+    add_meals(db, ObjectId(), 1)
+
+    meal = client.get('/api/meals/').get_json()['meals'][0]
+
+    assert 'influencer' not in meal
+    assert meal['title'] == 'meal 0'
+
+
+def test_users_without_a_name_show_as_unknown(client, db):
+    user_id = db.users.insert_one({"username": "anon", "email": "anon@example.com"}).inserted_id
+    add_meals(db, db.influencers.insert_one({"user_id": user_id}).inserted_id, 1)
+
+    assert client.get('/api/meals/').get_json()['meals'][0]['influencer'] == 'Unknown'
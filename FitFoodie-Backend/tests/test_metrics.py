@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import metrics
+from conftest import create_meal, register_influencer
+
+
+def command_event(command, request_id, duration_micros=1500):
+    name = next(iter(command))
+    return SimpleNamespace(
+        command=command, command_name=name, database_name='fitfoodie',
+        connection_id=('localhost', 27017), request_id=request_id, duration_micros=duration_micros
+    )
+
+
+def emit(command, request_id, failed=False):
+    """Replay a command through the listener as pymongo would (mongomock sends no events)"""
+    event = command_event(command, request_id)
+    metrics.mongo_listener.started(event)
+    if failed:
+        metrics.mongo_listener.failed(event)
+    else:
+        metrics.mongo_listener.succeeded(event)
+
+
+def test_commands_are_attributed_to_the_current_request():
+    stats = metrics.RequestStats()
+    token = metrics._current_request.set(stats)
+    try:
+        emit({'find': 'meals'}, 1)
+        emit({'getMore': 99, 'collection': 'meals'}, 2)
+        emit({'ping': 1}, 3)
+        emit({'find': 'meals'}, 4, failed=True)
+    finally:
+        metrics._current_request.reset(token)
+
+    assert stats.commands == 4
+    assert stats.by_operation[('meals', 'find')] == (2, 0.003)
+    assert stats.by_operation[('meals', 'getMore')] == (1, 0.0015)
+    assert stats.by_operation[('fitfoodie', 'ping')] == (1, 0.0015)
+    assert 'fitfoodie_mongo_command_failures_total{collection="meals",command="find"}' in metrics.render_metrics()
+
+
+def test_operator_responses_carry_server_timing(app, client, db, monkeypatch):
+    app.config['METRICS_TOKEN'] = 'scraper'
+    _, headers = register_influencer(client, 'chef')
+    meal = create_meal(client, headers, 'soup')
+    find_one = db.meals.find_one
+
+    def instrumented(*args, **kwargs):
+        emit({'find': 'meals'}, id(args))
+        return find_one(*args, **kwargs)
+
+    monkeypatch.setattr(db.meals, 'find_one', instrumented)
+
+    timing = client.get(f"/api/meals/{meal['id']}", headers={'X-Metrics-Token': 'scraper'}).headers['Server-Timing']
+
+    entries = [entry.split(';')[0] for entry in timing.split(', ')]
+    assert entries[:2] == ['app', 'mongo']
+    assert 'mongo.meals.find' in entries
+    assert 'desc="1 commands"' in timing
+
+
+def test_server_timing_is_only_sent_to_operators(app, client):
+    app.config['METRICS_TOKEN'] = 'scraper'
+
+    assert 'Server-Timing' not in client.get('/api/meals/').headers
+    assert 'Server-Timing' not in client.get('/api/meals/', headers={'X-Metrics-Token': 'guess'}).headers
+
+    app.config['METRICS_TOKEN'] = None
+    assert 'Server-Timing' not in client.get('/api/meals/', headers={'X-Metrics-Token': ''}).headers
+
+    app.debug = True
+    assert client.get('/api/meals/').headers['Server-Timing'].startswith('app;dur=')
+
+
+def test_metrics_endpoint_counts_requests(client):
+    client.get('/api/meals/')
+
+    body = client.get('/metrics').get_data(as_text=True)
+
+    assert '# TYPE fitfoodie_http_request_duration_seconds histogram' in body
+    assert 'fitfoodie_http_requests_total{blueprint="meals",method="GET",status="200"}' in body
+    assert 'fitfoodie_http_request_mongo_commands_bucket{blueprint="meals",endpoint="meals.get_meals",le="+Inf"}' in body
+
+
+def test_metrics_token(app, client):
+    app.config['METRICS_TOKEN'] = 'scraper'
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scraper'}).status_code == 200
+
+
+def test_histograms_are_cumulative():
+    histogram = metrics.Histogram('latency', 'help', ('route',), (0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(('meals',), value)
+
+    lines = histogram.render()
+
+    assert 'latency_bucket{route="meals",le="0.1"} 1' in lines
+    assert 'latency_bucket{route="meals",le="1.0"} 2' in lines
+    assert 'latency_bucket{route="meals",le="+Inf"} 3' in lines
+    assert 'latency_count{route="meals"} 3' in lines
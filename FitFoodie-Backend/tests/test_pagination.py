@@ -0,0 +1,126 @@
+from datetime import datetime
+
+from bson import ObjectId
+import pytest
+
+import mongo_models
+from conftest import create_meal, register_influencer
+
+
+def walk(client, url, key, per_page=2):
+    """Follow next_cursor from the first page to the last, returning every item's ID per page"""
+    pages = []
+    response = client.get(f'{url}per_page={per_page}').get_json()
+    while True:
+        pages.append([item['id'] for item in response[key]])
+        if not response['next_cursor']:
+            return pages
+        response = client.get(f"{url}per_page={per_page}&cursor={response['next_cursor']}").get_json()
+
+
+def test_cursor_walk_returns_every_meal_once_newest_first(client):
+    _, headers = register_influencer(client, 'chef')
+    meals = [create_meal(client, headers, f'meal {n}') for n in range(5)]
+
+    pages = walk(client, '/api/meals/?', 'meals')
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [meal_id for page in pages for meal_id in page] == [meal['id'] for meal in reversed(meals)]
+
+
+def test_page_mode_counts_and_cursor_mode_does_not(client):
+    _, headers = register_influencer(client, 'chef')
+    for n in range(3):
+        create_meal(client, headers, f'meal {n}')
+
+    first = client.get('/api/meals/?per_page=2').get_json()
+    assert (first['total'], first['pages'], first['current_page']) == (3, 2, 1)
+
+    second = client.get(f"/api/meals/?per_page=2&cursor={first['next_cursor']}").get_json()
+    assert 'total' not in second
+    assert len(second['meals']) == 1
+    assert second['next_cursor'] is None
+
+
+def test_cursor_breaks_created_at_ties_by_id(client, db):
+    influencer, _ = register_influencer(client, 'chef')
+    created_at = datetime(2024, 1, 1)
+    ids = sorted((ObjectId() for _ in range(5)), reverse=True)
+    db.meals.insert_many([{
+        "_id": meal_id, "influencer_id": ObjectId(influencer['id']), "title": str(meal_id),
+        "created_at": created_at, "updated_at": created_at
+    } for meal_id in ids])
+
+    pages = walk(client, '/api/meals/?', 'meals')
+
+    assert [meal_id for page in pages for meal_id in page] == [str(meal_id) for meal_id in ids]
+
+
+def test_cursor_pages_do_not_shift_when_meals_are_added(client):
+    _, headers = register_influencer(client, 'chef')
+    meals = [create_meal(client, headers, f'meal {n}') for n in range(4)]
+
+    first = client.get('/api/meals/?per_page=2').get_json()
+    create_meal(client, headers, 'newer meal')
+    second = client.get(f"/api/meals/?per_page=2&cursor={first['next_cursor']}").get_json()
+
+    assert [meal['id'] for meal in second['meals']] == [meals[1]['id'], meals[0]['id']]
+
+
+def test_cursor_walk_within_a_filter(client):
+    _, headers = register_influencer(client, 'chef')
+    vegan = [create_meal(client, headers, f'vegan {n}', tags=['vegan']) for n in range(3)]
+    create_meal(client, headers, 'steak', tags=['keto'])
+
+    pages = walk(client, '/api/meals/?tag=vegan&', 'meals')
+
+    assert [meal_id for page in pages for meal_id in page] == [meal['id'] for meal in reversed(vegan)]
+
+
+def test_influencers_walk_with_cursors(client):
+    influencers = [register_influencer(client, f'chef{n}')[0] for n in range(3)]
+
+    pages = walk(client, '/api/influencers/?', 'influencers', per_page=1)
+
+    assert [influencer_id for page in pages for influencer_id in page] == [
+        influencer['id'] for influencer in reversed(influencers)
+    ]
+
+
+def test_malformed_cursor_is_a_bad_request(client):
+    assert client.get('/api/meals/?cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/influencers/?cursor=not-a-cursor').status_code == 400
+
+
+@pytest.mark.parametrize('url', ['/api/meals/', '/api/influencers/', '/api/meals/search?q=meal&'])
+def test_per_page_is_clamped(client, monkeypatch, url):
+    monkeypatch.setattr(mongo_models, 'MAX_PER_PAGE', 2)
+    for n in range(3):
+        _, headers = register_influencer(client, f'chef{n}')
+        create_meal(client, headers, f'meal {n}')
+    separator = '' if url.endswith('&') else '?'
+    key = 'influencers' if 'influencers' in url else 'meals'
+
+    for per_page, expected in (('0', 1), ('-1', 1), ('500', 2)):
+        response = client.get(f'{url}{separator}per_page={per_page}')
+        assert response.status_code == 200, per_page
+        body = response.get_json()
+        assert len(body[key]) == expected, per_page
+        assert body['pages'] == -(-3 // expected)
+
+
+def test_clamped_pages_still_walk_with_cursors(client, monkeypatch):
+    monkeypatch.setattr(mongo_models, 'MAX_PER_PAGE', 2)
+    _, headers = register_influencer(client, 'chef')
+    meals = [create_meal(client, headers, f'meal {n}') for n in range(3)]
+
+    assert [len(page) for page in walk(client, '/api/meals/?', 'meals', per_page=-1)] == [1, 1, 1]
+    pages = walk(client, '/api/meals/?', 'meals', per_page=50)
+    assert [meal_id for page in pages for meal_id in page] == [meal['id'] for meal in reversed(meals)]
+
+
+def test_pages_below_one_are_a_bad_request(client):
+    for url in ('/api/meals/?page=0', '/api/influencers/?page=-1', '/api/meals/search?q=meal&page=0'):
+        response = client.get(url)
+        assert response.status_code == 400, url
+        assert response.get_json()['error'] == 'page must be at least 1'
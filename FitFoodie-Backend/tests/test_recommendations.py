@@ -0,0 +1,120 @@
+import time
+
+from bson import ObjectId
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import recommendations
+from conftest import create_meal, register, register_influencer
+from recommendations import MealMatrix, MealMatrixCache, nutrition_targets
+
+TARGETS = {'calories': 600, 'protein': 40, 'carbs': 60, 'fat': 20}
+
+
+def matrix_of(*meals):
+    return MealMatrix({"_id": ObjectId(), **meal} for meal in meals)
+
+
+def ranked(matrix, scores, limit=10):
+    rows, _ = matrix.top(scores, limit)
+    return [int(row) for row in rows]
+
+
+def test_targets_come_from_the_profile():
+    profile = {'height': 180, 'weight': 80, 'age': 30, 'activity_level': 'moderate'}
+
+    assert nutrition_targets(profile) == {'calories': 877, 'protein': 43, 'carbs': 111, 'fat': 29}
+    # Without height, weight and age the default daily energy is used
+    assert nutrition_targets({'weight': 'heavy'}) == {'calories': 667, 'protein': 42, 'carbs': 75, 'fat': 22}
+
+
+def test_meals_closest_to_the_targets_score_highest():
+    matrix = matrix_of(
+        {'calories': 1200, 'protein': 40, 'carbs': 60, 'fat': 20},
+        {'calories': 600, 'protein': 40, 'carbs': 60, 'fat': 20},
+        {'calories': 650, 'protein': 30, 'carbs': 70, 'fat': 25},
+        {'protein': 40},
+    )
+
+    scores = matrix.score(TARGETS)
+
+    assert scores[1] == 0
+    assert ranked(matrix, scores) == [1, 2, 0]
+    assert ranked(matrix, scores, limit=2) == [1, 2]
+
+
+def test_tags_and_follows_boost_the_score():
+    chef = ObjectId()
+    matrix = matrix_of(
+        {'calories': 600, 'protein': 40, 'carbs': 60, 'fat': 20, 'tags': ['keto']},
+        {'calories': 620, 'protein': 40, 'carbs': 60, 'fat': 20, 'tags': ['vegan', 'quick']},
+        {'calories': 640, 'protein': 40, 'carbs': 60, 'fat': 20, 'influencer_id': chef},
+    )
+
+    assert ranked(matrix, matrix.score(TARGETS)) == [0, 1, 2]
+    assert ranked(matrix, matrix.score(TARGETS, matrix.tag_vector(['vegan']))) == [1, 0, 2]
+    assert ranked(matrix, matrix.score(TARGETS, followed_influencers=[chef, ObjectId()])) == [2, 0, 1]
+
+    vector = matrix.tag_vector(['vegan', 'vegan', 'quick', 'unknown'])
+    assert dict(zip(matrix.tags, vector.tolist())) == {'keto': 0.0, 'quick': 0.5, 'vegan': 1.0}
+
+
+def test_an_empty_catalog_recommends_nothing():
+    matrix = matrix_of()
+
+    assert ranked(matrix, matrix.score(TARGETS)) == []
+
+
+def test_a_stale_matrix_is_served_while_it_is_rebuilt(db):
+    cache = MealMatrixCache(ttl=0)
+    db.meals.insert_one({"calories": 500})
+    first = cache.get(db.meals)
+    time.sleep(0.001)
+
+    # Another thread holds the rebuild
+    cache._lock.acquire()
+    try:
+        assert cache.get(db.meals) is first
+    finally:
+        cache._lock.release()
+
+    db.meals.insert_one({"calories": 700})
+    assert len(cache.get(db.meals)) == 2
+
+
+def test_recommendations_endpoint(client):
+    influencer, chef_headers = register_influencer(client, 'chef')
+    near = create_meal(client, chef_headers, 'near', calories=870, protein=43, carbs=110, fat=29)
+    far = create_meal(client, chef_headers, 'far', calories=200, protein=5, carbs=30, fat=5, tags=['vegan'])
+    create_meal(client, chef_headers, 'unrated')
+    _, headers = register(client, 'eater', height=180, weight=80, age=30, activity_level='moderate')
+
+    body = client.get('/api/users/recommendations', headers=headers).get_json()
+
+    assert body['targets'] == {'calories': 877, 'protein': 43, 'carbs': 111, 'fat': 29}
+    assert [meal['id'] for meal in body['meals']] == [near['id'], far['id']]
+    assert body['meals'][0]['score'] > body['meals'][1]['score']
+    assert 'instructions' not in body['meals'][0]
+
+    limited = client.get('/api/users/recommendations?limit=0&fields=title', headers=headers).get_json()
+    assert [meal['id'] for meal in limited['meals']] == [near['id']]
+    assert set(limited['meals'][0]) >= {'id', 'title', 'score'}
+
+    assert client.get('/api/users/recommendations?fields=secret', headers=headers).status_code == 400
+    assert client.get('/api/users/recommendations').status_code == 401
+
+
+def test_favorite_tags_count_as_preferences(client, monkeypatch):
+    monkeypatch.setattr(recommendations, 'TAG_WEIGHT', 10)
+    _, chef_headers = register_influencer(client, 'chef')
+    plain = create_meal(client, chef_headers, 'plain', calories=600)
+    vegan = create_meal(client, chef_headers, 'vegan', calories=300, tags=['vegan'])
+    _, headers = register(client, 'eater')
+    before = [meal['id'] for meal in client.get('/api/users/recommendations', headers=headers).get_json()['meals']]
+
+    client.post(f"/api/meals/favorite/{vegan['id']}", headers=headers)
+    after = [meal['id'] for meal in client.get('/api/users/recommendations', headers=headers).get_json()['meals']]
+
+    assert before == [plain['id'], vegan['id']]
+    assert after == [vegan['id'], plain['id']]
@@ -0,0 +1,117 @@
+from bson import ObjectId
+
+from conftest import count_calls, create_meal, register_influencer
+from search_index import MealSearchIndex, tokenize
+
+
+def search(client, q, **params):
+    response = client.get('/api/meals/search', query_string={'q': q, **params})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def titles(result):
+    return [meal['title'] for meal in result['meals']]
+
+
+def test_title_matches_rank_above_other_fields(client):
+    _, headers = register_influencer(client, 'chef')
+    create_meal(client, headers, 'Green salad', description='Crisp lettuce with avocado')
+    create_meal(client, headers, 'Avocado toast', description='Sourdough and eggs')
+    create_meal(client, headers, 'Power bowl', description='Rice and beans', tags=['avocado'])
+
+    result = search(client, 'avocado')
+
+    assert titles(result) == ['Avocado toast', 'Power bowl', 'Green salad']
+    assert result['total'] == 3
+
+
+def test_ingredients_and_plurals_match(client):
+    _, headers = register_influencer(client, 'chef')
+    create_meal(client, headers, 'Shakshuka', ingredients=[{'name': 'eggs'}, {'name': 'tomatoes'}])
+    create_meal(client, headers, 'Porridge', ingredients=[{'name': 'oats'}])
+
+    assert titles(search(client, 'egg')) == ['Shakshuka']
+    assert titles(search(client, 'the oat')) == ['Porridge']
+    assert search(client, 'quinoa') == {'meals': [], 'total': 0, 'pages': 0, 'current_page': 1}
+
+
+def test_results_are_paginated(client):
+    _, headers = register_influencer(client, 'chef')
+    for n in range(5):
+        create_meal(client, headers, f'Soup {n}')
+
+    first = search(client, 'soup', per_page=2)
+    last = search(client, 'soup', per_page=2, page=3)
+
+    assert (first['total'], first['pages'], len(first['meals'])) == (5, 3, 2)
+    assert len(last['meals']) == 1
+    assert not set(titles(first)) & set(titles(last))
+
+
+def test_a_query_is_required(client):
+    assert client.get('/api/meals/search?q=%20').status_code == 400
+
+
+def test_writes_keep_a_built_index_current(client):
+    _, headers = register_influencer(client, 'chef')
+    meal = create_meal(client, headers, 'Lentil stew', description='Slow cooked')
+    assert titles(search(client, 'lentil')) == ['Lentil stew']
+
+    create_meal(client, headers, 'Lentil salad', description='Served cold')
+    assert sorted(titles(search(client, 'lentil'))) == ['Lentil salad', 'Lentil stew']
+
+    client.put(f"/api/meals/{meal['id']}", json={'title': 'Bean stew'}, headers=headers)
+    assert titles(search(client, 'lentil')) == ['Lentil salad']
+    assert titles(search(client, 'bean')) == ['Bean stew']
+
+    client.delete(f"/api/meals/{meal['id']}", headers=headers)
+    assert search(client, 'bean')['total'] == 0
+
+
+def test_the_index_is_rebuilt_after_its_ttl(db):
+    index = MealSearchIndex(ttl=0)
+    db.meals.insert_one({"_id": ObjectId(), "title": "Miso soup"})
+    index.ensure_built(db.meals)
+    db.meals.insert_one({"_id": ObjectId(), "title": "Chicken soup"})
+
+    assert index.search('soup', 10)[0] == 1
+    index.ensure_built(db.meals)
+    assert index.search('soup', 10)[0] == 2
+
+
+def test_a_stale_index_is_searched_while_another_thread_rebuilds_it(db, monkeypatch):
+    index = MealSearchIndex(ttl=0)
+    db.meals.insert_one({"_id": ObjectId(), "title": "Miso soup"})
+    index.ensure_built(db.meals)
+    db.meals.insert_one({"_id": ObjectId(), "title": "Chicken soup"})
+    reads = count_calls(monkeypatch, db.meals, 'find')
+
+    with index._build_lock:
+        index.ensure_built(db.meals)
+
+    assert reads == []
+    assert index.search('soup', 10)[0] == 1
+
+
+def test_writes_during_a_rebuild_are_kept(db):
+    index = MealSearchIndex()
+    miso, chicken, leek = ({"_id": ObjectId(), "title": title} for title in ('Miso soup', 'Chicken soup', 'Leek soup'))
+    index.build([miso])
+
+    def meals():
+        yield miso
+        assert index.search('miso', 10)[0] == 1  # still served from the old postings
+        index.upsert(leek)
+        index.remove(miso['_id'])
+        yield chicken
+
+    index.build(meals())
+
+    assert index.search('soup', 10)[0] == 2
+    assert index.search('miso', 10)[0] == 0
+    assert index.search('leek', 10)[0] == 1
+
+
+def test_tokenize_drops_stop_words_and_plural_suffixes():
+    assert tokenize('The Eggs and Grass of Oats!') == ['egg', 'grass', 'oat']
@@ -0,0 +1,126 @@
+from bson import ObjectId
+import pytest
+
+import mongo_models
+from conftest import create_meal, register, register_influencer
+
+
+@pytest.fixture
+def chefs(client, monkeypatch):
+    """Three influencers with a meal each, and a fan-out threshold of two follows"""
+    monkeypatch.setattr(mongo_models, 'FEED_FANOUT_THRESHOLD', 2)
+    chefs = [register_influencer(client, f'chef{n}') for n in range(3)]
+    for n, (_, headers) in enumerate(chefs):
+        create_meal(client, headers, f'meal {n}')
+    return chefs
+
+
+def follow_all(client, headers, chefs):
+    for influencer, _ in chefs:
+        assert client.post(f"/api/influencers/follow/{influencer['id']}", headers=headers).status_code == 200
+
+
+def feed(client, headers):
+    return [meal['id'] for meal in client.get('/api/users/feed', headers=headers).get_json()['meals']]
+
+
+def timeline(db, user):
+    return db.timelines.count_documents({"user_id": ObjectId(user['id'])})
+
+
+def test_feed_is_empty_without_follows(client):
+    _, headers = register(client, 'fan')
+
+    assert client.get('/api/users/feed', headers=headers).get_json() == {'meals': [], 'next_cursor': None}
+
+
+def test_feed_merges_followed_influencers_newest_first(client):
+    chefs = [register_influencer(client, f'chef{n}') for n in range(3)]
+    meals = [create_meal(client, chefs[n % 3][1], f'meal {n}') for n in range(7)]
+    _, headers = register(client, 'fan')
+    follow_all(client, headers, chefs[:2])
+
+    ids = []
+    url = '/api/users/feed?per_page=2'
+    response = client.get(url, headers=headers).get_json()
+    while True:
+        assert 'total' not in response
+        ids.extend(meal['id'] for meal in response['meals'])
+        if not response['next_cursor']:
+            break
+        response = client.get(f"{url}&cursor={response['next_cursor']}", headers=headers).get_json()
+
+    assert ids == [meal['id'] for n, meal in reversed(list(enumerate(meals))) if n % 3 != 2]
+    assert client.get('/api/users/feed?cursor=not-a-cursor', headers=headers).status_code == 400
+
+
+def test_timeline_is_built_past_the_threshold(client, db, chefs):
+    user, headers = register(client, 'fan')
+    follow_all(client, headers, chefs[:2])
+    assert not db.users.find_one({"_id": ObjectId(user['id'])}).get('timeline_enabled')
+    assert timeline(db, user) == 0
+    direct = feed(client, headers)
+
+    follow_all(client, headers, chefs[2:])
+
+    assert db.users.find_one({"_id": ObjectId(user['id'])})['timeline_enabled'] is True
+    assert timeline(db, user) == 3
+    assert feed(client, headers)[1:] == direct
+
+
+def test_new_meals_fan_out_to_timelines(client, db, chefs):
+    user, headers = register(client, 'fan')
+    follow_all(client, headers, chefs)
+    _, below_headers = register(client, 'casual')
+    follow_all(client, below_headers, chefs[:1])
+
+    meal = create_meal(client, chefs[0][1], 'fresh')
+
+    assert timeline(db, user) == 4
+    assert db.timelines.count_documents({"meal_id": ObjectId(meal['id'])}) == 1
+    assert feed(client, headers)[0] == meal['id']
+    assert feed(client, below_headers)[0] == meal['id']
+
+
+def test_unfollowing_trims_then_tears_down_the_timeline(client, db, chefs, monkeypatch):
+    monkeypatch.setattr(mongo_models, 'FEED_FANOUT_THRESHOLD', 1)
+    user, headers = register(client, 'fan')
+    follow_all(client, headers, chefs)
+    assert timeline(db, user) == 3
+
+    # Still over the threshold: only the unfollowed influencer's meals go
+    client.delete(f"/api/influencers/unfollow/{chefs[2][0]['id']}", headers=headers)
+    assert timeline(db, user) == 2
+    assert db.timelines.count_documents({"influencer_id": ObjectId(chefs[2][0]['id'])}) == 0
+
+    # Back at the threshold the user reads meals directly again
+    client.delete(f"/api/influencers/unfollow/{chefs[1][0]['id']}", headers=headers)
+    assert timeline(db, user) == 0
+    assert 'timeline_enabled' not in db.users.find_one({"_id": ObjectId(user['id'])})
+    assert db.follows.count_documents({"user_id": ObjectId(user['id']), "timeline_enabled": True}) == 0
+
+    create_meal(client, chefs[0][1], 'fresh')
+    assert timeline(db, user) == 0
+    assert len(feed(client, headers)) == 2
+
+
+def test_deleting_a_meal_removes_it_from_timelines(client, db, chefs):
+    user, headers = register(client, 'fan')
+    follow_all(client, headers, chefs)
+    meal = create_meal(client, chefs[0][1], 'short lived')
+
+    assert client.delete(f"/api/meals/{meal['id']}", headers=chefs[0][1]).status_code == 200
+
+    assert db.timelines.count_documents({"meal_id": ObjectId(meal['id'])}) == 0
+    assert meal['id'] not in feed(client, headers)
+
+
+def test_rebuild_timelines(app, db, chefs, client):
+    user, headers = register(client, 'fan')
+    follow_all(client, headers, chefs)
+    db.timelines.delete_many({})
+
+    result = app.test_cli_runner().invoke(args=['rebuild-timelines'])
+
+    assert 'Rebuilt 1 timeline(s)' in result.output
+    assert timeline(db, user) == 3